@@ -0,0 +1,84 @@
+"""
+Measures the cost of accessing a few terms of a large store of terms, with
+an arena (whose terms are materialized lazily) and with the binary
+serialization format (which reads all the terms of the store).
+
+Usage: python -m benchmarks.bench_arena
+"""
+
+import io
+import os
+import tempfile
+
+from timeit import default_timer
+
+from stew.arena import Arena, write_arena
+from stew.core import Sort, generator
+from stew.matching import push_context, var
+from stew.serialization import dump, load
+from stew.types.nat import Nat
+
+
+STATES = 2000
+LENGTH = 500
+
+
+class List(Sort):
+
+    @generator
+    def nil() -> List: pass
+
+    @generator
+    def cons(head: Nat, tail: List) -> List: pass
+
+
+def make_states():
+    states = []
+    for state in range(STATES):
+        term = List.nil()
+        for index in range(LENGTH):
+            term = List.cons(head=Nat(state * LENGTH + index), tail=term)
+        states.append(term)
+    return states
+
+
+def inspect(term):
+    # Hash and pattern match a state.
+    hash(term)
+    with push_context():
+        assert term == List.cons(head=var.x, tail=var.y)
+
+
+def main():
+    states = make_states()
+    (fd, path) = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        start = default_timer()
+        write_arena(path, states)
+        print('arena   write    %8.3fs (%i bytes)' % (
+            default_timer() - start, os.path.getsize(path)))
+
+        start = default_timer()
+        with Arena(path) as arena:
+            term = arena[-1]
+            inspect(term)
+            print('arena   access   %8.3fs (%i nodes materialized)' % (
+                default_timer() - start, len(arena._views)))
+            del term
+
+        stream = io.BytesIO()
+        start = default_timer()
+        dump(states, stream)
+        print('stream  write    %8.3fs (%i bytes)' % (
+            default_timer() - start, len(stream.getvalue())))
+
+        start = default_timer()
+        inspect(load(io.BytesIO(stream.getvalue()))[-1])
+        print('stream  access   %8.3fs' % (default_timer() - start))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
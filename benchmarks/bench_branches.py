@@ -0,0 +1,83 @@
+"""
+Measures the cost of entering the branches of an operation, with matching
+contexts stored in the locals of the rewritten function, and with contexts
+pushed onto the context stack of the current thread (which is what happens
+to operations that refer to the variable manager itself).
+
+Usage: python -m benchmarks.bench_branches
+"""
+
+from timeit import default_timer, timeit
+
+from stew.core import Sort, generator, operation
+from stew.matching import MatchingContext, push_context, var
+
+
+REPEAT = 20000
+
+
+class S(Sort):
+
+    @generator
+    def nil() -> S: pass
+
+    @generator
+    def suc(self: S) -> S: pass
+
+    @operation
+    def local(self: S) -> S:
+        if self == S.suc(S.suc(var.x)):
+            return var.x
+        if self == S.suc(var.x):
+            return var.x
+        if self == S.nil():
+            return self
+
+    @operation
+    def stacked(self: S) -> S:
+        # Referring to the variable manager itself prevents the contexts of
+        # the branches from being stored in the locals of the function.
+        manager = var
+        if self == S.suc(S.suc(var.x)):
+            return var.x
+        if self == S.suc(var.x):
+            return var.x
+        if self == S.nil():
+            return self
+
+
+def timed(operation, term):
+    operation(term)
+    start = default_timer()
+    for _ in range(REPEAT):
+        operation(term)
+    return (default_timer() - start) / REPEAT
+
+
+def enter_stacked():
+    with push_context():
+        var.x
+
+
+def enter_local(context=MatchingContext()):
+    context.clear()
+    context['x']
+
+
+def main():
+    # The cost of entering a branch and looking up one variable, without
+    # evaluating any pattern.
+    for name, fn in (('local', enter_local), ('stacked', enter_stacked)):
+        elapsed = timeit(fn, number=REPEAT * 10) / (REPEAT * 10)
+        print('entry         %-8s %8.3fus/branch' % (name, elapsed * 1e6))
+
+    # The number of branches entered by each call.
+    for branches, term in ((1, S.suc(S.suc(S.nil()))), (2, S.suc(S.nil())), (3, S.nil())):
+        for name, operation in (('local', S.local), ('stacked', S.stacked)):
+            elapsed = timed(operation, term)
+            print('%i branch(es)  %-8s %8.3fus/call %8.3fus/branch' % (
+                branches, name, elapsed * 1e6, elapsed * 1e6 / branches))
+
+
+if __name__ == '__main__':
+    main()
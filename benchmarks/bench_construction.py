@@ -0,0 +1,82 @@
+"""
+Measures the cost of building terms from native Python values, with a loop
+calling generators on each node and with `Sort.from_values`, on a batch of
+lists whose elements and suffixes are shared.
+
+Usage: python -m benchmarks.bench_construction
+"""
+
+import tracemalloc
+
+from timeit import default_timer
+
+from stew.core import Sort, generator
+from stew.types.nat import Nat
+
+
+LISTS = 200
+LENGTH = 1000
+
+
+class List(Sort):
+
+    @generator
+    def nil() -> List: pass
+
+    @generator
+    def cons(head: Nat, tail: List) -> List: pass
+
+
+def make_values():
+    # Each list is a distinct tuple, but all the lists are equal.
+    values = []
+    for _ in range(LISTS):
+        value = ('nil',)
+        for index in range(LENGTH):
+            value = ('cons', index % 100, value)
+        values.append(value)
+    return values
+
+
+def build_with_loop(values):
+    rv = []
+    for value in values:
+        # Unroll the list, then build it from its last element.
+        heads = []
+        while value[0] == 'cons':
+            heads.append(value[1])
+            value = value[2]
+
+        term = List.nil()
+        for head in reversed(heads):
+            term = List.cons(head=Nat(head), tail=term)
+        rv.append(term)
+    return rv
+
+
+def build_in_bulk(values):
+    return List.from_values(values)
+
+
+def main():
+    values = make_values()
+    for name, build in (('loop', build_with_loop), ('bulk', build_in_bulk)):
+        start = default_timer()
+        terms = build(values)
+        elapsed = default_timer() - start
+        del terms
+
+        # Tracing allocations slows the construction down, hence the memory
+        # is measured on a separate run.
+        tracemalloc.start()
+        terms = build(values)
+        (memory, _) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print('%-5s %8.3fus/node %8.2fMB' % (
+            name, elapsed * 1e6 / (LISTS * LENGTH), memory / 2 ** 20))
+        del terms
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Measures the cost of computing the reachable states of a list of bits, whose
+bits can be flipped one by one, on explicit sets of terms and on TermSets.
+The 2 ** 30 states of a list of 30 bits can only be computed with TermSets.
+
+Usage: python -m benchmarks.bench_diagrams
+"""
+
+from timeit import default_timer
+
+from stew.core import Sort, generator
+from stew.diagrams import TermSet, local
+from stew.strategies import fixpoint, identity, make_strategy, semi_naive_fixpoint, union
+from stew.types.bool import Bool
+
+
+class Bits(Sort):
+
+    @generator
+    def nil() -> Bits: pass
+
+    @generator
+    def cons(head: Bool, tail: Bits) -> Bits: pass
+
+
+def zeros(length):
+    term = Bits.nil()
+    for _ in range(length):
+        term = Bits.cons(head=Bool.false(), tail=term)
+    return term
+
+
+def explicit_flip_at(index):
+    def flip(term):
+        heads = []
+        while term._generator is Bits.cons:
+            heads.append(term._args[0])
+            term = term._args[1]
+        heads[index] = ~heads[index]
+        for head in reversed(heads):
+            term = Bits.cons(head=head, tail=term)
+        return term
+    return make_strategy(flip)
+
+
+def flip_at(index):
+    # Flip the head of the index-th tail of a list.
+    rv = local(Bits.cons, 'head', make_strategy(Bool.__invert__))
+    for _ in range(index):
+        rv = local(Bits.cons, 'tail', rv)
+    return rv
+
+
+def main():
+    for length in (12, 30):
+        if length <= 12:
+            steps = [explicit_flip_at(index) for index in range(length)]
+            strategy = semi_naive_fixpoint(union(identity, *steps))
+            start = default_timer()
+            states = strategy(zeros(length))
+            print('%2i bits explicit %8.3fs %12i states' % (
+                length, default_timer() - start, len(states)))
+
+        steps = [flip_at(index) for index in range(length)]
+        strategy = fixpoint(union(identity, *steps))
+        start = default_timer()
+        states = strategy(TermSet([zeros(length)]))
+        print('%2i bits symbolic %8.3fs %12i states %6i nodes' % (
+            length, default_timer() - start, states.count(), states.node_count()))
+
+
+if __name__ == '__main__':
+    main()
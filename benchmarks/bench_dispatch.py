@@ -0,0 +1,140 @@
+"""
+Measures the cost of dispatching operations, on the workloads of the Nat and
+Bool tests. Since Nat implements its operations natively, they are also run
+on a copy of Nat that only has its rewriting semantics, first as is, then
+compiled into decision trees, and finally with memoization enabled.
+
+Usage: python -m benchmarks.bench_dispatch
+"""
+
+from timeit import default_timer
+
+from stew.core import Sort, generator, memoization, operation
+from stew.dispatch import decision_tree
+from stew.matching import var
+from stew.types.bool import Bool
+from stew.types.nat import Nat
+
+
+REPEAT = 20
+
+
+class Peano(Sort):
+
+    @generator
+    def zero() -> Peano: pass
+
+    @generator
+    def suc(self: Peano) -> Peano: pass
+
+    @operation
+    def __add__(self: Peano, other: Peano) -> Peano:
+        if self == Peano.zero():
+            return other
+        if self == Peano.suc(var.x):
+            return Peano.suc(var.x + other)
+
+    @operation
+    def __sub__(self: Peano, other: Peano) -> Peano:
+        if other == Peano.zero():
+            return self
+        if self == Peano.suc(var.x) and other == Peano.suc(var.y):
+            return var.x - var.y
+
+    @operation
+    def __mul__(self: Peano, other: Peano) -> Peano:
+        if self == Peano.zero():
+            return Peano.zero()
+        if self == Peano.suc(var.x):
+            return var.x * other + other
+
+    @operation
+    def __lt__(self: Peano, other: Peano) -> Bool:
+        if (self == Peano.zero()) and (other == Peano.zero()):
+            return Bool.false()
+        if (self == Peano.zero()) and (other == Peano.suc(var.y)):
+            return Bool.true()
+        if (self == Peano.suc(var.x)) and (other == Peano.zero()):
+            return Bool.false()
+        if (self == Peano.suc(var.x)) and (other == Peano.suc(var.y)):
+            return var.x < var.y
+
+    @operation
+    def __le__(self: Peano, other: Peano) -> Bool:
+        if self == other:
+            return Bool.true()
+        return self < other
+
+    @operation
+    def __gt__(self: Peano, other: Peano) -> Bool:
+        return ~(self <= other)
+
+    @operation
+    def __truediv__(self: Peano, other: Peano) -> Peano:
+        if self < other:
+            return Peano.zero()
+        if (~(self < other) == Bool.true()) and (other != Peano.zero()):
+            return Peano.suc((self - other) / other)
+
+    @operation
+    def __mod__(self: Peano, other: Peano) -> Peano:
+        if other != Peano.zero():
+            return self - (other * (self / other))
+
+
+def peano(number):
+    term = Peano.zero()
+    for _ in range(number):
+        term = Peano.suc(term)
+    return term
+
+
+def bool_workload():
+    true = Bool.true()
+    false = Bool.false()
+    for lhs in (true, false):
+        ~lhs
+        for rhs in (true, false):
+            lhs & rhs
+            lhs | rhs
+            lhs ^ rhs
+
+
+def nat_workload():
+    for lhs in range(5):
+        for rhs in range(1, 4):
+            (Nat(lhs) + Nat(rhs), Nat(lhs) * Nat(rhs), Nat(lhs) < Nat(rhs))
+            (Nat(lhs) / Nat(rhs), Nat(lhs) % Nat(rhs), Nat(lhs) >= Nat(rhs))
+
+
+def peano_workload(numbers=[peano(i) for i in range(12)]):
+    for lhs in numbers[:5]:
+        for rhs in numbers[1:4]:
+            (lhs + rhs, lhs * rhs, lhs < rhs, lhs > rhs, lhs / rhs, lhs % rhs)
+    numbers[11] * numbers[11]
+
+
+def timed(fn):
+    fn()
+    start = default_timer()
+    for _ in range(REPEAT):
+        fn()
+    return (default_timer() - start) / REPEAT
+
+
+def main():
+    for name, workload in (
+            ('bool', bool_workload), ('nat', nat_workload), ('peano', peano_workload)):
+        print('%-8s %10.3fms' % (name, timed(workload) * 1e3))
+
+    for name in ('__add__', '__sub__', '__mul__', '__lt__'):
+        decision_tree(Peano.__dict__[name])
+    print('%-8s %10.3fms (decision trees)' % ('peano', timed(peano_workload) * 1e3))
+
+    with memoization() as cache:
+        print('%-8s %10.3fms (memoized)' % ('peano', timed(peano_workload) * 1e3))
+        print('         %s' % cache)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Measures the cost of computing the reachable states of a system of two
+bounded counters, with the naive fixpoint (which applies its strategy to all
+the states accumulated so far on each iteration) and with the semi-naive
+fixpoint (which only applies it to the states discovered by the previous
+iteration).
+
+Usage: python -m benchmarks.bench_fixpoint
+"""
+
+from timeit import default_timer
+
+from stew.strategies import fixpoint, identity, make_strategy, semi_naive_fixpoint, union
+from stew.types.nat import Nat
+
+
+BOUND = 30
+
+applications = 0
+
+
+def step(state):
+    # States encode the values (x, y) of the counters as x * BOUND + y.
+    global applications
+    applications += 1
+
+    (x, y) = divmod(state._value, BOUND)
+    rv = set()
+    if x + 1 < BOUND:
+        rv.add(Nat((x + 1) * BOUND + y))
+    if y + 1 < BOUND:
+        rv.add(Nat(x * BOUND + y + 1))
+    return rv or state
+
+
+def main():
+    global applications
+    f = union(identity, make_strategy(step))
+
+    for name, strategy in (('naive', fixpoint(f)), ('semi-naive', semi_naive_fixpoint(f))):
+        applications = 0
+        start = default_timer()
+        states = strategy(Nat(0))
+        elapsed = default_timer() - start
+        assert len(states) == BOUND * BOUND
+
+        print('%-10s %8.3fs %8i applications' % (name, elapsed, applications))
+
+
+if __name__ == '__main__':
+    main()
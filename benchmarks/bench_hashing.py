@@ -0,0 +1,57 @@
+"""
+Measures the cost of inserting and looking up deep Peano numbers in sets.
+
+Usage: python -m benchmarks.bench_hashing
+"""
+
+from timeit import default_timer
+
+from stew.types.nat import Nat
+
+
+DEPTHS = (10 ** 3, 10 ** 4, 10 ** 5)
+REPEAT = 1000
+
+
+def make_term(depth):
+    term = Nat.zero()
+    for _ in range(depth):
+        term = Nat.suc(term)
+    return term
+
+
+def bench_set_insert(term):
+    start = default_timer()
+    for _ in range(REPEAT):
+        terms = set()
+        terms.add(term)
+    return (default_timer() - start) / REPEAT
+
+
+def bench_set_lookup(term, terms):
+    start = default_timer()
+    for _ in range(REPEAT):
+        term in terms
+    return (default_timer() - start) / REPEAT
+
+
+def main():
+    print('%8s %12s %12s %12s %12s' % ('depth', 'build', 'insert', 'hit', 'miss'))
+    for depth in DEPTHS:
+        start = default_timer()
+        term = make_term(depth)
+        build = default_timer() - start
+
+        other = Nat.suc(make_term(depth))
+        terms = {term}
+
+        print('%8i %10.3fms %10.3fus %10.3fus %10.3fus' % (
+            depth,
+            build * 1e3,
+            bench_set_insert(term) * 1e6,
+            bench_set_lookup(term, terms) * 1e6,
+            bench_set_lookup(other, terms) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Measures the time it takes to import a module that defines many operations,
+without the code cache, with a cold code cache (that has to be written),
+with a warm code cache, and with lazy operations (which are only rewritten
+the first time they are called). Each import is run in a fresh interpreter.
+
+Usage: python -m benchmarks.bench_import
+"""
+
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+SORTS = 20
+REPEAT = 5
+
+SORT_TEMPLATE = '''
+
+class S{index}(Sort):
+
+    @generator
+    def nil() -> S{index}: pass
+
+    @generator
+    def cons(head: Bool, tail: S{index}) -> S{index}: pass
+
+    @operation
+    def length(self: S{index}) -> Nat:
+        if self == S{index}.nil():
+            return Nat(0)
+        if self == S{index}.cons(head=var.h, tail=var.t):
+            return Nat(1) + var.t.length()
+
+    @operation
+    def all(self: S{index}) -> Bool:
+        if self == S{index}.nil():
+            return Bool.true()
+        if self == S{index}.cons(head=Bool.false(), tail=var.t):
+            return Bool.false()
+        if self == S{index}.cons(head=Bool.true(), tail=var.t):
+            return var.t.all()
+
+    @operation
+    def concat(self: S{index}, other: S{index}) -> S{index}:
+        if self == S{index}.nil():
+            return other
+        if self == S{index}.cons(head=var.h, tail=var.t):
+            return S{index}.cons(head=var.h, tail=var.t.concat(other))
+
+    @operation
+    def reverse(self: S{index}) -> S{index}:
+        if self == S{index}.nil():
+            return self
+        if self == S{index}.cons(head=var.h, tail=var.t):
+            return var.t.reverse().concat(S{index}.cons(head=var.h, tail=S{index}.nil()))
+'''
+
+MODULE_HEADER = '''
+from stew.core import Sort, generator, operation
+from stew.matching import var
+from stew.types.bool import Bool
+from stew.types.nat import Nat
+'''
+
+# Import stew first, so that only the import of the generated module is timed.
+TIMER = '''
+import time
+import stew.types.nat
+start = time.perf_counter()
+import generated
+%s
+print(time.perf_counter() - start)
+'''
+
+CALL = '''
+term = generated.S0.cons(head=generated.Bool.true(), tail=generated.S0.nil())
+for index in range(%i):
+    sort = getattr(generated, 'S%%i' %% index)
+    term = sort.cons(head=generated.Bool.true(), tail=sort.nil())
+    sort.reverse(term).length()
+    sort.all(term)
+''' % SORTS
+
+
+def run(directory, call=False, **environ):
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = os.pathsep.join([directory, os.getcwd()])
+    env.update(environ)
+    output = subprocess.check_output(
+        [sys.executable, '-c', TIMER % (CALL if call else '')], env=env)
+    return float(output)
+
+
+def clear_code_cache(directory):
+    for path in glob.glob(os.path.join(directory, '__pycache__', '*.stew')):
+        os.remove(path)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(directory, 'generated.py'), 'w') as f:
+            f.write(MODULE_HEADER)
+            for index in range(SORTS):
+                f.write(SORT_TEMPLATE.format(index=index))
+
+        # Compile the module to bytecode once and for all.
+        run(directory, STEW_CODE_CACHE='0')
+
+        results = {}
+        for name in ('no cache', 'cold cache', 'warm cache', 'lazy', 'lazy+calls'):
+            results[name] = []
+
+        for _ in range(REPEAT):
+            results['no cache'].append(run(directory, STEW_CODE_CACHE='0'))
+            clear_code_cache(directory)
+            results['cold cache'].append(run(directory))
+            results['warm cache'].append(run(directory))
+            results['lazy'].append(run(directory, STEW_CODE_CACHE='0', STEW_LAZY_OPERATIONS='1'))
+            results['lazy+calls'].append(
+                run(directory, call=True, STEW_CODE_CACHE='0', STEW_LAZY_OPERATIONS='1'))
+
+        print('%i operations' % (SORTS * 4))
+        for name, timings in results.items():
+            print('%-12s %8.2fms' % (name, min(timings) * 1e3))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Measures the cost of computing the reachable states of a system of two
+bounded counters with the naive fixpoint, whose step is an operation that
+is evaluated again on each iteration, and whose step is memoized with
+`memoized`, so that it is only evaluated once per state.
+
+Usage: python -m benchmarks.bench_memoized
+"""
+
+from timeit import default_timer
+
+from stew.core import operation
+from stew.matching import var
+from stew.strategies import fixpoint, identity, make_strategy, memoized, try_, union
+from stew.types.nat import Nat
+
+
+BOUND = Nat(12)
+
+
+@operation
+def increment(n: Nat) -> Nat:
+    if n < BOUND:
+        return n + Nat(1)
+
+
+def first(state):
+    (x, y) = (state._value // 100, state._value % 100)
+    return Nat(increment(Nat(x))._value * 100 + y)
+
+
+def second(state):
+    (x, y) = (state._value // 100, state._value % 100)
+    return Nat(x * 100 + increment(Nat(y))._value)
+
+
+def main():
+    steps = (try_(make_strategy(first)), try_(make_strategy(second)))
+    for name, (f, g) in (('plain', steps), ('memoized', [memoized(step) for step in steps])):
+        strategy = fixpoint(union(identity, f, g))
+        start = default_timer()
+        states = strategy(Nat(0))
+        elapsed = default_timer() - start
+        assert len(states) == (BOUND._value + 1) ** 2
+
+        print('%-9s %8.3fs' % (name, elapsed))
+        if name == 'memoized':
+            print(f.cache)
+
+
+if __name__ == '__main__':
+    main()
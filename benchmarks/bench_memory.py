@@ -0,0 +1,77 @@
+"""
+Measures the memory used by generator-built terms, compared to the layout
+they had before they were stored in slots (an instance dictionary, plus a
+dictionary of arguments indexed by parameter name).
+
+The sizes of the parts of a binary node are printed as well: the object
+itself, the tuple of its arguments, and its cached hash.
+
+Usage: python -m benchmarks.bench_memory
+"""
+
+import sys
+import tracemalloc
+
+from stew.core import Sort, generator
+
+
+NODES = 10 ** 6
+
+
+class T(Sort):
+
+    @generator
+    def leaf() -> T: pass
+
+    @generator
+    def node(left: T, right: T) -> T: pass
+
+
+class LegacyTerm(object):
+
+    def __init__(self, generator, generator_args):
+        self._generator = generator
+        self._generator_args = generator_args
+        self._hash = hash((generator,) + tuple((generator_args or {}).items()))
+
+    def __hash__(self):
+        return self._hash
+
+
+def build_terms():
+    # Build a left comb, so that no subterm is shared.
+    term = T.leaf()
+    for _ in range(NODES // 2):
+        term = T.node(left=term, right=T.leaf())
+    return term
+
+
+def build_legacy_terms():
+    term = LegacyTerm(T.leaf, None)
+    for _ in range(NODES // 2):
+        term = LegacyTerm(T.node, {'left': term, 'right': LegacyTerm(T.leaf, None)})
+    return term
+
+
+def measure(builder):
+    tracemalloc.start()
+    term = builder()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / NODES
+
+
+def main():
+    legacy = measure(build_legacy_terms)
+    slotted = measure(build_terms)
+    print('%-10s %8.1f bytes/node' % ('legacy', legacy))
+    print('%-10s %8.1f bytes/node' % ('slots', slotted))
+    print('%-10s %8.2fx' % ('ratio', legacy / slotted))
+
+    node = T.node(left=T.leaf(), right=T.leaf())
+    for name, part in (('object', node), ('arguments', node._args), ('hash', node._hash)):
+        print('%-10s %8i bytes' % (name, sys.getsizeof(part)))
+
+
+if __name__ == '__main__':
+    main()
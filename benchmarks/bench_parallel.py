@@ -0,0 +1,93 @@
+"""
+Measures the scaling of set operations evaluated in parallel, from one worker
+up to the number of available cores, on a strategy that rewrites each term
+of a large set of terms.
+
+Usage: python -m benchmarks.bench_parallel [backend]
+"""
+
+import os
+import sys
+
+from timeit import default_timer
+
+from stew.core import Sort, generator, operation
+from stew.matching import var
+from stew.strategies import make_strategy, parallelism
+
+
+TERMS = 2000
+REPEAT = 4
+
+
+class Peano(Sort):
+
+    @generator
+    def zero() -> Peano: pass
+
+    @generator
+    def suc(self: Peano) -> Peano: pass
+
+    @operation
+    def __add__(self: Peano, other: Peano) -> Peano:
+        if self == Peano.zero():
+            return other
+        if self == Peano.suc(var.x):
+            return Peano.suc(var.x + other)
+
+
+class Digits(Sort):
+
+    @generator
+    def nil() -> Digits: pass
+
+    @generator
+    def cons(head: Peano, tail: Digits) -> Digits: pass
+
+    @operation
+    def total(self: Digits) -> Peano:
+        if self == Digits.nil():
+            return Peano.zero()
+        if self == Digits.cons(head=var.x, tail=var.y):
+            return var.x + var.y.total()
+
+
+def peano(value):
+    rv = Peano.zero()
+    for _ in range(value):
+        rv = Peano.suc(rv)
+    return rv
+
+
+def digits(value):
+    # The digits of a number, repeated a few times.
+    rv = Digits.nil()
+    for digit in str(value) * REPEAT:
+        rv = Digits.cons(head=peano(int(digit)), tail=rv)
+    return rv
+
+
+# Each term is rewritten to the sum of its digits.
+total = make_strategy(Digits.total)
+
+
+def main():
+    backend = sys.argv[1] if len(sys.argv) > 1 else 'process'
+    terms = {digits(index) for index in range(TERMS)}
+
+    start = default_timer()
+    expected = total(terms)
+    sequential = default_timer() - start
+    print('%-7s %2i worker  %8.3fs' % ('-', 1, sequential))
+
+    for workers in range(2, max(2, os.cpu_count() or 1) + 1):
+        with parallelism(workers, backend=backend):
+            start = default_timer()
+            assert total(terms) == expected
+            elapsed = default_timer() - start
+        print('%-7s %2i workers %8.3fs (x%.2f)' % (
+            backend, workers, elapsed, sequential / elapsed))
+
+
+if __name__ == '__main__':
+    main()
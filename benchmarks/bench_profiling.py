@@ -0,0 +1,62 @@
+"""
+Measures the overhead of profiling on the evaluation of a recursive
+operation: before profiling is ever enabled, once it has been disabled, and
+while it is enabled, with and without the statistics of the branches.
+
+Usage: python -m benchmarks.bench_profiling
+"""
+
+from timeit import default_timer
+
+from stew.core import Sort, generator, operation
+from stew.matching import var
+from stew.profiling import profiling
+from stew.types.nat import Nat
+
+
+LENGTH = 50
+REPEAT = 50
+
+
+class List(Sort):
+
+    @generator
+    def nil() -> List: pass
+
+    @generator
+    def cons(head: Nat, tail: List) -> List: pass
+
+    @operation
+    def length(self: List) -> Nat:
+        if self == List.nil():
+            return Nat(0)
+        if self == List.cons(head=var.h, tail=var.t):
+            return Nat(1) + var.t.length()
+
+
+def measure(term):
+    timings = []
+    for _ in range(REPEAT):
+        start = default_timer()
+        term.length()
+        timings.append(default_timer() - start)
+    return min(timings)
+
+
+def main():
+    term = List.nil()
+    for index in range(LENGTH):
+        term = List.cons(head=Nat(index), tail=term)
+
+    print('%-12s %8.3fms' % ('baseline', measure(term) * 1e3))
+    with profiling(branches=False):
+        print('%-12s %8.3fms' % ('calls', measure(term) * 1e3))
+    with profiling() as profile:
+        print('%-12s %8.3fms' % ('branches', measure(term) * 1e3))
+    print('%-12s %8.3fms' % ('disabled', measure(term) * 1e3))
+    print()
+    print(profile.report())
+
+
+if __name__ == '__main__':
+    main()
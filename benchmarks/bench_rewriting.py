@@ -0,0 +1,71 @@
+"""
+Compares the rewriting engine, with both of its strategies, to the Python
+implementation of the operations of Bool and of a copy of Nat that only has
+its rewriting semantics (see bench_dispatch).
+
+Usage: python -m benchmarks.bench_rewriting
+"""
+
+from timeit import default_timer
+
+from stew.translators.rewriting import RewritingEngine
+from stew.types.bool import Bool
+
+from .bench_dispatch import Peano, peano
+
+
+REPEAT = 10
+
+
+def bool_calls():
+    rv = []
+    for lhs in (Bool.true(), Bool.false()):
+        rv.append((Bool.__invert__, (lhs,)))
+        for rhs in (Bool.true(), Bool.false()):
+            for operation in (Bool.__and__, Bool.__or__, Bool.__xor__):
+                rv.append((operation, (lhs, rhs)))
+    return rv
+
+
+def peano_calls():
+    numbers = [peano(i) for i in range(12)]
+    rv = []
+    for lhs in numbers[:5]:
+        for rhs in numbers[1:4]:
+            for operation in (
+                    Peano.__add__, Peano.__mul__, Peano.__lt__, Peano.__gt__,
+                    Peano.__truediv__, Peano.__mod__):
+                rv.append((operation, (lhs, rhs)))
+    rv.append((Peano.__mul__, (numbers[11], numbers[11])))
+    return rv
+
+
+def timed(fn, calls):
+    def run():
+        for operation, args in calls:
+            fn(operation, *args)
+
+    run()
+    start = default_timer()
+    for _ in range(REPEAT):
+        run()
+    return (default_timer() - start) / REPEAT
+
+
+def main():
+    engines = {}
+    for strategy in ('innermost', 'outermost'):
+        engines[strategy] = RewritingEngine(strategy)
+        engines[strategy].register(Bool)
+        engines[strategy].register(Peano)
+        engines[strategy].translate()
+
+    for name, calls in (('bool', bool_calls()), ('peano', peano_calls())):
+        print('%-8s %-10s %10.3fms' % (
+            name, 'python', timed(lambda operation, *args: operation(*args), calls) * 1e3))
+        for strategy, engine in engines.items():
+            print('%-8s %-10s %10.3fms' % (name, strategy, timed(engine.apply, calls) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Measures the size and the cost of serializing a set of terms that share most
+of their structure, with a `TermWriter` (which encodes the shared subterms
+once for the whole set) and with pickle (which encodes each term on its
+own).
+
+Usage: python -m benchmarks.bench_serialization
+"""
+
+import io
+import pickle
+
+from timeit import default_timer
+
+from stew.core import Sort, generator
+from stew.serialization import dump, load
+from stew.types.nat import Nat
+
+
+STATES = 10000
+LENGTH = 100
+
+
+class List(Sort):
+
+    @generator
+    def nil() -> List: pass
+
+    @generator
+    def cons(head: Nat, tail: List) -> List: pass
+
+
+def make_states():
+    # States that differ by their first element only.
+    tail = List.nil()
+    for index in range(LENGTH):
+        tail = List.cons(head=Nat(index), tail=tail)
+    return [List.cons(head=Nat(index), tail=tail) for index in range(STATES)]
+
+
+def with_term_writer(states):
+    stream = io.BytesIO()
+    dump(states, stream)
+    data = stream.getvalue()
+    return (data, lambda: load(io.BytesIO(data)))
+
+
+def with_pickle(states):
+    data = pickle.dumps(states)
+    return (data, lambda: pickle.loads(data))
+
+
+def main():
+    states = make_states()
+    for name, serialize in (('stew', with_term_writer), ('pickle', with_pickle)):
+        start = default_timer()
+        (data, deserialize) = serialize(states)
+        dump_time = default_timer() - start
+
+        start = default_timer()
+        assert len(deserialize()) == STATES
+        load_time = default_timer() - start
+
+        print('%-7s %10i bytes %8.2fus/state (dump) %8.2fus/state (load)' % (
+            name, len(data), dump_time * 1e6 / STATES, load_time * 1e6 / STATES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Measures the cost of evaluating strategies node by node and once compiled
+with `compile_strategy`, on a union of rewriting steps applied to a large
+set of terms, and on the fixpoint of such a union.
+
+Usage: python -m benchmarks.bench_strategies
+"""
+
+from timeit import default_timer
+
+from stew.strategies import compile_strategy, fixpoint, identity, make_strategy, try_, union
+from stew.types.nat import Nat
+
+
+TERMS = 20000
+BOUND = 2000
+REPEAT = 3
+
+
+def step(delta):
+    def apply(term):
+        value = term._value + delta
+        return Nat(value) if value < BOUND else None
+    apply.__name__ = 'add_%i' % delta
+    return make_strategy(apply)
+
+
+def main():
+    steps = union(identity, try_(step(1)), union(try_(step(2)), try_(step(3))))
+    workloads = (
+        ('union', steps, {Nat(index) for index in range(TERMS)}),
+        ('fixpoint', fixpoint(steps), Nat(0)),
+    )
+
+    for name, strategy, terms in workloads:
+        for variant, evaluated in (('interpreted', strategy),
+                                   ('compiled', compile_strategy(strategy))):
+            timings = []
+            for _ in range(REPEAT):
+                start = default_timer()
+                evaluated(terms)
+                timings.append(default_timer() - start)
+            print('%-9s %-12s %8.3fs' % (name, variant, min(timings)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Measures the time it takes to find the first reachable state of a system of
+two bounded counters that satisfies a predicate, by computing all of them
+with `apply` and by streaming them with `first`.
+
+Usage: python -m benchmarks.bench_streaming
+"""
+
+from timeit import default_timer
+
+from stew.strategies import first, identity, make_strategy, semi_naive_fixpoint, union
+from stew.types.nat import Nat
+
+
+BOUND = 300
+
+
+def step(state):
+    # States encode the values (x, y) of the counters as x * BOUND + y.
+    (x, y) = divmod(state._value, BOUND)
+    rv = set()
+    if x + 1 < BOUND:
+        rv.add(Nat((x + 1) * BOUND + y))
+    if y + 1 < BOUND:
+        rv.add(Nat(x * BOUND + y + 1))
+    return rv or state
+
+
+def is_target(state):
+    return state._value == 10 * BOUND + 10
+
+
+def main():
+    strategy = semi_naive_fixpoint(union(identity, make_strategy(step)))
+
+    start = default_timer()
+    states = strategy.apply(Nat(0))
+    assert any(is_target(state) for state in states)
+    print('%-6s %8.3fs' % ('apply', default_timer() - start))
+
+    start = default_timer()
+    assert is_target(first(strategy, Nat(0), is_target))
+    print('%-6s %8.3fs' % ('first', default_timer() - start))
+
+
+if __name__ == '__main__':
+    main()
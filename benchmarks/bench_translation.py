@@ -0,0 +1,95 @@
+"""
+Measures the cost of translating signatures of growing sizes, made of copies
+of a sort of natural numbers defined in a generated module, whose operations
+all refer to the sorts of the module.
+
+Usage: python -m benchmarks.bench_translation
+"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+
+from timeit import default_timer
+
+from stew.translators.translator import Translator
+
+
+SIZES = (10, 50, 200)
+REPEAT = 3
+
+TEMPLATE = '''
+class Nat{index}(Sort):
+
+    @generator
+    def zero() -> Nat{index}: pass
+
+    @generator
+    def suc(self: Nat{index}) -> Nat{index}: pass
+
+    @operation
+    def __add__(self: Nat{index}, other: Nat{index}) -> Nat{index}:
+        if self == Nat{index}.zero():
+            return other
+        if self == Nat{index}.suc(var.x):
+            return Nat{index}.suc(var.x + other)
+
+    @operation
+    def __sub__(self: Nat{index}, other: Nat{index}) -> Nat{index}:
+        if other == Nat{index}.zero():
+            return self
+        if self == Nat{index}.suc(var.x) and other == Nat{index}.suc(var.y):
+            return var.x - var.y
+
+    @operation
+    def __lt__(self: Nat{index}, other: Nat{index}) -> Bool:
+        if (self == Nat{index}.zero()) and (other == Nat{index}.suc(var.y)):
+            return Bool.true()
+        if (self == Nat{index}.suc(var.x)) and (other == Nat{index}.suc(var.y)):
+            return var.x < var.y
+        return Bool.false()
+'''
+
+
+def make_module(directory, size):
+    name = 'signature_%i' % size
+    path = os.path.join(directory, name + '.py')
+    with open(path, 'w') as f:
+        f.write('from stew.core import Sort, generator, operation\n')
+        f.write('from stew.matching import var\n')
+        f.write('from stew.types.bool import Bool\n')
+        for index in range(size):
+            f.write(TEMPLATE.format(index=index))
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return [getattr(module, 'Nat%i' % index) for index in range(size)]
+
+
+def translate(sorts):
+    translator = Translator()
+    for sort in sorts:
+        translator.register(sort)
+    translator.translate()
+    return translator
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            sorts = make_module(directory, size)
+            timings = []
+            for _ in range(REPEAT):
+                start = default_timer()
+                translator = translate(sorts)
+                timings.append(default_timer() - start)
+
+            axioms = sum(len(axioms) for axioms in translator.axioms.values())
+            print('%5i sorts %6i axioms %10.3fs' % (size, axioms, min(timings)))
+
+
+if __name__ == '__main__':
+    main()
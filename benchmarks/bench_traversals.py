@@ -0,0 +1,119 @@
+"""
+Compares the stack-based traversals of terms (matching, hashing, printing)
+with the recursive implementations they replaced.
+
+Usage: python -m benchmarks.bench_traversals
+"""
+
+import sys
+
+from timeit import default_timer
+
+from stew.core import Sort, generator
+from stew.matching import Var, push_context, var
+
+
+DEPTHS = (10, 100, 900)
+REPEAT = 100
+
+
+class S(Sort):
+
+    @generator
+    def nil() -> S: pass
+
+    @generator
+    def suc(self: S) -> S: pass
+
+
+def make_term(depth, leaf=None):
+    term = leaf or S.nil()
+    for _ in range(depth):
+        term = S.suc(term)
+    return term
+
+
+def recursive_matches(lhs, rhs):
+    if isinstance(rhs, Var):
+        if isinstance(getattr(var, rhs.name), Var):
+            setattr(var, rhs.name, lhs)
+            return True
+        return recursive_matches(lhs, getattr(var, rhs.name))
+
+    if lhs._generator != rhs._generator:
+        return False
+    for lhs_arg, rhs_arg in zip(lhs._args, rhs._args):
+        if not recursive_matches(lhs_arg, rhs_arg):
+            return False
+    return True
+
+
+def recursive_hash(term):
+    return hash((term._generator,) + tuple(recursive_hash(arg) for arg in term._args))
+
+
+def recursive_str(term):
+    if not term._args:
+        return term._generator._fn.__qualname__
+    args = ', '.join(
+        '%s: %s' % (name, recursive_str(arg))
+        for name, arg in zip(term._generator.domain, term._args))
+    return term._generator._fn.__qualname__ + '(' + args + ')'
+
+
+def in_context(matcher):
+    def match(lhs, rhs):
+        with push_context():
+            return matcher(lhs, rhs)
+    return match
+
+
+def timed(fn, *args):
+    start = default_timer()
+    for _ in range(REPEAT):
+        fn(*args)
+    return (default_timer() - start) / REPEAT
+
+
+def reset_hash(term):
+    subterm = term
+    while subterm._args:
+        subterm._hash = None
+        subterm = subterm._args[0]
+
+
+def uncached_hash(term):
+    # Hashes the term from scratch, by resetting the hash of its subterms.
+    reset_hash(term)
+    return hash(term)
+
+
+def main():
+    sys.setrecursionlimit(10000)
+
+    print('%-8s %6s %12s %12s %8s' % ('', 'depth', 'recursive', 'stack', 'speedup'))
+    for depth in DEPTHS:
+        lhs = make_term(depth)
+        rhs = make_term(depth)
+
+        with push_context():
+            pattern = make_term(depth - 1, S.suc(var.x))
+
+        results = [
+            ('matches', timed(recursive_matches, lhs, rhs), timed(S.__eq__, lhs, rhs)),
+            ('pattern',
+                timed(in_context(recursive_matches), lhs, pattern),
+                timed(in_context(S.__eq__), lhs, pattern)),
+            ('hash',
+                timed(recursive_hash, lhs),
+                timed(uncached_hash, lhs) - timed(reset_hash, lhs)),
+            ('str', timed(recursive_str, lhs), timed(str, lhs)),
+        ]
+
+        for name, recursive, stack in results:
+            print('%-8s %6i %10.2fus %10.2fus %7.2fx' % (
+                name, depth, recursive * 1e6, stack * 1e6, recursive / stack))
+
+
+if __name__ == '__main__':
+    main()
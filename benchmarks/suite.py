@@ -0,0 +1,316 @@
+"""
+A suite of benchmarks of the core of stew, each run on workloads of growing
+sizes, whose results are written as JSON so that two runs can be compared.
+
+A benchmark is a function that takes the size of its workload and returns a
+function running it, so that setting the workload up isn't measured. Each
+workload is run enough times for a timing to last at least `MIN_TIME`, and
+its timings are repeated; the best and the median times per run are kept.
+
+Comparing two runs reports, for each workload they have in common, the ratio
+of their best times, and flags the workloads whose time grew by more than a
+threshold. The comparison exits with a non-zero status if any workload has
+regressed.
+
+Usage: python -m benchmarks.suite run [-o results.json] [-k filter] [--repeat N]
+       python -m benchmarks.suite compare baseline.json results.json [--threshold 0.1]
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+from timeit import default_timer
+
+from stew.core import Sort, generator
+from stew.matching import Var, matches, push_context
+from stew.strategies import fixpoint, identity, make_strategy, try_, union
+from stew.types.bool import Bool
+from stew.types.nat import Nat
+
+from .bench_dispatch import peano
+
+
+FORMAT_VERSION = 1
+
+MIN_TIME = 0.05
+REPEAT = 5
+THRESHOLD = 0.1
+
+# The registered benchmarks, as (name, sizes, function) triples.
+_benchmarks = []
+
+
+def benchmark(name, sizes):
+    """Registers a benchmark, to be run on workloads of the given sizes."""
+
+    def decorate(fn):
+        _benchmarks.append((name, sizes, fn))
+        return fn
+    return decorate
+
+
+class List(Sort):
+
+    @generator
+    def nil() -> List: pass
+
+    @generator
+    def cons(head: Nat, tail: List) -> List: pass
+
+
+def make_list(length, last=None):
+    term = List.nil() if (last is None) else last
+    for index in range(length):
+        term = List.cons(head=Nat(index % 10), tail=term)
+    return term
+
+
+def make_digits(number):
+    term = List.nil()
+    while True:
+        term = List.cons(head=Nat(number % 10), tail=term)
+        number //= 10
+        if number == 0:
+            return term
+
+
+def make_nat(depth):
+    term = Nat.zero()
+    for _ in range(depth):
+        term = Nat.suc(term)
+    return term
+
+
+def step(delta, bound):
+    def apply(term):
+        value = term._value + delta
+        return Nat(value) if value < bound else None
+    apply.__name__ = 'add_%i' % delta
+    return make_strategy(apply)
+
+
+@benchmark('construction/list', sizes=(10, 100, 1000))
+def bench_construction(size):
+    return lambda: make_list(size)
+
+
+@benchmark('matching/equal', sizes=(10, 100, 1000))
+def bench_matching_equal(size):
+    # Distinct but structurally equal terms are matched node by node.
+    (lhs, rhs) = (make_list(size), make_list(size))
+
+    def run():
+        with push_context():
+            matches(lhs, rhs)
+    return run
+
+
+@benchmark('matching/variable', sizes=(10, 100, 1000))
+def bench_matching_variable(size):
+    term = make_list(size, last=List.cons(head=Nat(0), tail=List.nil()))
+    pattern = make_list(size, last=Var('rest'))
+
+    def run():
+        with push_context():
+            matches(term, pattern)
+    return run
+
+
+@benchmark('arithmetic/nat', sizes=(10, 1000, 10 ** 5))
+def bench_nat(size):
+    (lhs, rhs) = (Nat(size), Nat(size // 3 + 1))
+
+    def run():
+        (lhs + rhs, lhs - rhs, lhs * rhs, lhs / rhs, lhs % rhs, lhs < rhs, lhs >= rhs)
+    return run
+
+
+@benchmark('arithmetic/bool', sizes=(10, 100, 1000))
+def bench_bool(size):
+    values = [Bool.true() if (index % 3) else Bool.false() for index in range(size)]
+
+    def run():
+        rv = Bool.true()
+        for value in values:
+            rv = ~((rv & value) | (rv ^ value))
+        return rv
+    return run
+
+
+@benchmark('dispatch/peano', sizes=(10, 30, 100))
+def bench_dispatch(size):
+    (lhs, rhs) = (peano(size), peano(size // 2))
+
+    def run():
+        (lhs + rhs, lhs - rhs, lhs < rhs, rhs < lhs)
+    return run
+
+
+@benchmark('strategies/union', sizes=(100, 1000, 10000))
+def bench_union(size):
+    strategy = union(
+        identity, try_(step(1, size)), union(try_(step(2, size)), try_(step(3, size))))
+    terms = {Nat(index) for index in range(size)}
+    return lambda: strategy(terms)
+
+
+@benchmark('strategies/fixpoint', sizes=(10, 100, 300))
+def bench_fixpoint(size):
+    strategy = fixpoint(union(identity, try_(step(1, size)), try_(step(2, size))))
+    term = Nat(0)
+    return lambda: strategy(term)
+
+
+@benchmark('hashing/deep', sizes=(100, 1000, 10000))
+def bench_hashing(size):
+    # Terms cache their hash, hence a new term is built for every run.
+    return lambda: hash(make_nat(size))
+
+
+@benchmark('hashing/membership', sizes=(100, 1000, 10000))
+def bench_membership(size):
+    # Half of the probes are equal to a term of the set.
+    terms = {make_digits(index) for index in range(size)}
+    probes = [make_digits(index) for index in range(0, 2 * size, 2)]
+
+    def run():
+        return sum(1 for probe in probes if probe in terms)
+    return run
+
+
+def measure(fn, repeat=REPEAT, min_time=MIN_TIME):
+    """Returns the timings of a function, in seconds per run."""
+
+    # Find how many runs last at least `min_time`.
+    number = 1
+    while True:
+        start = default_timer()
+        for _ in range(number):
+            fn()
+        elapsed = default_timer() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if (elapsed < min_time / 10) else 2
+
+    timings = []
+    for _ in range(repeat):
+        start = default_timer()
+        for _ in range(number):
+            fn()
+        timings.append((default_timer() - start) / number)
+
+    return {
+        'best': min(timings),
+        'median': statistics.median(timings),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def run(names=None, repeat=REPEAT, min_time=MIN_TIME, out=None):
+    """
+    Runs the benchmarks whose name contains one of the given filters (or all
+    of them), and returns their results.
+    """
+
+    results = {}
+    for name, sizes, fn in _benchmarks:
+        if names and not any(pattern in name for pattern in names):
+            continue
+        for size in sizes:
+            key = '%s[%i]' % (name, size)
+            results[key] = measure(fn(size), repeat, min_time)
+            if out is not None:
+                out.write('%-32s %12.3fus %12.3fus\n' % (
+                    key, results[key]['best'] * 1e6, results[key]['median'] * 1e6))
+
+    return {
+        'version': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """
+    Compares the results of two runs, and returns a list of (key, baseline
+    time, current time, ratio, status) tuples, where the status is either
+    'regression', 'improvement' or 'unchanged', depending on whether the
+    best time changed by more than the threshold.
+    """
+
+    for results in (baseline, current):
+        if results.get('version') != FORMAT_VERSION:
+            raise ValueError('unsupported results version: %r' % results.get('version'))
+
+    rv = []
+    for key, before in baseline['results'].items():
+        after = current['results'].get(key)
+        if after is None:
+            continue
+        ratio = after['best'] / before['best']
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold):
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        rv.append((key, before['best'], after['best'], ratio, status))
+    return rv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.suite', description='Runs and compares benchmarks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-o', '--output', help='the file to write the results to')
+    run_parser.add_argument(
+        '-k', dest='filters', action='append',
+        help='only run the benchmarks whose name contains this string')
+    run_parser.add_argument('--repeat', type=int, default=REPEAT)
+    run_parser.add_argument('--min-time', type=float, default=MIN_TIME)
+
+    compare_parser = commands.add_parser('compare', help='compare the results of two runs')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument(
+        '--threshold', type=float, default=THRESHOLD,
+        help='the relative slowdown above which a benchmark has regressed')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run(args.filters, args.repeat, args.min_time, out=sys.stdout)
+        if args.output is not None:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold)
+    for key, before, after, ratio, status in rows:
+        print('%-32s %12.3fus %12.3fus %7.2fx  %s' % (
+            key, before * 1e6, after * 1e6, ratio, status))
+
+    regressions = [row for row in rows if row[4] == 'regression']
+    if regressions:
+        print('%i regression(s) above %.0f%%' % (len(regressions), args.threshold * 100))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
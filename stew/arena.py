@@ -0,0 +1,405 @@
+"""
+Memory-mapped, read-only stores of terms.
+
+An arena file stores terms as flat arrays, indexed by node: the code of the
+symbol each node is built with (a generator, the attributes of a sort, or a
+native value), and a payload that is either the position of the children of
+the node in the array of children, or its native value. Nodes are stored
+once, as a directed acyclic graph, and the children of a node always precede
+it.
+
+Opening an arena doesn't read its nodes. Its terms are exposed as views,
+that are instances of (a subclass of) the sort of the term they stand for,
+and whose subterms are only materialized when they are accessed. Hashing a
+view is computed from the arrays of the arena, and matching a view against
+a pattern only materializes the nodes that the pattern inspects.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from weakref import WeakValueDictionary
+
+from .core import Sort, _make_term
+from .exceptions import SerializationError
+from .serialization import _resolve, _sort_name, _sort_of, _unzigzag, _zigzag
+
+
+MAGIC = b'STEWARN1'
+
+# magic, number of nodes, number of children, number of roots, size of the
+# metadata.
+_HEADER = struct.Struct('<8sQQQQ')
+
+# Kinds of symbols.
+(_GENERATOR, _RECORD, _NATIVE, _BIG_NATIVE) = ('generator', 'record', 'native', 'big_native')
+
+_MAX_NATIVE = (1 << 64) - 1
+
+
+def write_arena(path, terms):
+    """Writes a collection of terms to an arena file."""
+
+    writer = _ArenaWriter()
+    roots = array('Q', [writer.add(term) for term in terms])
+
+    metadata = json.dumps({
+        'byteorder': sys.byteorder,
+        'symbols': writer.symbols,
+        'big_natives': writer.big_natives,
+    }).encode('utf-8')
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(
+            MAGIC, len(writer.codes), len(writer.children), len(roots), len(metadata)))
+        for section in (metadata, writer.codes.tobytes(), writer.payloads.tobytes(),
+                        writer.children.tobytes(), roots.tobytes()):
+            f.write(section)
+            f.write(b'\0' * (-len(section) % 8))
+
+
+class _ArenaWriter(object):
+
+    def __init__(self):
+        self.symbols = []
+        self.big_natives = []
+        self.codes = array('I')
+        self.payloads = array('Q')
+        self.children = array('Q')
+        self._symbols = {}
+        self._nodes = {}
+
+    def add(self, root):
+        # Add the subterms before the terms that refer to them, from an
+        # explicit stack so that deep terms can be written without recursion.
+        nodes = self._nodes
+        stack = [root]
+        while stack:
+            term = stack[-1]
+            if not isinstance(term, Sort):
+                raise SerializationError('cannot store %r' % (term,))
+            try:
+                if term in nodes:
+                    stack.pop()
+                    continue
+            except TypeError:
+                # Terms that contain variables aren't hashable.
+                raise SerializationError('cannot store terms with variables')
+
+            native = term._to_native()
+            if native is not None:
+                stack.pop()
+                value = _zigzag(native)
+                if value <= _MAX_NATIVE:
+                    self._add_node(term, self._symbol(_NATIVE, term), value)
+                else:
+                    self.big_natives.append(str(native))
+                    self._add_node(
+                        term, self._symbol(_BIG_NATIVE, term), len(self.big_natives) - 1)
+                continue
+
+            subterms = term._args if (term._generator is not None) else term._subterms()
+            pending = False
+            for subterm in subterms:
+                if not isinstance(subterm, Sort):
+                    raise SerializationError('cannot store %r' % (subterm,))
+                if subterm not in nodes:
+                    stack.append(subterm)
+                    pending = True
+            if pending:
+                continue
+
+            stack.pop()
+            kind = _GENERATOR if (term._generator is not None) else _RECORD
+            self._add_node(term, self._symbol(kind, term), len(self.children))
+            self.children.extend([nodes[subterm] for subterm in subterms])
+
+        return nodes[root]
+
+    def _symbol(self, kind, term):
+        # Return the code of the symbol a term is built with, indexed by its
+        # generator or its sort.
+        key = term._generator if (kind == _GENERATOR) else (kind, term.__class__)
+        try:
+            return self._symbols[key]
+        except KeyError:
+            pass
+
+        sort = _sort_of(term)
+        if kind == _GENERATOR:
+            name = term._generator._fn.__name__
+            if getattr(sort, name, None) is not term._generator:
+                raise SerializationError(
+                    "generator '%s' cannot be referred to by its name" %
+                    term._generator._fn.__qualname__)
+            symbol = (kind, _sort_name(sort), name)
+        else:
+            symbol = (kind, _sort_name(sort))
+
+        code = self._symbols[key] = len(self.symbols)
+        self.symbols.append(symbol)
+        return code
+
+    def _add_node(self, term, code, payload):
+        self._nodes[term] = len(self.codes)
+        self.codes.append(code)
+        self.payloads.append(payload)
+
+
+class Arena(object):
+    """
+    A read-only store of terms, mapped in memory from an arena file.
+
+    The arena is a sequence of its root terms. Views on its terms refer to
+    the memory mapped file, which must therefore stay open for as long as
+    they are used.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            # Empty files can't be mapped.
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise SerializationError('not an arena file')
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, node_count, children_count, root_count, metadata_size) = (
+            _HEADER.unpack_from(self._mmap))
+        if magic != MAGIC:
+            self._mmap.close()
+            raise SerializationError('not an arena file')
+
+        size = (_HEADER.size + _padded(metadata_size) + _padded(node_count * 4) +
+                (node_count + children_count + root_count) * 8)
+        if len(self._mmap) < size:
+            self._mmap.close()
+            raise SerializationError('truncated arena file')
+
+        buffer = memoryview(self._mmap)
+        offset = _HEADER.size
+        metadata = json.loads(bytes(buffer[offset:offset + metadata_size]).decode('utf-8'))
+        offset += _padded(metadata_size)
+        if metadata['byteorder'] != sys.byteorder:
+            buffer.release()
+            self._mmap.close()
+            raise SerializationError('the arena was written with a different byte order')
+
+        self._codes = buffer[offset:offset + node_count * 4].cast('I')
+        offset += _padded(node_count * 4)
+        self._payloads = buffer[offset:offset + node_count * 8].cast('Q')
+        offset += node_count * 8
+        self._children = buffer[offset:offset + children_count * 8].cast('Q')
+        offset += children_count * 8
+        self._roots = buffer[offset:offset + root_count * 8].cast('Q')
+        self._buffer = buffer
+
+        self._symbols = [self._load_symbol(symbol) for symbol in metadata['symbols']]
+        self._big_natives = [int(value) for value in metadata['big_natives']]
+        self._views = WeakValueDictionary()
+        self._hashes = {}
+
+    def __len__(self):
+        return len(self._roots)
+
+    def __getitem__(self, index):
+        return self.node(self._roots[index])
+
+    def __iter__(self):
+        for index in self._roots:
+            yield self.node(index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._views.clear()
+        for view in (self._codes, self._payloads, self._children, self._roots, self._buffer):
+            view.release()
+        self._mmap.close()
+
+    def node(self, index):
+        """Returns the term stored at the given node."""
+
+        try:
+            return self._views[index]
+        except KeyError:
+            pass
+
+        (kind, sort, generator, arity) = self._symbols[self._codes[index]]
+        if kind == _NATIVE:
+            rv = sort._from_native(_unzigzag(self._payloads[index]))
+        elif kind == _BIG_NATIVE:
+            rv = sort._from_native(self._big_natives[self._payloads[index]])
+        elif arity == 0:
+            rv = _make_term(generator, ()) if (kind == _GENERATOR) else sort()
+        else:
+            rv = object.__new__(_view_class(sort))
+            rv._generator = generator
+            rv._hash = None
+            rv._interned = False
+            rv._arena = self
+            rv._index = index
+            if kind == _RECORD:
+                # The attributes of records are materialized when they are
+                # accessed (see `_LazyAttribute`).
+                rv._args = ()
+
+        self._views[index] = rv
+        return rv
+
+    def _subterms(self, index):
+        (_, _, _, arity) = self._symbols[self._codes[index]]
+        start = self._payloads[index]
+        return tuple([self.node(child) for child in self._children[start:start + arity]])
+
+    def _child(self, index, position):
+        return self.node(self._children[self._payloads[index] + position])
+
+    def _hash(self, root):
+        # Compute the hash of a node bottom-up, from the hashes of its
+        # children, without materializing them. The hash of a term built
+        # with a generator is the hash of the tuple of its generator and its
+        # arguments, which only depends on the hashes of its arguments, hence
+        # they can be substituted by objects that have the same hash.
+        hashes = self._hashes
+        stack = [root]
+        while stack:
+            index = stack[-1]
+            if index in hashes:
+                stack.pop()
+                continue
+
+            (kind, sort, generator, arity) = self._symbols[self._codes[index]]
+            if (kind in (_NATIVE, _BIG_NATIVE)) or (arity == 0) or (
+                    sort._structural_hash is not Sort._structural_hash):
+                # Sorts that hash their terms on their own have them
+                # materialized.
+                stack.pop()
+                hashes[index] = self.node(index)._structural_hash()
+                continue
+
+            start = self._payloads[index]
+            children = self._children[start:start + arity]
+            pending = [child for child in children if child not in hashes]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+            if kind == _GENERATOR:
+                hashes[index] = hash(
+                    (generator,) + tuple([_Hashed(hashes[child]) for child in children]))
+            else:
+                hashes[index] = hash(tuple(
+                    (name, _Hashed(hashes[child]))
+                    for name, child in zip(sort.__attributes__, children)))
+
+        return hashes[root]
+
+    def _load_symbol(self, symbol):
+        sort = _resolve(symbol[1])
+        if symbol[0] == _GENERATOR:
+            generator = getattr(sort, symbol[2])
+            return (_GENERATOR, sort, generator, len(generator.domain))
+        if symbol[0] == _RECORD:
+            return (_RECORD, sort, None, len(sort.__attributes__))
+        return (symbol[0], sort, None, 0)
+
+
+class _Hashed(object):
+
+    __slots__ = ('_hash',)
+
+    def __init__(self, hash):
+        self._hash = hash
+
+    def __hash__(self):
+        return self._hash
+
+
+class _LazyAttribute(object):
+
+    # Materializes an attribute of the views on records the first time it is
+    # accessed, and stores it in the view, which then shadows the descriptor.
+    # The class of the view still exposes the definition of the attribute.
+
+    def __init__(self, name, position, attribute):
+        self.name = name
+        self.position = position
+        self.attribute = attribute
+
+    def __get__(self, instance, owner=None):
+        if (instance is None) or (instance._generator is not None):
+            return self.attribute
+        try:
+            arena = instance._arena
+        except AttributeError:
+            raise AttributeError(self.name)
+        rv = instance.__dict__[self.name] = arena._child(instance._index, self.position)
+        return rv
+
+
+# Classes of the views on the terms of each sort.
+_view_classes = {}
+
+
+def _view_class(sort):
+    try:
+        return _view_classes[sort]
+    except KeyError:
+        pass
+
+    # Sorts that compute some of their attributes lazily (e.g. Nat) get to
+    # compute the attributes that aren't materialized by the view.
+    parent_getattr = getattr(sort, '__getattr__', None)
+
+    def __getattr__(self, name):
+        if name in ('_arena', '_index'):
+            raise AttributeError(name)
+
+        if name == '_args':
+            self._args = self._arena._subterms(self._index)
+            return self._args
+
+        if parent_getattr is not None:
+            return parent_getattr(self, name)
+        raise AttributeError(
+            "'%s' object has no attribute '%s'" % (sort.__name__, name))
+
+    def __hash__(self):
+        if self._hash is None:
+            try:
+                arena = self._arena
+            except AttributeError:
+                # The term has been created from the view (e.g. with
+                # `where()`) rather than by the arena.
+                return Sort.__hash__(self)
+            self._hash = arena._hash(self._index)
+        return self._hash
+
+    attrs = {
+        '__slots__': ('_arena', '_index'),
+        '__module__': sort.__module__,
+        '__qualname__': sort.__qualname__,
+        '__getattr__': __getattr__,
+        '__hash__': __hash__,
+        '_viewed_sort': sort,
+    }
+    for position, name in enumerate(sort.__attributes__):
+        attrs[name] = _LazyAttribute(name, position, getattr(sort, name))
+
+    # Bypass the metaclass of sorts, so that the view class inherits the
+    # generators and operations of its sort rather than redefining them.
+    rv = type.__new__(sort.__class__, sort.__name__, (sort,), attrs)
+    _view_classes[sort] = rv
+    return rv
+
+
+def _padded(size):
+    return size + (-size % 8)
@@ -0,0 +1,205 @@
+import hashlib
+import marshal
+import os
+import sys
+import threading
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A mapping of bounded size, that evicts its least recently used entries
+    once it is full.
+
+    The cache counts its hits, misses and evictions, so that its efficiency
+    can be monitored. Setting `maxsize` to None makes the cache unbounded.
+
+    Lookups and insertions are guarded by a lock, so that the cache can be
+    shared by operations evaluated in several threads (e.g. when memoization
+    is enabled along with the thread backend of parallelism). The lock is
+    reentrant, since it is held while keys are hashed and compared, which may
+    look the cache up again.
+    """
+
+    def __init__(self, maxsize=1024):
+        if (maxsize is not None) and (maxsize < 0):
+            raise ValueError('maxsize should be a positive number or None')
+
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if (self.maxsize is not None) and (len(self._entries) > self.maxsize):
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __getstate__(self):
+        # Locks can't be pickled, while memoized strategies, which hold their
+        # cache, can.
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    @property
+    def hit_rate(self):
+        """The ratio of lookups that hit the cache."""
+        lookups = self.hits + self.misses
+        return (self.hits / lookups) if lookups else 0.0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        return '%s(hits=%i, misses=%i, hit_rate=%.2f, evictions=%i, size=%i, maxsize=%s)' % (
+            self.__class__.__name__, self.hits, self.misses, self.hit_rate, self.evictions,
+            len(self._entries), self.maxsize)
+
+
+class CodeCache(object):
+    """
+    A cache of the code objects of rewritten operations.
+
+    Code objects are kept in memory, and persisted on disk in the
+    `__pycache__` directory next to the source file of the operations they
+    were compiled from, in the spirit of Python's own bytecode cache. Each
+    cache file records a digest of its source file and of the modules that
+    rewrite operations, so that it is invalidated whenever either changes.
+    """
+
+    def __init__(self, persistent=True):
+        self.persistent = persistent
+        self._files = {}
+
+    def get(self, filename, key):
+        entries = self._entries(filename)
+        if entries is None:
+            return None
+        return entries.get(key)
+
+    def put(self, filename, key, code):
+        entries = self._entries(filename)
+        if entries is not None:
+            entries[key] = code
+            self._files[filename][2] = True
+
+    def flush(self):
+        """Writes the cache files whose entries have changed."""
+
+        if not self.persistent:
+            return
+
+        for filename, state in self._files.items():
+            (digest, entries, dirty) = state
+            if (digest is None) or not dirty:
+                continue
+
+            path = _cache_path(filename)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = '%s.%i' % (path, os.getpid())
+                with open(tmp_path, 'wb') as f:
+                    marshal.dump((_CACHE_FORMAT, digest, entries), f)
+                os.replace(tmp_path, path)
+            except (OSError, ValueError):
+                # Like Python's bytecode cache, failing to write the cache
+                # isn't an error.
+                continue
+            state[2] = False
+
+    def clear(self):
+        self._files.clear()
+
+    def _entries(self, filename):
+        try:
+            return self._files[filename][1]
+        except KeyError:
+            pass
+
+        # Functions that weren't defined in a source file (e.g. in an
+        # interactive session) can't be cached, as their name and location
+        # don't identify their source.
+        try:
+            with open(filename, 'rb') as f:
+                digest = hashlib.sha1(_rewriter_digest() + f.read()).digest()
+        except (OSError, TypeError):
+            self._files[filename] = [None, None, False]
+            return None
+
+        entries = {}
+        if self.persistent:
+            try:
+                with open(_cache_path(filename), 'rb') as f:
+                    (cache_format, cache_digest, cache_entries) = marshal.load(f)
+                if (cache_format == _CACHE_FORMAT) and (cache_digest == digest):
+                    entries = cache_entries
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+
+        self._files[filename] = [digest, entries, False]
+        return entries
+
+
+# Version of the format of the cache files.
+_CACHE_FORMAT = 1
+
+# The modules whose source determines the code generated for operations, and
+# the digest of their source, computed once.
+_REWRITER_MODULES = ('core.py', 'dispatch.py')
+_rewriter = None
+
+
+def _rewriter_digest():
+    global _rewriter
+    if _rewriter is None:
+        digest = hashlib.sha1()
+        for name in _REWRITER_MODULES:
+            try:
+                with open(os.path.join(os.path.dirname(__file__), name), 'rb') as f:
+                    digest.update(f.read())
+            except OSError:
+                # Modules that can't be read (e.g. when stew is imported from
+                # an archive) are identified by the path of this one instead.
+                digest.update(__file__.encode('utf-8', 'surrogateescape'))
+        _rewriter = digest.digest()
+    return _rewriter
+
+
+def _cache_path(filename):
+    (directory, basename) = os.path.split(filename)
+    return os.path.join(
+        directory, '__pycache__', '%s.%s.stew' % (
+            os.path.splitext(basename)[0], sys.implementation.cache_tag))
@@ -1,18 +1,185 @@
 import ast
 import astunparse
+import atexit
+import copy
 import inspect
+import sys
 
 from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
 from functools import update_wrapper
-from types import FunctionType, MethodType
+from types import MethodType
+from weakref import WeakValueDictionary
 
-from .exceptions import ArgumentError, RewritingError
-from .matching import Var, push_context, matches, var
+from . import settings
+from .caching import CodeCache, LRUCache
+from .exceptions import ArgumentError, RewritingError, SerializationError
+from .matching import MatchingContext, Var, push_context, matches, var
 
 
 undefined = object()
 
 
+class _Failure(object):
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'failure'
+
+    def __reduce__(self):
+        return 'failure'
+
+
+# Result of the operations (and strategies) that don't apply to their
+# arguments, when they are applied with `apply()` rather than called.
+failure = _Failure()
+
+
+# Table of the interned (hash-consed) ground terms, indexed by their generator
+# and the identity of their arguments. Since interned terms can only have
+# interned arguments, two structurally equal interned terms are guaranteed to
+# be the same object.
+_intern_table = WeakValueDictionary()
+_hash_consing_enabled = False
+
+
+def set_hash_consing(enabled):
+    global _hash_consing_enabled
+    _hash_consing_enabled = bool(enabled)
+
+
+@contextmanager
+def hash_consing(enabled=True):
+    previous = _hash_consing_enabled
+    set_hash_consing(enabled)
+    try:
+        yield
+    finally:
+        set_hash_consing(previous)
+
+
+# Cache of the results of all operations that aren't memoized on their own,
+# used when memoization is enabled globally. Results are indexed by the
+# operation and its arguments.
+_operation_cache = None
+
+
+def set_memoization(enabled, maxsize=1024):
+    """
+    Enables or disables the memoization of all operations.
+
+    Operations that are memoized on their own (see `operation.memoize`) keep
+    using their own cache. Enabling memoization globally creates a new shared
+    cache, whose entries are evicted once it holds more than `maxsize`
+    results.
+    """
+
+    global _operation_cache
+    _operation_cache = LRUCache(maxsize) if enabled else None
+
+
+def operation_cache():
+    """Returns the cache shared by all operations, if any."""
+    return _operation_cache
+
+
+@contextmanager
+def memoization(enabled=True, maxsize=1024):
+    global _operation_cache
+    previous = _operation_cache
+    set_memoization(enabled, maxsize)
+    try:
+        yield _operation_cache
+    finally:
+        _operation_cache = previous
+
+
+# Cache of the code of rewritten operations, persisted on disk when the
+# interpreter exits so that importing the operations again doesn't have to
+# parse and compile their source.
+_code_cache = CodeCache(persistent=settings.CODE_CACHE)
+
+
+def _flush_code_cache():
+    # Respect Python's own setting for writing bytecode (e.g. `python -B`).
+    if not sys.dont_write_bytecode:
+        _code_cache.flush()
+
+
+atexit.register(_flush_code_cache)
+
+
+def code_cache():
+    """Returns the cache of the code of rewritten operations."""
+    return _code_cache
+
+
+def _intern(term):
+    # Only ground terms whose arguments are interned themselves can be
+    # interned, so that the table can be indexed by the arguments identity.
+    if not all(isinstance(arg, Sort) and arg._interned for arg in term._args):
+        return term
+    key = (term._generator,) + tuple(id(arg) for arg in term._args)
+
+    try:
+        return _intern_table[key]
+    except KeyError:
+        term._interned = True
+        _intern_table[key] = term
+        return term
+
+
+def _make_term(generator, args):
+    rv = object.__new__(generator.codomain)
+    rv._generator = generator
+    rv._args = args
+    rv._interned = False
+
+    # Compute the hash of the term from the (cached) hashes of its arguments.
+    # If one of them hasn't been hashed yet, the hash will be computed lazily,
+    # which also happens for terms that contain variables and therefore can't
+    # be hashed at all.
+    for arg in args:
+        if not isinstance(arg, Sort) or (arg._hash is None):
+            rv._hash = None
+            break
+    else:
+        rv._hash = rv._structural_hash()
+
+    if _hash_consing_enabled:
+        return _intern(rv)
+    return rv
+
+
+class GeneratorArguments(Mapping):
+    """
+    Read-only view on the arguments of a term, indexed by the name of the
+    parameters of its generator.
+    """
+
+    __slots__ = ('_term',)
+
+    def __init__(self, term):
+        self._term = term
+
+    def __getitem__(self, name):
+        try:
+            return self._term._args[self._term._generator.positions[name]]
+        except KeyError:
+            raise KeyError(name)
+
+    def __iter__(self):
+        return iter(self._term._generator.domain)
+
+    def __len__(self):
+        return len(self._term._args)
+
+
 class generator(object):
 
     def __init__(self, fn):
@@ -29,6 +196,10 @@ class generator(object):
         parameters = inspect.signature(fn).parameters
         self.domain = OrderedDict([(name, annotations[name]) for name in parameters])
 
+        # Terms store their arguments in a tuple, following the order of the
+        # generator domain.
+        self.positions = {name: index for index, name in enumerate(self.domain)}
+
     def __get__(self, instance, owner=None):
         if instance is None:
             return self
@@ -37,24 +208,21 @@ class generator(object):
         return self.__class__(new_fn)
 
     def __call__(self, *args, **kwargs):
-        rv = self.codomain()
-        rv._generator = self
-
         # If the domain of the generator is empty, make sure no argument
         # were passed to the function.
         if len(self.domain) == 0:
             if (len(args) > 0) or (len(kwargs) > 0):
                 raise ArgumentError('%s() takes no arguments' % self._fn.__qualname__)
-            return rv
+            return _make_term(self, ())
 
         # Allow to call generators with a single positional argument.
         if len(args) > 1:
             raise ArgumentError('use of multiple positional arguments is forbidden')
         if (len(self.domain) == 1) and (len(args) == 1):
-            kwargs.update([(list(self.domain.keys())[0], args[0])])
+            kwargs[next(iter(self.domain))] = args[0]
 
         # Look for the generator arguments.
-        rv._generator_args = {}
+        term_args = []
         missing = []
         for name, sort in self.domain.items():
             try:
@@ -68,13 +236,13 @@ class generator(object):
                     "'%s' should be a variable or a term of sort '%s'" %
                     (name, sort.__sortname__))
 
-            rv._generator_args[name] = kwargs[name]
+            term_args.append(value)
 
         if len(missing) > 0:
             raise ArgumentError(
                 '%s() missing argument(s): %s' % (self._fn.__qualname__, ', '.join(missing)))
 
-        return rv
+        return _make_term(self, tuple(term_args))
 
     def __str__(self):
         domain = ', '.join(
@@ -92,6 +260,12 @@ class operation(generator):
 
     def __init__(self, fn):
         super().__init__(fn)
+        self._native = None
+        self._cache = None
+
+        # Remember where the operation is defined, so that its errors can be
+        # reported without having to inspect its source file.
+        self._source = _source_location(fn)
 
         if not hasattr(fn, '_original'):
             self._rewrite_fn(fn)
@@ -99,25 +273,91 @@ class operation(generator):
     def __get__(self, instance, owner=None):
         if instance is None:
             return self
+        return MethodType(self, instance)
+
+    def native(self, fn):
+        """
+        Registers a native implementation of the operation.
+
+        The native implementation is tried before the rewriting semantics of
+        the operation, which are used as a fallback whenever it returns
+        `None`. It may also return `failure` if the operation doesn't apply
+        to its arguments. It is meant to shortcut the evaluation of
+        operations on terms that have an efficient native representation,
+        and should therefore be semantically equivalent to the operation.
+        """
+
+        self._native = fn
+        return self
+
+    def memoize(self, maxsize=1024):
+        """
+        Memoizes the results of the operation in a cache of its own.
 
-        new_mtd = MethodType(self._prepare_fn(), instance)
-        return self.__class__(new_mtd)
+        Results are indexed by the arguments of the operation, and the cache
+        evicts its least recently used entries once it holds more than
+        `maxsize` results. Passing `maxsize=None` makes it unbounded.
+        """
+
+        self._cache = LRUCache(maxsize)
+        return self
+
+    @property
+    def cache(self):
+        """The cache used to memoize the results of the operation, if any."""
+        return self._cache if self._cache is not None else _operation_cache
 
     def __call__(self, *args, **kwargs):
+        if (self._cache is None) and (_operation_cache is None):
+            rv = self._evaluate(args, kwargs)
+        else:
+            rv = self._memoized_evaluate(args, kwargs)
+
+        if rv is failure:
+            raise RewritingError('failed to apply %s()' % self._fn.__qualname__)
+        return rv
+
+    def apply(self, *args, **kwargs):
+        """
+        Applies the operation on the given arguments.
+
+        Unlike calling the operation, this returns `failure` rather than
+        raising a `RewritingError` if the operation doesn't apply to its
+        arguments. Errors raised while evaluating the operation are still
+        raised.
+        """
+
+        if (self._cache is None) and (_operation_cache is None):
+            return self._evaluate(args, kwargs)
+        return self._memoized_evaluate(args, kwargs)
+
+    def _memoized_evaluate(self, args, kwargs):
+        cache = self._cache if self._cache is not None else _operation_cache
+        key = (self, args, tuple(sorted(kwargs.items()))) if kwargs else (self, args)
+        try:
+            rv = cache.get(key, undefined)
+        except TypeError:
+            # The results of operations applied on arguments that aren't
+            # hashable can't be memoized.
+            return self._evaluate(args, kwargs)
+
+        if rv is undefined:
+            rv = self._evaluate(args, kwargs)
+            cache.put(key, rv)
+        return rv
+
+    def _evaluate(self, args, kwargs):
         # TODO Type checking
 
-        if inspect.ismethod(self._fn):
-            fn = self._fn
-        else:
-            fn = self._prepare_fn()
+        if self._native is not None:
+            rv = self._native(*args, **kwargs)
+            if rv is not None:
+                return rv
 
         try:
-            rv = fn(*args, **kwargs)
+            rv = self._fn(*args, **kwargs)
         except Exception as e:
-            # Inspect where the original function was defined so we can raise
-            # a more helpful exception.
-            source_file = inspect.getsourcefile(self._fn._original)
-            source_line = inspect.getsourcelines(self._fn._original)[1]
+            (source_file, source_line) = self._source
             raise RewritingError(
                 '%(file)s, in %(fn)s (line %(line)s)\n%(error)s: %(message)s' % {
                     'file': source_file,
@@ -128,35 +368,129 @@ class operation(generator):
                 }) from e
 
         if rv is None:
-            raise RewritingError('failed to apply %s()' % self._fn.__qualname__)
+            return failure
         return rv
 
     def _rewrite_fn(self, fn):
-        # Rewrite the operation so that its if statements are wrapped within a
-        # matching context.
+        self._source = _source_location(fn)
+        if settings.LAZY_OPERATIONS:
+            self._fn = _PendingRewrite(self, fn)
+        else:
+            self._fn = _rewrite_operation(fn)
+
+
+class _PendingRewrite(object):
+    """
+    Placeholder for the rewritten function of an operation, that rewrites it
+    the first time it is called.
+    """
+
+    def __init__(self, operation, fn):
+        self._operation = operation
+        self._original = fn
+        self._rewritten = None
+        self.__name__ = fn.__name__
+        self.__qualname__ = fn.__qualname__
+        self.__doc__ = fn.__doc__
+
+    @property
+    def _nonlocals(self):
+        return _closure_variables(self._original)
+
+    def __call__(self, *args, **kwargs):
+        if self._rewritten is None:
+            rv = _rewrite_operation(self._original)
+            rv.__name__ = self.__name__
+            rv.__qualname__ = self.__qualname__
+            rv.__doc__ = self.__doc__
+            self._rewritten = rv
+
+            # Replace the placeholder, unless the operation has been wrapped
+            # since it was created (e.g. by `decision_tree`).
+            if self._operation._fn is self:
+                self._operation._fn = rv
+
+        return self._rewritten(*args, **kwargs)
+
+
+def _rewrite_operation(fn):
+    # The code of the rewritten function only depends on the source of the
+    # original one, on the names of its non-local variables, and on whether
+    # the name `var` refers to the variable manager. It is looked up in the
+    # code cache first, so that the source doesn't have to be parsed again.
+    nonlocals = _closure_variables(fn)
+    manager = nonlocals['var'] if 'var' in nonlocals else fn.__globals__.get('var')
+    key = (fn.__qualname__, fn.__code__.co_firstlineno, manager is var, tuple(nonlocals))
+
+    filename = fn.__code__.co_filename
+    code = _code_cache.get(filename, key)
+    if code is None:
         node = ast.parse(_unindent(inspect.getsource(fn)))
-        node = _RewriteOperation().visit(node)
+        code = _compile_factory(node, fn, nonlocals)
+        _code_cache.put(filename, key, code)
+
+    return _instantiate_factory(code, fn, nonlocals)
+
+
+def _closure_variables(fn):
+    if fn.__closure__ is None:
+        return {}
+    return {
+        name: cell.cell_contents
+        for name, cell in zip(fn.__code__.co_freevars, fn.__closure__)}
+
+
+def _source_location(fn):
+    code = getattr(fn, '_original', fn).__code__
+    return (code.co_filename, code.co_firstlineno)
+
+
+def _compile_operation(node, fn, injected=None, branches=None):
+    nonlocals = _closure_variables(fn)
+    code = _compile_factory(node, fn, nonlocals, injected, branches)
+    return _instantiate_factory(code, fn, nonlocals, injected)
+
+
+def _captured_names(nonlocals, injected):
+    # The rewritten function is compiled within a factory whose parameters
+    # are the names it should capture from the original function (i.e.
+    # the non-local variables of the original function, and the names used
+    # by the rewritten function), together with the additional names to
+    # inject in its scope. That way it keeps the original module as its
+    # global scope.
+    captured = OrderedDict(nonlocals)
+    captured.update(injected or {})
+    captured['push_context'] = push_context
+    captured['_MatchingContext'] = MatchingContext
+    return captured
 
-        src = astunparse.unparse(node)
-        exec(compile(src, filename='', mode='exec'))
 
-        self._fn = locals()['_fn']
-        update_wrapper(self._fn, fn)
-        self._fn.__qualname__ = fn.__qualname__
-        self._fn._original = fn
-        self._fn._nonlocals = inspect.getclosurevars(self._fn._original).nonlocals
+def _compile_factory(node, fn, nonlocals, injected=None, branches=None):
+    # Rewrite the operation so that each of its if statements gets a matching
+    # context of its own. Unless the function refers to the variable manager
+    # itself (e.g. to pass it to another function), the contexts are stored
+    # in local variables, to which its variables are bound directly.
+    local_contexts = _uses_variables_only(node, fn, nonlocals)
+    node = _RewriteOperation(local_contexts=local_contexts, branches=branches).visit(node)
 
-    def _prepare_fn(self):
-        # Inject push_context into the function scope.
-        fn_globals = dict(self._fn._original.__globals__)
-        fn_globals['push_context'] = push_context
+    src = 'def _factory(%s):\n%s\n    return _fn\n' % (
+        ', '.join(_captured_names(nonlocals, injected)),
+        '\n'.join('    ' + line for line in astunparse.unparse(node).split('\n')))
+    return compile(src, filename='', mode='exec')
 
-        # Inject non-local variables of the original function into the
-        # function scope.
-        fn_globals.update(self._fn._nonlocals)
 
-        f = FunctionType(self._fn.__code__, fn_globals)
-        return update_wrapper(f, self._fn)
+def _instantiate_factory(code, fn, nonlocals, injected=None):
+    scope = {}
+    exec(code, fn.__globals__, scope)
+
+    rv = scope['_factory'](*_captured_names(nonlocals, injected).values())
+    update_wrapper(rv, fn)
+    rv.__qualname__ = fn.__qualname__
+    rv.__defaults__ = fn.__defaults__
+    rv.__kwdefaults__ = fn.__kwdefaults__
+    rv._original = fn
+    rv._nonlocals = nonlocals
+    return rv
 
 
 class Attribute(object):
@@ -231,6 +565,16 @@ class SortBase(type):
         if '__sortname__' not in attrs:
             attrs['__sortname__'] = classname
 
+        # The terms of sorts that declare generators (and no attributes, which
+        # are stored in the instance dictionary) only need the slots declared
+        # by Sort. Other sorts keep an instance dictionary, so that their
+        # subclasses (e.g. strategies) can set instance attributes.
+        declares_generators = any(
+            isinstance(attr, generator) and not isinstance(attr, (operation, attr_constructor))
+            for attr in attrs.values())
+        if ('__slots__' not in attrs) and declares_generators and not sort_attributes:
+            attrs['__slots__'] = ()
+
         # Create the sort class.
         new_sort = type.__new__(cls, classname, bases, attrs)
 
@@ -260,9 +604,18 @@ class SortBase(type):
 
 class Sort(metaclass=SortBase):
 
+    # Terms built by generators store their arguments in a tuple, ordered
+    # as the domain of their generator. `_hash` caches the structural hash
+    # of the term, computed once and for all since terms are immutable,
+    # while `_interned` indicates whether the term is the canonical
+    # representative of its structure in the table of hash-consed terms.
+    __slots__ = ('_generator', '_args', '_hash', '_interned', '__weakref__')
+
     def __init__(self, *args, **kwargs):
         self._generator = None
-        self._generator_args = None
+        self._args = ()
+        self._hash = None
+        self._interned = False
 
         # Allow to call generators with a single positional argument.
         if len(args) > 1:
@@ -294,10 +647,43 @@ class Sort(metaclass=SortBase):
     def _is_a_constant(self):
         return self._generator is not None
 
+    @property
+    def _generator_args(self):
+        if not self._args:
+            return None
+        return GeneratorArguments(self)
+
     def where(self, **kwargs):
         return self.__class__(
             **{name: kwargs.get(name, getattr(self, name)) for name in self.__attributes__})
 
+    @classmethod
+    def from_values(cls, values):
+        """
+        Builds a list of terms of the sort from native Python values.
+
+        Each value is either a term, a native value supported by the sort
+        (e.g. an int for `Nat`), or a tuple whose first element is the name
+        of a generator of the sort, followed by the values of its arguments
+        (e.g. `('cons', 1, ('nil',))`). Equal values are built once, so that
+        the terms of the batch share their common subterms.
+        """
+
+        builder = _TermBuilder()
+        return [builder.build(cls, value) for value in values]
+
+    @classmethod
+    def _from_native(cls, value):
+        # Sorts that have a native representation (e.g. Nat) override this
+        # method to build terms from native values.
+        raise ArgumentError(
+            "cannot build a term of sort '%s' from %r" % (cls.__sortname__, value))
+
+    def _to_native(self):
+        # Sorts that have a native representation return the int backing the
+        # term, if any, so that it can be serialized without its subterms.
+        return None
+
     @classmethod
     def specialize(cls, sortname=None, **implementations):
         abstract_names = sorted(implementations.keys())
@@ -306,102 +692,490 @@ class Sort(metaclass=SortBase):
             cls.__name__ + '_specialized_with_' +
             '_'.join(implementations[n].__sortname__ for n in abstract_names))
 
+        # Specializing a sort with the same implementations returns the same
+        # sort, so that its terms (and the caches of its operations) are
+        # shared by all its users.
+        key = (cls, sortname, tuple((n, implementations[n]) for n in abstract_names))
+        try:
+            return _specializations[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Implementations that aren't hashable can't be cached.
+            key = None
+
         specialization_dict = dict(cls.__dict__)
         specialization_dict['__sortname__'] = sortname
+
+        # Remove the slot descriptors of the specialized sort, as they are
+        # inherited by the specialization.
+        for name in cls.__dict__.get('__slots__', ()) + ('__slots__', '__dict__', '__weakref__'):
+            specialization_dict.pop(name, None)
         for name in abstract_names:
             specialization_dict[name] = implementations[name]
 
-        return SortBase(sortname, (cls,), specialization_dict)
+        rv = SortBase(sortname, (cls,), specialization_dict)
+        if key is not None:
+            _specializations[key] = rv
+        return rv
 
     def __hash__(self):
+        if self._hash is None:
+            # Hash the subterms whose hash isn't known yet first, bottom-up,
+            # so that deep terms can be hashed without recursion.
+            stack = [self]
+            while stack:
+                term = stack[-1]
+                pending = False
+                subterms = term._args if (term._generator is not None) else term._subterms()
+                for subterm in subterms:
+                    if isinstance(subterm, Sort) and (subterm._hash is None):
+                        if subterm.__class__.__hash__ is not Sort.__hash__:
+                            # Subterms whose sort hashes its terms on its own
+                            # (e.g. the views on the terms of an arena) are
+                            # hashed by their own method.
+                            hash(subterm)
+                            continue
+                        stack.append(subterm)
+                        pending = True
+
+                if not pending:
+                    stack.pop()
+                    term._hash = term._structural_hash()
+
+        return self._hash
+
+    def _structural_hash(self):
         if self._is_a_constant:
-            if self._generator_args is None:
-                return hash(self._generator)
-            return hash(
-                (self._generator, ) +
-                tuple((name, term) for name, term in self._generator_args.items()))
+            return hash((self._generator,) + self._args)
 
         return hash(tuple((name, getattr(self, name)) for name in self.__attributes__))
 
+    def _subterms(self):
+        if self._is_a_constant:
+            return self._args
+        return tuple(getattr(self, name) for name in self.__attributes__)
+
     def __eq__(self, other):
         return matches(self, other)
 
     def equiv(self, other):
-        if isinstance(other, Var):
+        if isinstance(other, Var) or (self is other):
             return True
-
-        if self._is_a_constant:
-            if (self._generator != other._generator):
-                return False
-            if self._generator_args is None:
-                return True
-            keys = self._generator_args.keys()
-            return all(self._generator_args[n] == other._generator_args[n] for n in keys)
-
-        return all(getattr(self, name) == getattr(other, name) for name in self.__attributes__)
+        return matches(self, other)
 
     def __str__(self):
-        if self._is_a_constant:
-            if self._generator_args is None:
-                return self._generator._fn.__qualname__
-            else:
-                args = ['%s: %s' % (name, term) for name, term in self._generator_args.items()]
-                args = ', '.join(args)
-                return self._generator._fn.__qualname__ + '(' + args + ')'
-        else:
-            if len(self.__attributes__) == 0:
-                return self.__class__.__qualname__
+        # Print the term from an explicit stack of pending strings and
+        # subterms, so that deep terms can be printed without recursion.
+        # Subterms whose sort overrides __str__ are printed by their own
+        # method.
+        parts = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is str:
+                parts.append(item)
+                continue
+            if not isinstance(item, Sort) or (
+                    (item.__class__.__str__ is not Sort.__str__) and (item is not self)):
+                parts.append(str(item))
+                continue
+
+            if item._generator is not None:
+                parts.append(item._generator._fn.__qualname__)
+                names = item._generator.domain
+                separator = ': '
             else:
-                args = ['%s = %s' % (name, getattr(self, name)) for name in self.__attributes__]
-                args = ', '.join(args)
-                return self.__class__.__qualname__ + '(' + args + ')'
+                parts.append(item.__class__.__qualname__)
+                names = item.__attributes__
+                separator = ' = '
+
+            if names:
+                names = tuple(names)
+                subterms = item._subterms()
+                stack.append(')')
+                for index in range(len(names) - 1, -1, -1):
+                    stack.append(subterms[index])
+                    stack.append((', ' if index else '(') + names[index] + separator)
+
+        return ''.join(parts)
 
     def __repr__(self):
         return repr(str(self))
 
+    def _is_rebuildable(self):
+        # Whether the term is fully described by its generator and arguments,
+        # by its native value, or by the attributes it has been constructed
+        # with. Other terms (e.g. records with their own constructor, such as
+        # most strategies) may hold state that only default pickling keeps.
+        if getattr(self, '_generator', None) is not None:
+            return True
+        if self._to_native() is not None:
+            return True
+        if self.__class__.__init__ is not Sort.__init__:
+            return False
+        state = getattr(self, '__dict__', None)
+        return (not state) or state.keys() <= set(self.__attributes__)
+
+    def _is_immutable(self):
+        # Whether the term and all its subterms are rebuildable, in which case
+        # the term can't be modified.
+        seen = set()
+        stack = [self]
+        while stack:
+            term = stack.pop()
+            if not term._is_rebuildable():
+                return False
+            if term._to_native() is not None:
+                continue
+            for subterm in term._subterms():
+                if isinstance(subterm, Sort) and (id(subterm) not in seen):
+                    seen.add(id(subterm))
+                    stack.append(subterm)
+        return True
+
+    def __reduce_ex__(self, protocol):
+        # Terms are pickled in the binary format of the serialization module,
+        # which shares their subterms and doesn't recurse on their depth. The
+        # terms it can't represent, and those whose sort defines how to pickle
+        # them, are pickled as any other object.
+        if self.__class__.__reduce__ is object.__reduce__:
+            from .serialization import dumps, loads
+            try:
+                return (loads, (dumps(self),))
+            except SerializationError:
+                pass
+        return super().__reduce_ex__(protocol)
+
+    # Immutable terms don't need to be copied.
+
+    def __copy__(self):
+        if self._is_rebuildable():
+            return self
+        return copy._reconstruct(self, None, *super().__reduce_ex__(4))
+
+    def __deepcopy__(self, memo):
+        if self._is_immutable():
+            return self
+        return copy._reconstruct(self, memo, *super().__reduce_ex__(4))
+
+
+class _TermBuilder(object):
+    """
+    Builds terms from native values, sharing the terms built from equal
+    values, and looking up the generators of each sort only once.
+    """
+
+    def __init__(self):
+        # Terms built from native values (e.g. ints), indexed by their sort
+        # and value.
+        self._natives = {}
+        # Terms built from tuples, indexed by their sort and the identity of
+        # the tuple, so that the nested tuples of deep values don't have to
+        # be hashed. The tuples are kept alive so that their identity isn't
+        # reused.
+        self._tuples = {}
+        self._values = []
+        # Terms built from tuples, indexed by their generator and the
+        # identity of their arguments, so that equal tuples that aren't the
+        # same object still give the same term.
+        self._terms = {}
+        self._generators = {}
+
+    def build(self, root_sort, root_value):
+        if root_value.__class__ is not tuple:
+            return self._leaf(root_sort, root_value)
+
+        tuples = self._tuples
+        terms = self._terms
+        natives = self._natives
+        values = self._values
+
+        # Build the arguments of the tuples before the tuples themselves,
+        # from an explicit stack so that deeply nested values can be built
+        # without recursion. Tuples are pushed along with their generator,
+        # once it has been looked up.
+        stack = [(root_sort, root_value, None, None)]
+        while stack:
+            (sort, value, fn, domain) = stack[-1]
+            if fn is None:
+                if (sort, id(value)) in tuples:
+                    stack.pop()
+                    continue
+                (fn, domain) = self._generator(sort, value)
+                stack[-1] = (sort, value, fn, domain)
+
+            args = []
+            pending = False
+            for index, subsort in enumerate(domain, 1):
+                argument = value[index]
+                if argument.__class__ is tuple:
+                    term = tuples.get((subsort, id(argument)))
+                    if term is None:
+                        stack.append((subsort, argument, None, None))
+                        pending = True
+                        continue
+                else:
+                    try:
+                        term = natives[(subsort, argument)]
+                    except (KeyError, TypeError):
+                        term = self._leaf(subsort, argument)
+                args.append(term)
+            if pending:
+                continue
+
+            stack.pop()
+            key = (fn, *map(id, args))
+            term = terms.get(key)
+            if term is None:
+                term = terms[key] = _make_term(fn, tuple(args))
+            tuples[(sort, id(value))] = term
+            values.append(value)
+
+        return tuples[(root_sort, id(root_value))]
+
+    def _leaf(self, sort, value):
+        if isinstance(value, (Sort, Var)):
+            if not isinstance(value, (sort, Var)):
+                raise ArgumentError(
+                    "%r should be a variable or a term of sort '%s'" % (value, sort.__sortname__))
+            return value
+
+        try:
+            return self._natives[(sort, value)]
+        except KeyError:
+            term = self._natives[(sort, value)] = sort._from_native(value)
+            return term
+
+    def _generator(self, sort, value):
+        try:
+            (fn, domain) = self._generators[(sort, value[0])]
+        except (KeyError, IndexError):
+            fn = getattr(sort, value[0], None) if value else None
+            if not isinstance(fn, generator) or isinstance(fn, (operation, attr_constructor)):
+                raise ArgumentError(
+                    "%r doesn't name a generator of sort '%s'" % (value, sort.__sortname__))
+
+            domain = tuple(fn.domain.values())
+            self._generators[(sort, value[0])] = (fn, domain)
+
+        if len(value) != len(domain) + 1:
+            raise ArgumentError('%s() takes %i argument(s) (%i given)' % (
+                fn._fn.__qualname__, len(domain), len(value) - 1))
+        return (fn, domain)
+
+
+# Table of the specializations of generic sorts, indexed by the specialized
+# sort, the name of the specialization and its implementations.
+_specializations = WeakValueDictionary()
+
 
 def _unindent(src):
     indentation = len(src) - len(src.lstrip())
     return '\n'.join([line[indentation:] for line in src.split('\n')])
 
 
+def _uses_variables_only(node, fn, nonlocals):
+    # Check that the name `var` refers to the variable manager, and that it
+    # is only used to access variables (e.g. `var.x`).
+    if 'var' in nonlocals:
+        manager = nonlocals['var']
+    else:
+        manager = fn.__globals__.get('var')
+    if manager is not var:
+        return False
+
+    accessed = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name):
+            accessed.add(id(child.value))
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and (child.id == 'var') and (id(child) not in accessed):
+            return False
+        if isinstance(child, ast.arg) and (child.arg == 'var'):
+            return False
+    return True
+
+
 class _RewriteOperation(ast.NodeTransformer):
 
     _push_context_call = ast.parse('push_context()').body[0].value
 
+    def __init__(self, local_contexts=False, branches=None):
+        self.local_contexts = local_contexts
+
+        # If a list of branches is given, the tests of the if statements are
+        # passed to `_probe` (which should be injected in the scope of the
+        # rewritten function) together with the index of their branch in
+        # that list, where their line number and source are appended.
+        self.branches = branches
+
+        # The name of the local variable that holds the matching context of
+        # the current branch, and the nesting depth of the branches.
+        self.context = None
+        self.depth = 0
+        self.max_depth = 0
+        self.rewriting_function = False
+
     def visit_FunctionDef(self, node):
+        # Nested functions are left as is (except for their variables).
+        if self.rewriting_function:
+            return self.generic_visit(node)
+        self.rewriting_function = True
 
         # We have to rename the function so we're sure its name won't collide
         # with a local variable of operation.__init__. We also have to remove
         # its annotations, so that we don't need to import the sorts of its
         # domain and codomain when we'll recompile it. Finally, we have to
         # remove the function decorators so they don't get executed twice.
+        # Default values are removed as well, as they are copied from the
+        # original function instead of being evaluated again.
+
+        body = self._visit_statements(node.body)
+
+        # The matching contexts of the branches are created once per call,
+        # and cleared whenever a branch is entered.
+        if self.local_contexts:
+            body = [
+                ast.parse('%s = _MatchingContext()' % self._context_name(depth)).body[0]
+                for depth in range(self.max_depth)
+            ] + body
 
         return self._update(
             node,
             name='_fn',
             args=self._update(
                 node.args,
-                args=[self._update(arg, annotation=None) for arg in node.args.args]),
-            body=[self.visit(child) for child in node.body],
+                args=[self._update(arg, annotation=None) for arg in node.args.args],
+                kwonlyargs=[self._update(arg, annotation=None) for arg in node.args.kwonlyargs],
+                defaults=[],
+                kw_defaults=[None for _ in node.args.kwonlyargs]),
+            body=body,
             returns=None,
             decorator_list=[])
 
     def visit_Return(self, node):
         if type(node.value) == ast.IfExp:
-            return self._wrap(node)
-        return node
+            return self._wrap(node, lambda: _BindVariables(self.context).visit(node))
+        return self.generic_visit(node)
 
     def visit_If(self, node):
-        return self._wrap(ast.If(
-            test=node.test,
-            body=node.body,
-            orelse=[self.visit(child) for child in node.orelse]))
+        # Note that the branch is recorded before its test gets rewritten.
+        branch = self._add_branch(node)
+        return self._wrap(node, lambda: ast.If(
+            test=self._probe(branch, _BindVariables(self.context).visit(node.test)),
+            body=[
+                _BindVariables(self.context).visit(self._probe_nested(child))
+                for child in node.body],
+            orelse=self._visit_statements(node.orelse)))
+
+    def _probe_nested(self, node):
+        # The if statements nested in a branch share its matching context,
+        # but their tests are passed to `_probe` as well.
+        if self.branches is None:
+            return node
+        return _ProbeBranches(self).visit(node)
+
+    def _add_branch(self, node):
+        if self.branches is None:
+            return None
+        # Note that astunparse parenthesizes the expressions it unparses.
+        source = astunparse.unparse(node.test).strip()
+        if isinstance(node.test, (ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare)):
+            source = source[1:-1]
+        self.branches.append((node.lineno, source))
+        return len(self.branches) - 1
+
+    def _probe(self, branch, test):
+        if branch is None:
+            return test
+        return ast.Call(
+            func=ast.Name(id='_probe', ctx=ast.Load()),
+            args=[ast.Constant(value=branch), test],
+            keywords=[])
+
+    def visit_Attribute(self, node):
+        if self.context is not None:
+            return _BindVariables(self.context).visit(node)
+        return self.generic_visit(node)
+
+    def _wrap(self, node, rewrite):
+        if not self.local_contexts:
+            self.context = None
+            return ast.With(
+                items=[ast.withitem(context_expr=self._push_context_call, optional_vars=None)],
+                body=[rewrite()])
+
+        (context, depth) = (self.context, self.depth)
+        self.context = self._context_name(depth)
+        self.depth = depth + 1
+        self.max_depth = max(self.max_depth, self.depth)
+        try:
+            node = rewrite()
+        finally:
+            (self.context, self.depth) = (context, depth)
+
+        # Branches that don't refer to any variable don't need their context
+        # to be cleared.
+        name = self._context_name(depth)
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and (child.id == name):
+                return [ast.parse('%s.clear()' % name).body[0], node]
+        return node
+
+    def _visit_statements(self, statements):
+        rv = []
+        for statement in statements:
+            statement = self.visit(statement)
+            if isinstance(statement, list):
+                rv.extend(statement)
+            else:
+                rv.append(statement)
+        return rv
 
-    def _wrap(self, node):
-        return ast.With(
-            items=[ast.withitem(context_expr=self._push_context_call, optional_vars=None)],
-            body=[node])
+    def _context_name(self, depth):
+        return '_context_%i' % depth
 
     def _update(self, node, **kwargs):
         return type(node)(**{name: kwargs.get(name, getattr(node, name)) for name in node._fields})
+
+
+class _ProbeBranches(ast.NodeTransformer):
+
+    # Passes the tests of the if statements nested in a branch to `_probe`,
+    # recording them in the branches of the given operation rewriter.
+
+    def __init__(self, rewriter):
+        self.rewriter = rewriter
+
+    def visit_If(self, node):
+        branch = self.rewriter._add_branch(node)
+        node.test = self.rewriter._probe(branch, node.test)
+        return self.generic_visit(node)
+
+    # The branches of nested functions aren't those of the operation.
+
+    def visit_FunctionDef(self, node):
+        return node
+
+    def visit_Lambda(self, node):
+        return node
+
+
+class _BindVariables(ast.NodeTransformer):
+
+    # Rewrites the accesses to the variables of a branch (e.g. `var.x`) into
+    # accesses to the matching context of the branch (e.g. `context['x']`).
+
+    def __init__(self, context):
+        self.context = context
+
+    def visit_Attribute(self, node):
+        if (self.context is None) or not isinstance(node.value, ast.Name):
+            return self.generic_visit(node)
+        if node.value.id != 'var':
+            return node
+
+        rv = ast.parse('%s[%r]' % (self.context, node.attr)).body[0].value
+        rv.ctx = node.ctx
+        return ast.copy_location(rv, node)
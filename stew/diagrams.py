@@ -0,0 +1,730 @@
+"""
+Symbolic sets of terms, represented as hierarchical decision diagrams.
+
+A `TermSet` maps each symbol its terms are built with (a generator, the
+attributes of a record sort, or the native values of a sort) to the set of
+their arguments. Sets of arguments are decision diagrams over the positions
+of the arguments: each node has arcs labelled by disjoint sets of values of
+an argument, which are TermSets themselves, and that lead to the node of the
+next argument. Arguments that only differ at a few positions share most of
+their nodes, so that a TermSet may be exponentially smaller than the number
+of its terms.
+
+TermSets and the nodes of their diagrams are hash-consed, so that equal sets
+are the same object, and their unions, intersections and differences are
+memoized. TermSets are immutable.
+
+The diagrams of deep terms are nested as deeply as the terms, hence the
+operations on TermSets (including membership tests and enumeration) are
+evaluated from explicit stacks rather than recursively, so that sets of deep
+terms are supported as well as deep terms are.
+
+Homomorphisms (see `local` and `native`) are strategies that apply on
+TermSets without enumerating their terms, and that can be combined with the
+combinators of `stew.strategies` (e.g. `fixpoint(union(identity, h))`).
+Unlike the strategies created with `make_strategy`, homomorphisms never
+fail: the terms they don't apply to have no image.
+"""
+
+import itertools
+
+from collections.abc import Set as AbstractSet
+from weakref import WeakValueDictionary
+
+from .caching import LRUCache
+from .core import Sort, _make_term, failure
+from .exceptions import ArgumentError
+from .serialization import _sort_of
+from .strategies import Strategy
+
+
+# Kinds of the symbols that aren't generators.
+(_RECORD, _NATIVE) = ('record', 'native')
+
+_ids = itertools.count()
+
+# Rank of each symbol, so that the entries of term sets are ordered.
+_symbol_ranks = {}
+
+# Results of the operations on term sets and nodes, indexed by the operation
+# and the identifiers of their operands, which are never reused.
+_cache = LRUCache(maxsize=1 << 18)
+
+
+def operation_cache():
+    """Returns the cache of the operations on term sets."""
+    return _cache
+
+
+class _Node(object):
+
+    # A node of the diagram of a set of arguments, whose arcs are pairs of a
+    # set of values of an argument and the node of the next arguments.
+
+    __slots__ = ('arcs', '_id', '_count', '__weakref__')
+
+    def __init__(self, arcs):
+        self.arcs = arcs
+        self._id = next(_ids)
+        self._count = None
+
+
+# The terminal nodes, after the last argument and of the empty set.
+_ONE = _Node(())
+_ONE._count = 1
+_ZERO = _Node(())
+_ZERO._count = 0
+
+_nodes = WeakValueDictionary()
+
+
+class TermSet(AbstractSet):
+    """
+    An immutable set of terms, represented as a decision diagram.
+
+    `TermSet(terms)` builds the set of the given terms. Term sets support
+    the operations of Python sets that don't modify them (e.g. `|`, `&`,
+    `-`, `<=`, `in`), which are computed on their diagrams. Iterating over
+    a term set builds its terms.
+    """
+
+    __slots__ = ('_entries', '_id', '_count', '__weakref__')
+
+    def __new__(cls, terms=()):
+        memo = {}
+        rv = EMPTY
+        for term in terms:
+            rv = _union(rv, _singleton(term, memo))
+        return rv
+
+    @classmethod
+    def _from_iterable(cls, terms):
+        return cls(terms)
+
+    def count(self):
+        """Returns the number of terms in the set."""
+
+        if self._count is None:
+            _count(self)
+        return self._count
+
+    def node_count(self):
+        """Returns the number of distinct nodes of the diagram of the set."""
+
+        seen = set()
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if item._id in seen:
+                continue
+            seen.add(item._id)
+
+            if isinstance(item, TermSet):
+                stack.extend(
+                    payload for _, payload in item._entries if payload.__class__ is not frozenset)
+            else:
+                for label, child in item.arcs:
+                    stack.extend((label, child))
+        return len(seen)
+
+    def __len__(self):
+        return self.count()
+
+    def __bool__(self):
+        return self is not EMPTY
+
+    def __iter__(self):
+        return _enumerate(self)
+
+    def __contains__(self, term):
+        return _evaluate('in', self, term)
+
+    def __or__(self, other):
+        other = _coerce(other)
+        return NotImplemented if (other is None) else _union(self, other)
+
+    def __and__(self, other):
+        other = _coerce(other)
+        return NotImplemented if (other is None) else _intersection(self, other)
+
+    def __sub__(self, other):
+        other = _coerce(other)
+        return NotImplemented if (other is None) else _difference(self, other)
+
+    def __rsub__(self, other):
+        other = _coerce(other)
+        return NotImplemented if (other is None) else _difference(other, self)
+
+    __ror__ = __or__
+    __rand__ = __and__
+
+    def __le__(self, other):
+        other = _coerce(other)
+        return NotImplemented if (other is None) else (_difference(self, other) is EMPTY)
+
+    def __ge__(self, other):
+        other = _coerce(other)
+        return NotImplemented if (other is None) else (_difference(other, self) is EMPTY)
+
+    def __lt__(self, other):
+        other = _coerce(other)
+        return NotImplemented if (other is None) else ((self is not other) and (self <= other))
+
+    def __gt__(self, other):
+        other = _coerce(other)
+        return NotImplemented if (other is None) else ((self is not other) and (self >= other))
+
+    def __eq__(self, other):
+        # Term sets are hash-consed, hence equal sets are the same object.
+        other = _coerce(other)
+        return NotImplemented if (other is None) else (self is other)
+
+    def __hash__(self):
+        return self._id
+
+    def __repr__(self):
+        return '%s(%i terms, %i nodes)' % (
+            self.__class__.__name__, self.count(), self.node_count())
+
+    def _payload(self, symbol):
+        for key, payload in self._entries:
+            if key == symbol:
+                return payload
+        return None
+
+
+_sets = WeakValueDictionary()
+
+
+def _make_set(entries):
+    # Return the canonical term set of a mapping from symbols to the sets of
+    # their arguments or native values, ignoring the empty ones.
+    items = []
+    for symbol, payload in entries.items():
+        if (payload is _ZERO) or not payload:
+            continue
+        if symbol not in _symbol_ranks:
+            _symbol_ranks[symbol] = len(_symbol_ranks)
+        items.append((_symbol_ranks[symbol], symbol, payload))
+    items.sort(key=lambda item: item[0])
+
+    key = tuple((symbol, payload) for _, symbol, payload in items)
+    try:
+        return _sets[key]
+    except KeyError:
+        pass
+
+    rv = object.__new__(TermSet)
+    rv._entries = key
+    rv._id = next(_ids)
+    rv._count = None
+    _sets[key] = rv
+    return rv
+
+
+EMPTY = _make_set({})
+
+
+def _make_node(arcs):
+    return _run([(None, _make_node_steps(arcs))])
+
+
+def _make_node_steps(arcs):
+    # Return the canonical node of a sequence of arcs, whose labels are
+    # disjoint, merging the arcs that lead to the same node.
+    children = {}
+    for label, child in arcs:
+        if (label is EMPTY) or (child is _ZERO):
+            continue
+        previous = children.get(child)
+        children[child] = label if (previous is None) else (yield ('|', previous, label))
+    if not children:
+        return _ZERO
+
+    key = tuple(sorted(
+        ((label, child) for child, label in children.items()), key=lambda arc: arc[0]._id))
+    try:
+        return _nodes[key]
+    except KeyError:
+        pass
+
+    rv = _nodes[key] = _Node(key)
+    return rv
+
+
+def _coerce(other):
+    if isinstance(other, TermSet):
+        return other
+    if isinstance(other, AbstractSet):
+        return TermSet(other)
+    return None
+
+
+def _singleton(root, memo):
+    # Build the set of a single term, bottom-up from an explicit stack so
+    # that deep terms can be added without recursion. `memo` holds the sets
+    # of the subterms that have already been built.
+    stack = [root]
+    while stack:
+        term = stack[-1]
+        if not isinstance(term, Sort):
+            raise ArgumentError('%r is not a term' % (term,))
+        try:
+            if term in memo:
+                stack.pop()
+                continue
+        except TypeError:
+            # Terms that contain variables aren't hashable.
+            raise ArgumentError('cannot build sets of terms with variables')
+
+        native = term._to_native()
+        if native is not None:
+            stack.pop()
+            memo[term] = _make_set({(_NATIVE, _sort_of(term)): frozenset([native])})
+            continue
+
+        subterms = term._args if (term._generator is not None) else term._subterms()
+        pending = [subterm for subterm in subterms if subterm not in memo]
+        if pending:
+            stack.extend(pending)
+            continue
+
+        stack.pop()
+        node = _ONE
+        for subterm in reversed(subterms):
+            node = _make_node(((memo[subterm], node),))
+        symbol = term._generator if (term._generator is not None) else (_RECORD, _sort_of(term))
+        memo[term] = _make_set({symbol: node})
+
+    return memo[root]
+
+
+def _evaluate(operation, a, b):
+    # Return the result of an operation on two term sets or nodes (or of a
+    # membership test), evaluated from an explicit stack rather than
+    # recursively.
+    stack = []
+    value = _start(operation, a, b, stack)
+    return _run(stack, value) if stack else value
+
+
+def _start(operation, a, b, stack):
+    # Return the result of an operation if it's trivial or memoized, and
+    # otherwise push its steps onto the stack and return None.
+    if operation == 'in':
+        stack.append((None, _contains_steps(a, b)))
+        return None
+
+    (kind, zero) = _kinds[operation]
+    if kind == '|':
+        if (a is b) or (b is zero):
+            return a
+        if a is zero:
+            return b
+    elif kind == '&':
+        if (a is b) or (a is zero) or (b is zero):
+            return a if (a is b) else zero
+    else:
+        if (a is b) or (a is zero):
+            return zero
+        if b is zero:
+            return a
+    if (kind != '-') and (a._id > b._id):
+        (a, b) = (b, a)
+
+    key = (operation, a._id, b._id)
+    rv = _cache.get(key)
+    if rv is None:
+        stack.append((key, _steps[operation](a, b)))
+    return rv
+
+
+def _run(stack, value=None):
+    # Run the steps on the stack, which are generators that yield the
+    # operations whose results they need and return their own result.
+    while stack:
+        (key, steps) = stack[-1]
+        try:
+            request = steps.send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+            if key is not None:
+                _cache.put(key, value)
+        else:
+            value = _start(*request, stack)
+    return value
+
+
+def _contains_steps(terms, term):
+    if not isinstance(term, Sort):
+        return False
+
+    native = term._to_native()
+    if native is not None:
+        payload = terms._payload((_NATIVE, _sort_of(term)))
+        return (payload is not None) and (native in payload)
+
+    if term._generator is not None:
+        (node, subterms) = (terms._payload(term._generator), term._args)
+    else:
+        (node, subterms) = (terms._payload((_RECORD, _sort_of(term))), term._subterms())
+    if node is None:
+        return False
+
+    for subterm in subterms:
+        for label, child in node.arcs:
+            if (yield ('in', label, subterm)):
+                node = child
+                break
+        else:
+            return False
+    return node is _ONE
+
+
+def _count(root):
+    # Count the terms of a set and of the sets and nodes below it, bottom-up.
+    stack = [root]
+    while stack:
+        item = stack[-1]
+        if item._count is not None:
+            stack.pop()
+            continue
+
+        if isinstance(item, TermSet):
+            pending = [
+                payload for _, payload in item._entries
+                if (payload.__class__ is not frozenset) and (payload._count is None)]
+            if pending:
+                stack.extend(pending)
+                continue
+            item._count = sum(
+                len(payload) if (payload.__class__ is frozenset) else payload._count
+                for _, payload in item._entries)
+        else:
+            pending = [
+                dependency for arc in item.arcs for dependency in arc
+                if dependency._count is None]
+            if pending:
+                stack.extend(pending)
+                continue
+            item._count = sum(label._count * child._count for label, child in item.arcs)
+        stack.pop()
+
+
+# Tasks of the enumeration of term sets.
+(_SET, _NODE, _BUILD) = range(3)
+
+
+def _enumerate(root):
+    # Enumerate the terms of a set depth-first, from a stack of choice points
+    # rather than recursively. The tasks left to build a term and the values
+    # built so far are linked lists, so that each choice point can keep
+    # those it has to resume from.
+    choices = [(iter((((_SET, root),),)), None, None)]
+    while choices:
+        (alternatives, tasks, values) = choices[-1]
+        alternative = next(alternatives, None)
+        if alternative is None:
+            choices.pop()
+            continue
+
+        for task in reversed(alternative):
+            tasks = (task, tasks)
+
+        while True:
+            if tasks is None:
+                yield values[0]
+                break
+
+            ((kind, item), tasks) = tasks
+            if kind == _BUILD:
+                values = _build(item, values)
+            elif kind == _NODE:
+                if item is not _ONE:
+                    choices.append((
+                        (((_SET, label), (_NODE, child)) for label, child in item.arcs),
+                        tasks, values))
+                    break
+            else:
+                choices.append((_set_alternatives(item), tasks, values))
+                break
+
+
+def _set_alternatives(terms):
+    # The alternatives of the choice of a term of a set, in the order of its
+    # symbols.
+    for symbol, payload in terms._entries:
+        if payload.__class__ is frozenset:
+            for value in sorted(payload):
+                yield ((_BUILD, symbol + (value,)),)
+        else:
+            yield ((_NODE, payload), (_BUILD, symbol))
+
+
+def _build(symbol, values):
+    # Build a term from the values on top of a linked list of values, and
+    # push it in their place.
+    if symbol.__class__ is tuple:
+        if symbol[0] == _NATIVE:
+            return (symbol[1]._from_native(symbol[2]), values)
+        sort = symbol[1]
+        arity = len(sort.__attributes__)
+    else:
+        arity = len(symbol.domain)
+
+    args = []
+    for _ in range(arity):
+        (value, values) = values
+        args.append(value)
+    args.reverse()
+
+    if symbol.__class__ is tuple:
+        return (sort(**dict(zip(sort.__attributes__, args))), values)
+    return (_make_term(symbol, tuple(args)), values)
+
+
+def _union(a, b):
+    return _evaluate('|', a, b)
+
+
+def _intersection(a, b):
+    return _evaluate('&', a, b)
+
+
+def _difference(a, b):
+    return _evaluate('-', a, b)
+
+
+def _node_union(a, b):
+    return _evaluate('n|', a, b)
+
+
+def _union_steps(a, b):
+    entries = dict(a._entries)
+    for symbol, payload in b._entries:
+        other = entries.get(symbol)
+        if other is None:
+            entries[symbol] = payload
+        elif payload.__class__ is frozenset:
+            entries[symbol] = other | payload
+        else:
+            entries[symbol] = yield ('n|', other, payload)
+    return _make_set(entries)
+
+
+def _intersection_steps(a, b):
+    entries = dict(a._entries)
+    rv = {}
+    for symbol, payload in b._entries:
+        other = entries.get(symbol)
+        if other is None:
+            continue
+        elif payload.__class__ is frozenset:
+            rv[symbol] = other & payload
+        else:
+            rv[symbol] = yield ('n&', other, payload)
+    return _make_set(rv)
+
+
+def _difference_steps(a, b):
+    entries = dict(b._entries)
+    rv = {}
+    for symbol, payload in a._entries:
+        other = entries.get(symbol)
+        if other is None:
+            rv[symbol] = payload
+        elif payload.__class__ is frozenset:
+            rv[symbol] = payload - other
+        else:
+            rv[symbol] = yield ('n-', payload, other)
+    return _make_set(rv)
+
+
+def _node_union_steps(a, b):
+    # Split the labels of both nodes into the values they have in common,
+    # which lead to the union of their nodes, and the values that only one
+    # of them has.
+    arcs = []
+    others = list(b.arcs)
+    for label, child in a.arcs:
+        for index, (other_label, other_child) in enumerate(others):
+            common = yield ('&', label, other_label)
+            if common is EMPTY:
+                continue
+            arcs.append((common, (yield ('n|', child, other_child))))
+            others[index] = ((yield ('-', other_label, common)), other_child)
+            label = yield ('-', label, common)
+            if label is EMPTY:
+                break
+        arcs.append((label, child))
+    arcs.extend(others)
+    return (yield from _make_node_steps(arcs))
+
+
+def _node_intersection_steps(a, b):
+    arcs = []
+    for label, child in a.arcs:
+        for other_label, other_child in b.arcs:
+            common = yield ('&', label, other_label)
+            if common is not EMPTY:
+                arcs.append((common, (yield ('n&', child, other_child))))
+    return (yield from _make_node_steps(arcs))
+
+
+def _node_difference_steps(a, b):
+    arcs = []
+    for label, child in a.arcs:
+        for other_label, other_child in b.arcs:
+            common = yield ('&', label, other_label)
+            if common is EMPTY:
+                continue
+            arcs.append((common, (yield ('n-', child, other_child))))
+            label = yield ('-', label, common)
+            if label is EMPTY:
+                break
+        arcs.append((label, child))
+    return (yield from _make_node_steps(arcs))
+
+
+# The kind of the operations on term sets and nodes, and their empty operand.
+_kinds = {
+    '|': ('|', EMPTY), '&': ('&', EMPTY), '-': ('-', EMPTY),
+    'n|': ('|', _ZERO), 'n&': ('&', _ZERO), 'n-': ('-', _ZERO),
+}
+
+# The steps of the operations on term sets and nodes, indexed by the keys of
+# their results in the cache.
+_steps = {
+    '|': _union_steps,
+    '&': _intersection_steps,
+    '-': _difference_steps,
+    'n|': _node_union_steps,
+    'n&': _node_intersection_steps,
+    'n-': _node_difference_steps,
+}
+
+
+class _Homomorphism(Strategy):
+
+    # Homomorphisms are applied on term sets, and on explicit sets of terms
+    # by converting them to term sets. Their results are memoized with those
+    # of the operations on term sets, indexed by an identifier that each
+    # homomorphism gets on its class.
+
+    def __call__(self, terms):
+        return self.apply(terms)
+
+    def apply(self, terms):
+        if not isinstance(terms, TermSet):
+            if not isinstance(terms, AbstractSet):
+                terms = (terms,)
+            return set(self.apply(TermSet(terms)))
+
+        key = ('h', self._id, terms._id)
+        rv = _cache.get(key)
+        if rv is None:
+            rv = self._apply_symbolic(terms)
+            _cache.put(key, rv)
+        return rv
+
+    def _apply_symbolic(self, terms):
+        raise NotImplementedError()
+
+
+def local(symbol, name, f):
+    """
+    Creates a homomorphism that applies a strategy on an argument of the
+    terms built with a generator, or on an attribute of the terms of a
+    record sort.
+
+    The strategy is applied on the set of the values of the argument of the
+    terms that share the values of their other arguments, hence on a
+    TermSet, and it can be a homomorphism itself (e.g. to apply a strategy
+    on a subterm nested deeper in the terms). Other strategies are applied
+    on the terms of that set, and the terms they don't apply to have no
+    image.
+    """
+
+    if isinstance(symbol, type) and issubclass(symbol, Sort):
+        if name not in symbol.__attributes__:
+            raise ArgumentError("'%s' has no attribute '%s'" % (symbol.__sortname__, name))
+        (key, position) = ((_RECORD, symbol), symbol.__attributes__.index(name))
+    else:
+        if name not in symbol.positions:
+            raise ArgumentError("%s() has no argument '%s'" % (symbol._fn.__qualname__, name))
+        (key, position) = (symbol, symbol.positions[name])
+
+    def apply_symbolic(self, terms):
+        node = terms._payload(key)
+        if node is None:
+            return EMPTY
+
+        images = {}
+
+        def image(label):
+            try:
+                return images[label]
+            except KeyError:
+                rv = images[label] = _image(f, label)
+                return rv
+
+        return _make_set({key: _map_node(node, position, image, {})})
+
+    return type('local', (_Homomorphism,), {
+        '_apply_symbolic': apply_symbolic,
+        '_id': next(_ids),
+    })()
+
+
+def native(fn):
+    """
+    Creates a homomorphism that maps the native values of terms (e.g. the
+    ints of Nats) with a function, which returns None for the values it
+    doesn't apply to.
+    """
+
+    def apply_symbolic(self, terms):
+        entries = {}
+        for symbol, payload in terms._entries:
+            if payload.__class__ is frozenset:
+                entries[symbol] = frozenset(
+                    value for value in map(fn, payload) if value is not None)
+        return _make_set(entries)
+
+    return type(fn.__name__, (_Homomorphism,), {
+        '_apply_symbolic': apply_symbolic,
+        '_id': next(_ids),
+    })()
+
+
+def _image(f, terms):
+    # Return the set of the images of the terms a strategy applies to.
+    rv = f.apply(terms)
+    if rv is failure:
+        rv = TermSet(itertools.chain.from_iterable(
+            result for result in map(f.apply, terms) if result is not failure))
+    elif not isinstance(rv, TermSet):
+        rv = TermSet(rv)
+    return rv
+
+
+def _map_node(node, position, fn, memo):
+    # Apply a function on the labels of the arcs at the given position below
+    # a node.
+    try:
+        return memo[node, position]
+    except KeyError:
+        pass
+
+    if position == 0:
+        # The images of disjoint labels may intersect.
+        rv = _ZERO
+        for label, child in node.arcs:
+            rv = _node_union(rv, _make_node(((fn(label), child),)))
+    else:
+        rv = _make_node([
+            (label, _map_node(child, position - 1, fn, memo)) for label, child in node.arcs])
+
+    memo[node, position] = rv
+    return rv
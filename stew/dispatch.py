@@ -0,0 +1,291 @@
+import ast
+import builtins
+import copy
+import inspect
+
+from .core import attr_constructor, generator, operation, _compile_operation, _unindent
+from .matching import Var, _bind, matches, var
+
+
+def decision_tree(op):
+    """
+    Compiles an operation into a decision tree keyed on the generators of its
+    arguments.
+
+    The branches of an operation are conditional statements whose tests are
+    conjunctions of patterns (e.g. `self == Nat.suc(var.x)`). Rather than
+    trying each branch in order, the decision tree reads the generator of
+    every argument that is pattern matched once, and dispatches the call to a
+    version of the operation specialized for those generators. Specialized
+    versions are compiled lazily, the first time a given combination of
+    generators is encountered. In a specialized version:
+
+    * branches whose patterns can't match are removed altogether;
+    * patterns on nullary generators that are known to match are dropped;
+    * other patterns that are known to match only match the arguments of
+      the inspected term, without testing its generator again.
+
+    Only the patterns that appear before any other kind of condition within
+    a test are taken into account, so that the conditions that are actually
+    evaluated (and the order in which variables get bound) are the same as in
+    the sequential semantics of the operation. Operations whose parameters
+    are reassigned in their body aren't compiled.
+
+    Note that the decision tree assumes that comparing an argument with a
+    pattern amounts to match them, which is the case unless the sort of the
+    argument redefines `__eq__` with different semantics.
+    """
+
+    op._fn = DecisionTree(op._fn)
+    return op
+
+
+class DecisionTree(object):
+
+    def __init__(self, fn):
+        self._generic = fn
+        self._original = fn._original
+        self.__name__ = fn.__name__
+        self.__qualname__ = fn.__qualname__
+        self.__doc__ = fn.__doc__
+
+        # The analysis of the operation is delayed until its first call, so
+        # that the names its patterns refer to (e.g. the sort that defines
+        # the operation) are guaranteed to be defined.
+        self._node = None
+        self._arity = None
+        self._positions = None
+        self._parameters = None
+        self._branches = {}
+
+    @property
+    def _nonlocals(self):
+        return getattr(self._generic, '_nonlocals', {})
+
+    def __call__(self, *args, **kwargs):
+        if self._positions is None:
+            self._analyse()
+
+        if kwargs or (len(args) != self._arity) or not self._positions:
+            return self._generic(*args, **kwargs)
+
+        try:
+            key = tuple([args[index]._generator for index in self._positions])
+        except AttributeError:
+            # One of the inspected arguments isn't a term (e.g. a variable).
+            return self._generic(*args, **kwargs)
+
+        try:
+            fn = self._branches[key]
+        except KeyError:
+            fn = self._branches[key] = self._specialize(key)
+        return fn(*args)
+
+    def _analyse(self):
+        node = ast.parse(_unindent(inspect.getsource(self._original)))
+        fndef = node.body[0]
+
+        self._node = node
+        self._arity = len(fndef.args.args)
+        self._positions = ()
+
+        # Operations with variadic parameters or reassigned parameters can't
+        # be dispatched on the value of their arguments.
+        if fndef.args.vararg or fndef.args.kwarg:
+            return
+        parameters = [arg.arg for arg in fndef.args.args]
+        for child in ast.walk(fndef):
+            if isinstance(child, ast.Name) and (child.id in parameters):
+                if not isinstance(child.ctx, ast.Load):
+                    return
+
+        self._parameters = parameters
+        inspected = set()
+        for child in ast.walk(fndef):
+            if isinstance(child, ast.If):
+                for test in self._pattern_tests(child.test):
+                    if test is not None:
+                        inspected.add(test[0])
+
+        self._positions = tuple(
+            index for index, name in enumerate(parameters) if name in inspected)
+
+    def _pattern_tests(self, test):
+        # Return the patterns of a test, up to the first conjunct that isn't
+        # a pattern (for which None is returned).
+        conjuncts = _conjuncts(test)
+        rv = []
+        for conjunct in conjuncts:
+            pattern = self._as_pattern_test(conjunct)
+            rv.append(pattern)
+            if pattern is None:
+                break
+        return rv + [None] * (len(conjuncts) - len(rv))
+
+    def _as_pattern_test(self, node):
+        # Return a tuple (parameter, generator, arguments) if the given node is
+        # a comparison of the form `parameter == pattern`.
+        if not (isinstance(node, ast.Compare) and (len(node.ops) == 1)):
+            return None
+        if not isinstance(node.ops[0], ast.Eq):
+            return None
+
+        (lhs, rhs) = (node.left, node.comparators[0])
+        if not (isinstance(lhs, ast.Name) and (lhs.id in self._parameters)):
+            return None
+        if not (isinstance(rhs, ast.Call) and self._is_pattern(rhs)):
+            # Bare variables match any term, hence they don't dispatch.
+            return None
+
+        fn = self._resolve(rhs.func)
+        arguments = [None] * len(fn.domain)
+        for index, argument in enumerate(rhs.args):
+            if index >= len(arguments):
+                return (lhs.id, fn, None)
+            arguments[index] = argument
+        for keyword in rhs.keywords:
+            index = fn.positions.get(keyword.arg)
+            if (index is None) or (arguments[index] is not None):
+                return (lhs.id, fn, None)
+            arguments[index] = keyword.value
+        if any(argument is None for argument in arguments):
+            # The pattern is ill-formed, and will fail to be created.
+            return (lhs.id, fn, None)
+
+        return (lhs.id, fn, arguments)
+
+    def _is_pattern(self, node):
+        # Patterns are built with generators whose arguments are either
+        # variables or patterns themselves, so that building them has no side
+        # effect.
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+            if self._resolve(node.value) is var:
+                return True
+
+        if not isinstance(node, ast.Call):
+            return False
+        fn = self._resolve(node.func)
+        if not isinstance(fn, generator) or isinstance(fn, (operation, attr_constructor)):
+            return False
+
+        return all(self._is_pattern(argument) for argument in node.args) and all(
+            (keyword.arg is not None) and self._is_pattern(keyword.value)
+            for keyword in node.keywords)
+
+    def _resolve(self, node):
+        if isinstance(node, ast.Name):
+            if node.id in self._parameters:
+                return None
+            for scope in (self._nonlocals, self._original.__globals__, builtins.__dict__):
+                if node.id in scope:
+                    return scope[node.id]
+            return None
+
+        if isinstance(node, ast.Attribute):
+            owner = self._resolve(node.value)
+            if (owner is None) or (owner is var):
+                return None
+            try:
+                return getattr(owner, node.attr)
+            except Exception:
+                return None
+
+        return None
+
+    def _specialize(self, key):
+        heads = dict(zip([self._parameters[index] for index in self._positions], key))
+
+        node = copy.deepcopy(self._node)
+        fndef = node.body[0]
+        specializer = _Specializer(self, heads)
+        fndef.body = specializer.visit_statements(fndef.body) or [ast.Pass()]
+        ast.fix_missing_locations(node)
+
+        return _compile_operation(node, self._original, injected={'_match_arguments': _match_arguments})
+
+
+class _Specializer(ast.NodeTransformer):
+
+    _true = ast.parse('True').body[0].value
+
+    def __init__(self, tree, heads):
+        self.tree = tree
+        self.heads = heads
+
+    def visit_statements(self, statements):
+        rv = []
+        for statement in statements:
+            statement = self.visit(statement)
+            if isinstance(statement, list):
+                rv.extend(statement)
+            elif statement is not None:
+                rv.append(statement)
+        return rv
+
+    def visit_If(self, node):
+        conjuncts = _conjuncts(node.test)
+        remaining = []
+        for conjunct, pattern in zip(conjuncts, self.tree._pattern_tests(node.test)):
+            if pattern is None:
+                remaining.append(conjunct)
+                continue
+
+            (parameter, fn, arguments) = pattern
+            if self.heads[parameter] is not fn:
+                # The pattern can't match, hence neither can the branch.
+                return self.visit_statements(node.orelse) or [ast.Pass()]
+
+            if arguments is None:
+                remaining.append(conjunct)
+            elif arguments:
+                # The generator of the argument is known to match, so only its
+                # own arguments have to be matched.
+                remaining.append(ast.Call(
+                    func=ast.Name(id='_match_arguments', ctx=ast.Load()),
+                    args=[ast.Name(id=parameter, ctx=ast.Load())] + arguments,
+                    keywords=[]))
+
+        if not remaining:
+            test = copy.deepcopy(self._true)
+        elif len(remaining) == 1:
+            test = remaining[0]
+        else:
+            test = ast.BoolOp(op=ast.And(), values=remaining)
+
+        return ast.If(
+            test=test,
+            body=self.visit_statements(node.body) or [ast.Pass()],
+            orelse=self.visit_statements(node.orelse))
+
+    # Nested scopes are left untouched, as their parameters may shadow the
+    # ones of the operation.
+
+    def visit_FunctionDef(self, node):
+        return node
+
+    def visit_AsyncFunctionDef(self, node):
+        return node
+
+    def visit_ClassDef(self, node):
+        return node
+
+    def visit_Lambda(self, node):
+        return node
+
+
+def _conjuncts(test):
+    if isinstance(test, ast.BoolOp) and isinstance(test.op, ast.And):
+        return test.values
+    return [test]
+
+
+def _match_arguments(term, *patterns):
+    # Match the arguments of a term whose generator is known to match the one
+    # of a pattern, binding variables the same way `matches` would.
+    for argument, pattern in zip(term._args, patterns):
+        if isinstance(pattern, Var):
+            if not _bind(pattern, argument):
+                return False
+        elif not matches(argument, pattern):
+            return False
+    return True
@@ -27,3 +27,10 @@ class TranslationError(StewError):
     Raised for errors related to the translation of a stew signature to
     another term rewriting system.
     """
+
+
+class SerializationError(StewError):
+    """
+    Raised when a term can't be serialized, or when serialized terms can't be
+    read.
+    """
@@ -1,11 +1,16 @@
-from contextlib import contextmanager
 from threading import local
 
 from .exceptions import MatchError
 
 
-_local_data = local()
-_local_data.context_stack = []
+class _LocalData(local):
+
+    def __init__(self):
+        # Each thread gets its own stack of matching contexts.
+        self.context_stack = []
+
+
+_local_data = _LocalData()
 
 
 def _find_matching_context():
@@ -15,64 +20,142 @@ def _find_matching_context():
         return None
 
 
-@contextmanager
-def push_context():
-    _local_data.context_stack.append(MatchingContext())
-    yield _local_data.context_stack[-1]
-    del _local_data.context_stack[-1]
+class push_context(object):
+    """
+    Pushes a new matching context onto the context stack of the current
+    thread, for the duration of a `with` block.
+
+    Note that operations don't use the context stack, unless they refer to
+    the variable manager itself (rather than to its variables); each branch
+    of their rewritten function gets a context of its own instead.
+    """
+
+    __slots__ = ('context',)
+
+    def __enter__(self):
+        self.context = MatchingContext()
+        _local_data.context_stack.append(self.context)
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        del _local_data.context_stack[-1]
 
 
 def matches(lhs, rhs):
-    if isinstance(lhs, Var):
-        raise MatchError('Variables should not appear in lvalues.')
-
-    if isinstance(rhs, Var):
-        # If the rhs variable is not bound to any value, we can bind it to the
-        # current lhs and we have a match. Otherwise, we should also make sure
-        # its bound value is equal to the lhs.
-        if isinstance(getattr(var, rhs.name), Var):
-            setattr(var, rhs.name, lhs)
-            return True
-        return lhs.equiv(getattr(var, rhs.name))
+    # Match the terms iteratively, so that deep terms can be matched without
+    # recursion. Pairs of subterms are matched in a depth-first, left-to-right
+    # order (which is the order in which variables get bound): the first
+    # arguments of a term are matched right away, while the pairs of other
+    # arguments are pushed onto a stack.
+    stack = []
+    while True:
+        if isinstance(lhs, Var):
+            raise MatchError('Variables should not appear in lvalues.')
+
+        if isinstance(rhs, Var):
+            # If the rhs variable is not bound to any value, we can bind it to
+            # the current lhs and we have a match. Otherwise, we should also
+            # make sure its bound value is equal to the lhs.
+            context = rhs.context
+            if context is None:
+                context = _find_matching_context()
+                if context is None:
+                    raise RuntimeError('Working outside of a matching context.')
+
+            bound = context[rhs.name]
+            if isinstance(bound, Var):
+                context[rhs.name] = lhs
+            elif not lhs.equiv(bound):
+                return False
 
-    if lhs._is_a_constant or rhs._is_a_constant:
-        if not lhs._is_a_constant or not rhs._is_a_constant:
-            return False
+        # Interned terms are maximally shared, so they are structurally equal
+        # if and only if they are the same object.
+        elif lhs is not rhs:
+            if lhs._interned and rhs._interned:
+                return False
 
-        if lhs._generator == rhs._generator:
-            # If both the lhs and the rhs are constants built with the same
-            # generator, we have to match all their generator arguments.
-            if lhs._generator_args is None:
-                return True
+            # Ground terms with different hashes can't be equal.
+            if (lhs._hash is not None) and (rhs._hash is not None) and (lhs._hash != rhs._hash):
+                return False
 
-            for name in lhs._generator_args:
-                if not matches(lhs._generator_args[name], rhs._generator_args[name]):
+            if (lhs._generator is not None) or (rhs._generator is not None):
+                # If both the lhs and the rhs are constants built with the
+                # same generator, we have to match all their arguments.
+                if lhs._generator != rhs._generator:
                     return False
-            return True
-        else:
-            return False
-
-    if issubclass(lhs.__class__, rhs.__class__):
-        # If both the lhs and the rhs are non constant values of the same
-        # sort, we have to match their attributes.
-        for name in lhs.__class__.__attributes__:
-            if not matches(getattr(lhs, name), getattr(rhs, name)):
+                lhs_args = lhs._args
+                if lhs_args:
+                    rhs_args = rhs._args
+                    for index in range(len(lhs_args) - 1, 0, -1):
+                        stack.append((lhs_args[index], rhs_args[index]))
+                    lhs = lhs_args[0]
+                    rhs = rhs_args[0]
+                    continue
+
+            elif issubclass(lhs.__class__, rhs.__class__):
+                # If both the lhs and the rhs are non constant values of the
+                # same sort, we have to match their attributes.
+                names = lhs.__class__.__attributes__
+                if names:
+                    for name in reversed(names[1:]):
+                        stack.append((getattr(lhs, name), getattr(rhs, name)))
+                    lhs = getattr(lhs, names[0])
+                    rhs = getattr(rhs, names[0])
+                    continue
+
+            else:
                 return False
+
+        if not stack:
+            return True
+        (lhs, rhs) = stack.pop()
+
+
+def _bind(variable, term):
+    # Bind a variable to a term, in the context it was created in. If the
+    # variable is already bound, return whether its value is equivalent to
+    # the given term.
+    context = variable.context
+    if context is None:
+        context = _find_matching_context()
+        if context is None:
+            raise RuntimeError('Working outside of a matching context.')
+
+    bound = context[variable.name]
+    if isinstance(bound, Var):
+        context[variable.name] = term
         return True
+    return term.equiv(bound)
 
-    return False
 
+class MatchingContext(dict):
+    """
+    The bindings of the variables of a matching context, indexed by name.
 
-class MatchingContext(object):
+    Looking up a variable that isn't bound yet creates a new (unbound)
+    variable that refers to the context, so that matching it binds it in the
+    context it was created in.
+    """
 
-    def __init__(self):
-        self.bindings = {}
+    __slots__ = ()
+
+    def __missing__(self, name):
+        rv = self[name] = Var(name, self)
+        return rv
+
+    @property
+    def bindings(self):
+        return self
 
 
 class Var(object):
 
-    def __init__(self, name):
+    # The context in which the variable was created, if any.
+    context = None
+
+    def __init__(self, name, context=None):
         self.name = name
+        self.context = context
 
     def __eq__(self, other):
         return True
@@ -85,16 +168,14 @@ class VarManager(object):
         if context is None:
             raise RuntimeError('Working outside of a matching context.')
 
-        if attr not in context.bindings:
-            context.bindings[attr] = Var(attr)
-        return context.bindings[attr]
+        return context[attr]
 
     def __setattr__(self, attr, value):
         context = _find_matching_context()
         if context is None:
             raise RuntimeError('Working outside of a matching context.')
 
-        context.bindings[attr] = value
+        context[attr] = value
 
 
 var = VarManager()
@@ -0,0 +1,262 @@
+"""
+Profiling of the evaluation of operations.
+
+When profiling is enabled, each call to an operation is recorded in the
+current `Profile`, which counts, for each operation, its calls, the time
+spent evaluating it (inclusive of the operations it calls, and exclusive of
+them), and its maximum recursion depth. Unless told otherwise, the profile
+also counts, for each if statement of the rewritten function of an
+operation, how many times its test succeeded (i.e. its branch fired) or
+failed.
+
+Profiling is enabled by replacing the methods that evaluate operations with
+instrumented ones, and the functions of the operations that get called with
+versions whose tests are instrumented, and it is disabled by restoring
+them. Hence it costs nothing when disabled.
+"""
+
+import ast
+import inspect
+import threading
+
+from contextlib import contextmanager
+from time import perf_counter
+
+from .core import operation, _compile_operation, _unindent
+
+
+class BranchStats(object):
+    """The number of times the test of an if statement succeeded or failed."""
+
+    def __init__(self, line, source):
+        self.line = line
+        self.source = source
+        self.fired = 0
+        self.failed = 0
+
+    def __repr__(self):
+        return '%s(line=%i, fired=%i, failed=%i)' % (
+            self.__class__.__name__, self.line, self.fired, self.failed)
+
+
+class OperationStats(object):
+    """
+    The statistics of an operation.
+
+    `inclusive_time` is the time spent evaluating the outermost calls to the
+    operation, and `exclusive_time` the time spent evaluating its calls
+    minus the time spent in the operations they called. `branches` is the
+    list of the if statements of the operation, in the order of its source.
+    """
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.name = operation._fn.__qualname__
+        self.calls = 0
+        self.inclusive_time = 0.0
+        self.exclusive_time = 0.0
+        self.max_depth = 0
+        self.branches = []
+        self._depth = 0
+
+    def __repr__(self):
+        return '%s(%s, calls=%i, inclusive_time=%.6f, exclusive_time=%.6f, max_depth=%i)' % (
+            self.__class__.__name__, self.name, self.calls, self.inclusive_time,
+            self.exclusive_time, self.max_depth)
+
+
+class Profile(object):
+    """The statistics of the operations called while profiling was enabled."""
+
+    def __init__(self, branches=True):
+        self.branches = branches
+        self.operations = {}
+        self._frames = threading.local()
+
+        # The functions of the operations that have been replaced by
+        # instrumented versions, to be restored when profiling is disabled.
+        self._replaced = {}
+
+    def stats(self, operation):
+        """Returns the statistics of an operation, or None if it wasn't called."""
+        return self.operations.get(operation)
+
+    def report(self, sort_by='exclusive_time', limit=None):
+        """
+        Returns a textual report of the statistics of the operations, sorted
+        by the given statistic in decreasing order.
+        """
+
+        operations = sorted(
+            self.operations.values(), key=lambda stats: getattr(stats, sort_by), reverse=True)
+        if limit is not None:
+            operations = operations[:limit]
+
+        width = max([len(stats.name) for stats in operations] + [len('operation')])
+        lines = ['%-*s %10s %12s %12s %6s' % (
+            width, 'operation', 'calls', 'inclusive', 'exclusive', 'depth')]
+        for stats in operations:
+            lines.append('%-*s %10i %11.6fs %11.6fs %6i' % (
+                width, stats.name, stats.calls, stats.inclusive_time, stats.exclusive_time,
+                stats.max_depth))
+            for branch in stats.branches:
+                lines.append('    line %-5i fired %8i  failed %8i  %s' % (
+                    branch.line, branch.fired, branch.failed, branch.source))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.report()
+
+    def _stats(self, operation):
+        try:
+            return self.operations[operation]
+        except KeyError:
+            pass
+
+        rv = self.operations[operation] = OperationStats(operation)
+        if self.branches:
+            self._instrument(operation, rv)
+        return rv
+
+    def _stack(self):
+        try:
+            return self._frames.stack
+        except AttributeError:
+            rv = self._frames.stack = []
+            return rv
+
+    def _instrument(self, operation, stats):
+        # Replace the function of the operation with a version of its
+        # rewritten function whose tests are passed to a probe. Note that
+        # operations compiled into decision trees are then evaluated with
+        # their sequential semantics.
+        original = getattr(operation._fn, '_original', None)
+        if original is None:
+            return
+        try:
+            node = ast.parse(_unindent(inspect.getsource(original)))
+        except (OSError, TypeError, SyntaxError):
+            return
+
+        branches = []
+        fn = _compile_operation(
+            node, original, injected={'_probe': _make_probe(stats.branches)}, branches=branches)
+        stats.branches.extend(
+            BranchStats(line + original.__code__.co_firstlineno - 1, source)
+            for line, source in branches)
+
+        self._replaced[operation] = (operation._fn, fn)
+        operation._fn = fn
+
+    def _suspend(self):
+        # Restore the functions of the operations that have been instrumented.
+        for operation, (original, instrumented) in self._replaced.items():
+            if operation._fn is instrumented:
+                operation._fn = original
+
+    def _resume(self):
+        for operation, (original, instrumented) in self._replaced.items():
+            if operation._fn is original:
+                operation._fn = instrumented
+
+
+def _make_probe(branches):
+    # The probe returns the truth value of the test, so that the if statement
+    # doesn't evaluate it a second time.
+    def probe(index, value):
+        if value:
+            branches[index].fired += 1
+            return True
+        branches[index].failed += 1
+        return False
+    return probe
+
+
+# The profile that records the calls to operations, if profiling is enabled.
+_profile = None
+
+(_call, _apply) = (operation.__call__, operation.apply)
+
+
+def _measure(method, op, args, kwargs):
+    profile = _profile
+    stats = profile.operations.get(op) or profile._stats(op)
+    stack = profile._stack()
+
+    stats.calls += 1
+    stats._depth += 1
+    if stats._depth > stats.max_depth:
+        stats.max_depth = stats._depth
+
+    # The time spent in the operations called by this one.
+    frame = [0.0]
+    stack.append(frame)
+    start = perf_counter()
+    try:
+        return method(op, *args, **kwargs)
+    finally:
+        elapsed = perf_counter() - start
+        stack.pop()
+        stats._depth -= 1
+        if stats._depth == 0:
+            stats.inclusive_time += elapsed
+        stats.exclusive_time += elapsed - frame[0]
+        if stack:
+            stack[-1][0] += elapsed
+
+
+def _profiled_call(self, *args, **kwargs):
+    return _measure(_call, self, args, kwargs)
+
+
+def _profiled_apply(self, *args, **kwargs):
+    return _measure(_apply, self, args, kwargs)
+
+
+def set_profiling(enabled, branches=True):
+    """
+    Enables or disables the profiling of operations.
+
+    Enabling profiling starts a new profile, which records the statistics
+    of the branches of the operations unless `branches` is False. Disabling
+    it completes the current profile. The previous profile, if any, is
+    returned.
+    """
+
+    global _profile
+    previous = _profile
+    if previous is not None:
+        previous._suspend()
+
+    if enabled:
+        _profile = Profile(branches)
+        (operation.__call__, operation.apply) = (_profiled_call, _profiled_apply)
+    else:
+        _profile = None
+        (operation.__call__, operation.apply) = (_call, _apply)
+    return previous
+
+
+def current_profile():
+    """Returns the profile being recorded, if profiling is enabled."""
+    return _profile
+
+
+@contextmanager
+def profiling(branches=True):
+    """
+    Profiles the operations called within a `with` block, and yields the
+    profile, which is complete once the block exits. The profile that was
+    being recorded before the block, if any, is resumed afterwards.
+    """
+
+    global _profile
+    previous = set_profiling(True, branches)
+    try:
+        yield _profile
+    finally:
+        set_profiling(False)
+        if previous is not None:
+            _profile = previous
+            previous._resume()
+            (operation.__call__, operation.apply) = (_profiled_call, _profiled_apply)
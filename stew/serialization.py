@@ -0,0 +1,356 @@
+"""
+Binary serialization of terms.
+
+Terms are encoded as a stream of records, that define the sorts and the
+generators they are built with (referred to by their qualified names), and
+each distinct subterm once, as a directed acyclic graph. Subsequent records
+refer to sorts, generators and subterms by their index in the stream, so
+that terms sharing most of their structure (e.g. a set of states) are
+encoded at the cost of the subterms they don't share.
+
+Every record starts with a tag, followed by unsigned integers encoded as
+variable-length quantities (LEB128):
+
+* `SORT name`: defines the next sort;
+* `GENERATOR sort name`: defines the next generator;
+* `TERM generator argument*`: defines the next term, built with a generator;
+* `RECORD sort argument*`: defines the next term, built with the attributes
+  of its sort;
+* `NATIVE sort value`: defines the next term, built from a native value
+  (e.g. the int of a Nat);
+* `ROOT term`: emits a term.
+"""
+
+import importlib
+import io
+
+from .core import Sort, _make_term
+from .exceptions import SerializationError
+
+
+MAGIC = b'STEW\x01'
+
+(_SORT, _GENERATOR, _TERM, _RECORD, _NATIVE, _ROOT) = range(1, 7)
+
+# Size of the chunks in which the writer flushes its buffer, and in which the
+# reader reads its stream.
+_CHUNK_SIZE = 1 << 16
+
+
+class TermWriter(object):
+    """
+    Writes terms to a binary stream.
+
+    Terms written with the same writer share the subterms they have in
+    common, which are only written once.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffer = bytearray(MAGIC)
+        self._sorts = {}
+        self._generators = {}
+        self._terms = {}
+
+    def write(self, term):
+        index = self._encode(term)
+        self._buffer.append(_ROOT)
+        _write_varint(self._buffer, index)
+        if len(self._buffer) >= _CHUNK_SIZE:
+            self.flush()
+
+    def write_all(self, terms):
+        for term in terms:
+            self.write(term)
+
+    def flush(self):
+        self._stream.write(bytes(self._buffer))
+        self._buffer.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def _encode(self, root):
+        # Encode the subterms before the terms that refer to them, from an
+        # explicit stack so that deep terms can be written without recursion.
+        terms = self._terms
+        buffer = self._buffer
+        stack = [root]
+        while stack:
+            term = stack[-1]
+            if not isinstance(term, Sort):
+                raise SerializationError('cannot serialize %r' % (term,))
+            try:
+                if term in terms:
+                    stack.pop()
+                    continue
+            except TypeError:
+                # Terms that contain variables aren't hashable.
+                raise SerializationError('cannot serialize terms with variables')
+
+            # Terms that have a native representation are written as such,
+            # without their subterms.
+            native = term._to_native()
+            if native is not None:
+                stack.pop()
+                sort_index = self._sort_index(_sort_of(term))
+                buffer.append(_NATIVE)
+                _write_varint(buffer, sort_index)
+                _write_varint(buffer, _zigzag(native))
+                terms[term] = len(terms)
+                continue
+
+            # Records that hold more than their attributes couldn't be read
+            # back by calling their sort.
+            if not term._is_rebuildable():
+                raise SerializationError('cannot serialize %r' % (term,))
+
+            subterms = term._args if (term._generator is not None) else term._subterms()
+            pending = False
+            for subterm in subterms:
+                if not isinstance(subterm, Sort):
+                    raise SerializationError('cannot serialize %r' % (subterm,))
+                if subterm not in terms:
+                    stack.append(subterm)
+                    pending = True
+            if pending:
+                continue
+
+            # Note that the definitions of sorts and generators have to be
+            # written before the tag of the term.
+            stack.pop()
+            if term._generator is not None:
+                generator_index = self._generator_index(term)
+                buffer.append(_TERM)
+                _write_varint(buffer, generator_index)
+            else:
+                sort_index = self._sort_index(_sort_of(term))
+                buffer.append(_RECORD)
+                _write_varint(buffer, sort_index)
+            for subterm in subterms:
+                _write_varint(buffer, terms[subterm])
+            terms[term] = len(terms)
+
+        return terms[root]
+
+    def _sort_index(self, sort):
+        try:
+            return self._sorts[sort]
+        except KeyError:
+            pass
+
+        name = _sort_name(sort)
+        self._buffer.append(_SORT)
+        _write_string(self._buffer, name)
+        rv = self._sorts[sort] = len(self._sorts)
+        return rv
+
+    def _generator_index(self, term):
+        generator = term._generator
+        try:
+            return self._generators[generator]
+        except KeyError:
+            pass
+
+        sort = _sort_of(term)
+        name = generator._fn.__name__
+        if getattr(sort, name, None) is not generator:
+            raise SerializationError(
+                "generator '%s' cannot be referred to by its name" % generator._fn.__qualname__)
+
+        sort_index = self._sort_index(sort)
+        self._buffer.append(_GENERATOR)
+        _write_varint(self._buffer, sort_index)
+        _write_string(self._buffer, name)
+        rv = self._generators[generator] = len(self._generators)
+        return rv
+
+
+class TermReader(object):
+    """
+    Reads terms from a binary stream written by a `TermWriter`.
+
+    The reader is an iterator over the terms of the stream, that are read as
+    they get consumed.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._data = b''
+        self._position = 0
+        self._sorts = []
+        self._generators = []
+        self._terms = []
+
+        if self._read_bytes(len(MAGIC)) != MAGIC:
+            raise SerializationError('not a stream of serialized terms')
+
+    def read(self):
+        """Reads the next term of the stream, or raises EOFError."""
+
+        while True:
+            if not self._ensure(1):
+                raise EOFError('no more terms to read')
+
+            tag = self._data[self._position]
+            self._position += 1
+
+            if tag == _ROOT:
+                return self._terms[self._read_varint()]
+
+            if tag == _TERM:
+                (generator, arity) = self._generators[self._read_varint()]
+                args = tuple([self._terms[self._read_varint()] for _ in range(arity)])
+                self._terms.append(_make_term(generator, args))
+            elif tag == _NATIVE:
+                sort = self._sorts[self._read_varint()]
+                self._terms.append(sort._from_native(_unzigzag(self._read_varint())))
+            elif tag == _RECORD:
+                sort = self._sorts[self._read_varint()]
+                self._terms.append(sort(**{
+                    name: self._terms[self._read_varint()] for name in sort.__attributes__}))
+            elif tag == _GENERATOR:
+                sort = self._sorts[self._read_varint()]
+                generator = getattr(sort, self._read_string())
+                self._generators.append((generator, len(generator.domain)))
+            elif tag == _SORT:
+                self._sorts.append(_resolve(self._read_string()))
+            else:
+                raise SerializationError('invalid record tag %i' % tag)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return self.read()
+        except EOFError:
+            raise StopIteration
+
+    def _ensure(self, size):
+        # Make sure that `size` bytes can be read from the buffer, reading
+        # the stream if necessary, and return whether there are.
+        if len(self._data) - self._position >= size:
+            return True
+
+        chunks = [self._data[self._position:]]
+        available = len(chunks[0])
+        while available < size:
+            chunk = self._stream.read(max(_CHUNK_SIZE, size - available))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            available += len(chunk)
+
+        self._data = b''.join(chunks)
+        self._position = 0
+        return available >= size
+
+    def _read_bytes(self, size):
+        if not self._ensure(size):
+            raise SerializationError('truncated stream')
+        rv = self._data[self._position:self._position + size]
+        self._position += size
+        return rv
+
+    def _read_varint(self):
+        # A varint is at most 10 bytes long for 64 bits integers, but may
+        # be longer, hence the slow path.
+        self._ensure(10)
+        data = self._data
+        position = self._position
+        rv = 0
+        shift = 0
+        while True:
+            if position >= len(data):
+                self._position = position
+                if not self._ensure(1):
+                    raise SerializationError('truncated stream')
+                (data, position) = (self._data, self._position)
+
+            byte = data[position]
+            position += 1
+            rv |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                self._position = position
+                return rv
+            shift += 7
+
+    def _read_string(self):
+        return self._read_bytes(self._read_varint()).decode('utf-8')
+
+
+def dump(terms, stream):
+    """Writes a collection of terms to a binary stream."""
+    with TermWriter(stream) as writer:
+        writer.write_all(terms)
+
+
+def load(stream):
+    """Reads all the terms of a binary stream."""
+    return list(TermReader(stream))
+
+
+def dumps(term):
+    """Serializes a term to bytes."""
+    stream = io.BytesIO()
+    dump((term,), stream)
+    return stream.getvalue()
+
+
+def loads(data):
+    """Deserializes a term from bytes."""
+    terms = load(io.BytesIO(data))
+    if len(terms) != 1:
+        raise SerializationError('expected a single term, got %i' % len(terms))
+    return terms[0]
+
+
+def _sort_of(term):
+    # Views on the terms of an arena are instances of a subclass of the sort
+    # of the term they stand for.
+    return getattr(term.__class__, '_viewed_sort', term.__class__)
+
+
+def _sort_name(sort):
+    # Return the qualified name of a sort, making sure it refers to the sort.
+    name = '%s:%s' % (sort.__module__, sort.__qualname__)
+    if _resolve(name) is not sort:
+        raise SerializationError(
+            "sort '%s' cannot be referred to by its qualified name" % sort.__sortname__)
+    return name
+
+
+def _resolve(name):
+    (module_name, qualname) = name.split(':')
+    try:
+        rv = importlib.import_module(module_name)
+        for attribute in qualname.split('.'):
+            rv = getattr(rv, attribute)
+    except (ImportError, AttributeError):
+        raise SerializationError("cannot resolve sort '%s'" % name)
+    return rv
+
+
+def _write_varint(buffer, value):
+    while value >= 0x80:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _write_string(buffer, value):
+    data = value.encode('utf-8')
+    _write_varint(buffer, len(data))
+    buffer.extend(data)
+
+
+def _zigzag(value):
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value):
+    return (value >> 1) if not (value & 1) else -((value + 1) >> 1)
@@ -4,3 +4,11 @@ import os
 basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 
 TEMPLATES_DIRECTORY = os.path.join(basedir, 'templates')
+
+# Whether operations are rewritten lazily, the first time they are called,
+# rather than when they are defined.
+LAZY_OPERATIONS = os.environ.get('STEW_LAZY_OPERATIONS', '0') not in ('', '0')
+
+# Whether the code of rewritten operations is cached on disk, next to the
+# source files of the operations.
+CODE_CACHE = os.environ.get('STEW_CODE_CACHE', '1') not in ('', '0')
@@ -1,40 +1,269 @@
+import io
+import itertools
+import multiprocessing
+import threading
+
+from collections.abc import Set as AbstractSet
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import wraps
 
-from .core import Sort, Attribute
+from .caching import LRUCache
+from .core import Sort, Attribute, failure, operation
 from .exceptions import ArgumentError, RewritingError
+from .serialization import dump, load
 
 
 class Strategy(Sort):
-    pass
+
+    def apply(self, terms):
+        """
+        Applies the strategy on the given terms.
+
+        Unlike calling the strategy, this returns `failure` rather than
+        raising a `RewritingError` if the strategy doesn't apply to its
+        arguments.
+        """
+
+        try:
+            return self(terms)
+        except RewritingError:
+            return failure
+
+    def stream(self, terms):
+        """
+        Applies the strategy lazily on the given terms.
+
+        This returns an iterator over the distinct terms of the result of the
+        strategy, that consumes its arguments (a term or an iterable of
+        terms) as the results are consumed. The combinators that apply their
+        operands term by term yield the results of each term as soon as they
+        are computed, and fixpoints that are evaluated semi-naively yield the
+        terms of each frontier as they are discovered. Other strategies are
+        applied on the set of their arguments.
+
+        Since the strategy fails only once it doesn't apply to one of its
+        arguments, a `RewritingError` is raised when that argument is reached,
+        after the results of the previous ones have been yielded.
+        """
+
+        return _stream_stage(_normalize(self))(_iterate(terms))
+
+
+# Settings of the parallel evaluation of set operations, if enabled.
+_parallelism = None
+
+
+class _Parallelism(object):
+
+    def __init__(self, workers, backend, chunksize, min_terms):
+        if backend not in ('process', 'thread'):
+            raise ValueError("backend should be either 'process' or 'thread'")
+
+        self.workers = workers
+        self.backend = backend
+        self.chunksize = chunksize
+        self.min_terms = min_terms
+
+
+def set_parallelism(workers, backend='process', chunksize=None, min_terms=256):
+    """
+    Enables or disables the parallel evaluation of set operations.
+
+    When enabled, set operations applied on at least `min_terms` terms
+    partition them into chunks of `chunksize` terms (by default, four chunks
+    per worker), that are evaluated by `workers` processes (or threads, if
+    `backend` is 'thread'), and merge their results. Passing None (or 1) as
+    the number of workers disables the parallel evaluation.
+
+    Worker processes are forked for each set operation, so that they inherit
+    the strategy and the terms it is applied on, and send back their results
+    in the binary serialization format. Hence the terms of the results should
+    be serializable, and the process backend is only available on platforms
+    that support forking processes. Set operations evaluated by a worker are
+    evaluated sequentially.
+    """
+
+    global _parallelism
+    if (workers is None) or (workers <= 1):
+        _parallelism = None
+    else:
+        _parallelism = _Parallelism(workers, backend, chunksize, min_terms)
+
+
+@contextmanager
+def parallelism(workers, backend='process', chunksize=None, min_terms=256):
+    global _parallelism
+    previous = _parallelism
+    set_parallelism(workers, backend, chunksize, min_terms)
+    try:
+        yield
+    finally:
+        _parallelism = previous
 
 
 def set_operation(fn):
+    # Note that `fn` may return `failure` if it doesn't apply to a term, in
+    # which case the whole set operation returns `failure` as well.
     @wraps(fn)
     def wrapper(self, terms):
-        if not isinstance(terms, (set, frozenset)):
+        if not isinstance(terms, AbstractSet):
             terms = set([terms])
+        elif _is_symbolic(terms):
+            # Symbolic sets are enumerated, and the results are converted
+            # back to a set of the same type.
+            rv = wrapper(self, set(terms))
+            return rv if (rv is failure) else terms._from_iterable(rv)
 
-        rv = set()
-        for term in terms:
-            term = fn(self, term)
-            if isinstance(term, (set, frozenset)):
-                rv |= term
-            else:
-                rv.add(term)
-        return rv
+        if (_parallelism is not None) and (len(terms) >= _parallelism.min_terms):
+            if not getattr(_worker_state, 'active', False):
+                return _apply_in_parallel(fn, self, terms, _parallelism)
+        return _apply(fn, self, terms)
 
     return wrapper
 
 
+def _is_symbolic(terms):
+    # Sets of terms other than Python sets (e.g. the TermSets of
+    # `stew.diagrams`) are immutable, and are built from an iterable of
+    # terms with `_from_iterable`.
+    return isinstance(terms, AbstractSet) and not isinstance(terms, (set, frozenset))
+
+
+def _mutable(terms):
+    # Return a set that can be updated in place, or rebound if it's symbolic.
+    return terms if _is_symbolic(terms) else set(terms)
+
+
+def _apply(fn, strategy, terms):
+    rv = set()
+    for term in terms:
+        term = fn(strategy, term)
+        if term is failure:
+            return failure
+        if isinstance(term, (set, frozenset)):
+            rv |= term
+        else:
+            rv.add(term)
+    return rv
+
+
+# Set operations evaluated in parallel, indexed by a token that identifies
+# them in the worker processes, which inherit this table when they are
+# forked.
+_tasks = {}
+_task_counter = itertools.count()
+
+# Whether the current thread evaluates a chunk of a set operation.
+_worker_state = threading.local()
+
+
+def _apply_in_parallel(fn, strategy, terms, settings):
+    terms = list(terms)
+    chunksize = settings.chunksize or max(1, -(-len(terms) // (settings.workers * 4)))
+    chunks = [(start, min(start + chunksize, len(terms)))
+              for start in range(0, len(terms), chunksize)]
+
+    if settings.backend == 'thread':
+        def evaluate(chunk):
+            _worker_state.active = True
+            try:
+                return _apply(fn, strategy, terms[chunk[0]:chunk[1]])
+            finally:
+                _worker_state.active = False
+
+        with ThreadPoolExecutor(settings.workers) as executor:
+            results = list(executor.map(evaluate, chunks))
+
+    else:
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            return _apply(fn, strategy, terms)
+
+        token = next(_task_counter)
+        _tasks[token] = (fn, strategy, terms)
+        try:
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(settings.workers, mp_context=context) as executor:
+                results = [
+                    failure if (data is None) else set(load(io.BytesIO(data)))
+                    for data in executor.map(
+                        _evaluate_chunk, itertools.repeat(token), *zip(*chunks))]
+        finally:
+            del _tasks[token]
+
+    rv = set()
+    for result in results:
+        if result is failure:
+            return failure
+        rv |= result
+    return rv
+
+
+def _evaluate_chunk(token, start, stop):
+    # Evaluate a chunk of a set operation in a worker process, and return its
+    # result serialized, so that the subterms shared by the terms of the
+    # result are only sent once.
+    _worker_state.active = True
+    (fn, strategy, terms) = _tasks[token]
+    rv = _apply(fn, strategy, terms[start:stop])
+    if rv is failure:
+        return None
+
+    stream = io.BytesIO()
+    dump(rv, stream)
+    return stream.getvalue()
+
+
 def make_strategy(fn):
-    def __call__(self, term):
-        if fn(term) is None:
-            print(fn)
-        return fn(term)
-    return type(fn.__name__, (Strategy,), {'__call__': set_operation(__call__)})()
+    """
+    Creates a strategy from a function (or an operation) on terms.
+
+    The function should return either a term, a set of terms, or `failure`
+    (or None) if it doesn't apply to its argument.
+    """
 
+    if isinstance(fn, operation):
+        apply_fn = fn.apply
+        name = fn._fn.__name__
+    else:
+        def apply_fn(term):
+            try:
+                rv = fn(term)
+            except RewritingError:
+                return failure
+            return failure if rv is None else rv
+        name = fn.__name__
+
+    def apply(self, term):
+        return apply_fn(term)
+
+    # Calling the strategy calls the function itself rather than `apply_fn`,
+    # so that the errors it raises reach the caller.
+    def call(self, term):
+        rv = fn(term)
+        if (rv is None) or (rv is failure):
+            raise RewritingError('failed to apply %s' % name)
+        return rv
 
-identity = type('identity', (Strategy,), {'__call__': set_operation(lambda self, term: term)})()
+    # The function applied on each term is exposed to `compile_strategy`,
+    # so that compiled strategies can call it directly.
+    return type(name, (Strategy,), {
+        '__call__': set_operation(call),
+        'apply': set_operation(apply),
+        '_apply_term': staticmethod(apply_fn),
+    })()
+
+
+def _identity(self, terms):
+    # Symbolic sets are immutable, hence they don't need to be copied.
+    if _is_symbolic(terms):
+        return terms
+    return set(terms) if isinstance(terms, AbstractSet) else set([terms])
+
+
+# Pickling `identity` refers to the instance, rather than its anonymous class.
+identity = type('identity', (Strategy,), {
+    '__module__': __name__, '__call__': _identity, '__reduce__': lambda self: 'identity'})()
 
 
 class union(Strategy):
@@ -51,18 +280,30 @@ class union(Strategy):
             super().__init__(left=operands[0], right=union(*operands[1:]))
 
     def __call__(self, terms):
-        if not isinstance(terms, (set, frozenset)):
+        if not isinstance(terms, AbstractSet):
             terms = set([terms])
 
         return self.left(terms) | self.right(terms)
 
+    def apply(self, terms):
+        if not isinstance(terms, AbstractSet):
+            terms = set([terms])
+
+        left = self.left.apply(terms)
+        if left is failure:
+            return failure
+        right = self.right.apply(terms)
+        if right is failure:
+            return failure
+        return left | right
+
 
 class fixpoint(Strategy):
 
     f = Attribute(domain=Strategy)
 
     def __call__(self, terms):
-        if not isinstance(terms, (set, frozenset)):
+        if not isinstance(terms, AbstractSet):
             terms = set([terms])
 
         rv = self.f(terms)
@@ -71,24 +312,590 @@ class fixpoint(Strategy):
             rv = self.f(terms)
         return rv
 
+    def apply(self, terms):
+        if not isinstance(terms, AbstractSet):
+            terms = set([terms])
+
+        rv = self.f.apply(terms)
+        while (rv is not failure) and (rv != terms):
+            terms = rv
+            rv = self.f.apply(terms)
+        return rv
+
+
+class semi_naive_fixpoint(Strategy):
+    """
+    Computes the same fixpoint as `fixpoint`, but only applies `f` to the
+    terms that its previous application discovered (i.e. its frontier), and
+    stops as soon as the frontier is empty.
+
+    This assumes that `f` is inflationary (i.e. its result includes the
+    terms it is applied on) and that applying it on a set of terms amounts
+    to applying it on each term, which is the case of reachability fixpoints
+    such as `fixpoint(union(identity, step))` where `step` is created with
+    `make_strategy`. Unlike `fixpoint`, the cost of each iteration is then
+    proportional to the number of new terms rather than to the number of
+    terms accumulated so far.
+    """
+
+    f = Attribute(domain=Strategy)
+
+    def __call__(self, terms):
+        if not isinstance(terms, AbstractSet):
+            terms = set([terms])
+
+        rv = _mutable(self.f(terms))
+        frontier = rv - terms
+        while frontier:
+            frontier = self.f(frontier) - rv
+            rv |= frontier
+        return rv
+
+    def apply(self, terms):
+        if not isinstance(terms, AbstractSet):
+            terms = set([terms])
+
+        rv = self.f.apply(terms)
+        if rv is failure:
+            return failure
+
+        rv = _mutable(rv)
+        frontier = rv - terms
+        while frontier:
+            result = self.f.apply(frontier)
+            if result is failure:
+                return failure
+            frontier = result - rv
+            rv |= frontier
+        return rv
+
+
+class memoized(Strategy):
+    """
+    Memoizes the results of a strategy, so that applying it again on a term
+    it has already been applied on (e.g. in the iterations of a fixpoint)
+    costs a lookup rather than its evaluation.
+
+    Strategies that are applied term by term (see `compile_strategy`) have
+    their results memoized for each term, while the others have them
+    memoized for each set of terms. Results are kept in an `LRUCache`, that
+    evicts its least recently used entries once it holds more than `maxsize`
+    of them, and whose statistics tell how often it is hit. Failures are
+    memoized as well, but not the errors raised by the operations the
+    strategy applies.
+    """
+
+    f = Attribute(domain=Strategy)
+
+    def __init__(self, f, maxsize=1024):
+        super().__init__(f=f)
+        self.cache = LRUCache(maxsize)
+        self._per_term = _is_per_term(_normalize(f))
+
+    def __call__(self, terms):
+        rv = self.apply(terms)
+        if rv is failure:
+            raise RewritingError('failed to apply %s' % self.f.__class__.__name__)
+        return rv
+
+    def apply(self, terms):
+        if not isinstance(terms, AbstractSet):
+            terms = set([terms])
+
+        if (not self._per_term) or _is_symbolic(terms):
+            return _memoized_apply(self.cache, self.f.apply, terms)
+
+        rv = set()
+        for term in terms:
+            result = self.cache.get(term, _missing)
+            if result is _missing:
+                result = self.f.apply(term)
+                if result is not failure:
+                    result = frozenset(result)
+                self.cache.put(term, result)
+
+            if result is failure:
+                return failure
+            rv |= result
+        return rv
+
+
+_missing = object()
+
+
+def _memoized_apply(cache, apply, terms):
+    # Symbolic sets are immutable, hence they can be memoized as they are.
+    key = terms if _is_symbolic(terms) else frozenset(terms)
+    rv = cache.get(key, _missing)
+    if rv is _missing:
+        rv = apply(terms)
+        if (rv is not failure) and not _is_symbolic(rv):
+            rv = frozenset(rv)
+        cache.put(key, rv)
+    return rv if (rv is failure) else _mutable(rv)
+
 
 class try_(Strategy):
 
     f = Attribute(domain=Strategy)
 
     def __call__(self, terms):
-        if not isinstance(terms, (set, frozenset)):
+        if not isinstance(terms, AbstractSet):
             terms = set([terms])
+        elif _is_symbolic(terms):
+            return terms._from_iterable(self(set(terms)))
 
         rv = set()
         for term in terms:
+            # Strategies that don't apply to a term return failure, but the
+            # operations they apply may still raise an error if their own
+            # semantics rely on an operation that fails.
             try:
-                rv |= self.f(term)
+                result = self.f.apply(term)
             except RewritingError:
+                result = failure
+
+            if result is failure:
                 rv.add(term)
+            else:
+                rv |= result
         return rv
 
-        try:
-            return self.f(terms)
-        except RewritingError:
-            return terms
+    def apply(self, terms):
+        return self(terms)
+
+
+def compile_strategy(strategy):
+    """
+    Compiles a strategy into an equivalent strategy, that is evaluated as a
+    single pipeline rather than node by node.
+
+    The combinators of the strategy are fused into a function applied on
+    each term, which adds its results to the result set of the whole
+    strategy, so that no intermediate set is built for each node. Nested
+    unions are flattened into a single n-ary union, whose duplicated
+    operands are removed, and identities are removed (e.g. `try_(identity)`
+    and the operand `identity` of a union, which then adds its terms to its
+    result directly). Fixpoints of strategies that are applied term by term
+    and that are inflationary (e.g. `fixpoint(union(identity, f))`) are
+    evaluated as semi-naive fixpoints, which compute the same result.
+
+    Strategies that aren't built with the combinators of this module nor with
+    `make_strategy` are applied on sets of terms, as they would be by the
+    strategy that is compiled.
+    """
+
+    name = 'compiled_%s' % strategy.__class__.__name__
+    apply_terms = _set_stage(_normalize(strategy))
+
+    def apply(self, terms):
+        if not isinstance(terms, AbstractSet):
+            terms = set([terms])
+        elif _is_symbolic(terms):
+            # Symbolic sets are left to the combinators of the strategy.
+            return strategy.apply(terms)
+        return apply_terms(terms)
+
+    def __call__(self, terms):
+        rv = self.apply(terms)
+        if rv is failure:
+            raise RewritingError('failed to apply %s' % name)
+        return rv
+
+    stream_terms = _stream_stage(_normalize(strategy))
+
+    def stream(self, terms):
+        return stream_terms(_iterate(terms))
+
+    return type(name, (Strategy,), {'__call__': __call__, 'apply': apply, 'stream': stream})()
+
+
+def first(strategy, terms, predicate=None):
+    """
+    Returns the first result of a strategy applied on the given terms that
+    satisfies a predicate (or the first result, if no predicate is given),
+    or None if there isn't any.
+
+    The strategy is evaluated as a stream, that is only consumed until such
+    a term is found.
+    """
+
+    for term in strategy.stream(terms):
+        if (predicate is None) or predicate(term):
+            return term
+    return None
+
+
+# Nodes of the normalized form of a strategy are tuples, whose first element
+# is one of the following kinds.
+(_IDENTITY, _TERM, _UNION, _TRY, _FIXPOINT, _SEMI_NAIVE, _MEMOIZED, _OPAQUE) = range(8)
+
+
+def _normalize(strategy):
+    if strategy is identity:
+        return (_IDENTITY,)
+
+    if isinstance(strategy, union):
+        # Flatten nested unions, and remove the identities and the duplicates
+        # of their operands.
+        keep = False
+        children = []
+        keys = set()
+        stack = [strategy.right, strategy.left]
+        while stack:
+            operand = stack.pop()
+            if isinstance(operand, union):
+                stack.extend((operand.right, operand.left))
+                continue
+
+            node = _normalize(operand)
+            if node[0] == _IDENTITY:
+                keep = True
+                continue
+            for child in (node[2] if (node[0] == _UNION) else (node,)):
+                key = _node_key(child)
+                if key not in keys:
+                    keys.add(key)
+                    children.append(child)
+            if node[0] == _UNION:
+                keep = keep or node[1]
+
+        if not children:
+            return (_IDENTITY,)
+        if (len(children) == 1) and not keep:
+            return children[0]
+        return (_UNION, keep, tuple(children))
+
+    if isinstance(strategy, try_):
+        node = _normalize(strategy.f)
+        if node[0] in (_IDENTITY, _TRY):
+            return node
+        return (_TRY, node)
+
+    if isinstance(strategy, (fixpoint, semi_naive_fixpoint)):
+        node = _normalize(strategy.f)
+        if node[0] == _IDENTITY:
+            return node
+        if isinstance(strategy, semi_naive_fixpoint) or (
+                _is_per_term(node) and _is_inflationary(node)):
+            # The naive fixpoint of an inflationary strategy applied term by
+            # term is the same as its semi-naive fixpoint.
+            return (_SEMI_NAIVE, node)
+        return (_FIXPOINT, node)
+
+    if isinstance(strategy, memoized):
+        node = _normalize(strategy.f)
+        if node[0] == _IDENTITY:
+            return node
+        return (_MEMOIZED, node, strategy.cache)
+
+    apply_term = getattr(strategy.__class__, '_apply_term', None)
+    if apply_term is not None:
+        return (_TERM, apply_term)
+    return (_OPAQUE, strategy)
+
+
+def _node_key(node):
+    # Return a key identifying a node, so that duplicate operands of unions
+    # can be removed. Opaque strategies and caches are identified by their
+    # identity, since strategies compare equal whenever they have the same
+    # attributes, regardless of their other state.
+    kind = node[0]
+    if kind == _OPAQUE:
+        return (kind, id(node[1]))
+    if kind == _UNION:
+        return (kind, node[1], tuple(_node_key(child) for child in node[2]))
+    if kind == _MEMOIZED:
+        return (kind, _node_key(node[1]), id(node[2]))
+    if kind in (_TRY, _FIXPOINT, _SEMI_NAIVE):
+        return (kind, _node_key(node[1]))
+    return node
+
+
+def _is_per_term(node):
+    # Whether applying the node on a set of terms amounts to applying it on
+    # each of its terms.
+    if node[0] == _UNION:
+        return all(_is_per_term(child) for child in node[2])
+    if node[0] == _MEMOIZED:
+        return _is_per_term(node[1])
+    return node[0] in (_IDENTITY, _TERM, _TRY)
+
+
+def _is_inflationary(node):
+    # Whether the results of the node include the terms it is applied on.
+    if node[0] == _UNION:
+        return node[1] or any(_is_inflationary(child) for child in node[2])
+    if node[0] in (_TRY, _MEMOIZED):
+        return _is_inflationary(node[1])
+    return node[0] == _IDENTITY
+
+
+def _term_stage(node):
+    # Return a function that applies a node that is applied term by term on
+    # a single term, adds its results to a set, and returns whether it
+    # applied.
+    kind = node[0]
+
+    if kind == _IDENTITY:
+        def stage(term, out):
+            out.add(term)
+            return True
+
+    elif kind == _TERM:
+        apply_term = node[1]
+
+        def stage(term, out):
+            rv = apply_term(term)
+            if rv is failure:
+                return False
+            if isinstance(rv, (set, frozenset)):
+                out |= rv
+            else:
+                out.add(rv)
+            return True
+
+    elif kind == _UNION:
+        keep = node[1]
+        stages = [_term_stage(child) for child in node[2]]
+
+        def stage(term, out):
+            if keep:
+                out.add(term)
+            for child in stages:
+                if not child(term, out):
+                    return False
+            return True
+
+    elif kind == _TRY:
+        child_node = node[1]
+        if child_node[0] == _TERM:
+            # Strategies created by `make_strategy` only add their results
+            # if they apply, hence they can add them to the results of the
+            # pipeline directly.
+            child = _term_stage(child_node)
+
+            def stage(term, out):
+                try:
+                    if child(term, out):
+                        return True
+                except RewritingError:
+                    pass
+                out.add(term)
+                return True
+
+        elif _is_per_term(child_node):
+            child = _term_stage(child_node)
+
+            def stage(term, out):
+                rv = set()
+                try:
+                    if child(term, rv):
+                        out |= rv
+                        return True
+                except RewritingError:
+                    pass
+                out.add(term)
+                return True
+
+        else:
+            child = _set_stage(child_node)
+
+            def stage(term, out):
+                try:
+                    rv = child({term})
+                except RewritingError:
+                    rv = failure
+                if rv is failure:
+                    out.add(term)
+                else:
+                    out |= rv
+                return True
+
+    elif kind == _MEMOIZED:
+        child = _term_stage(node[1])
+        cache = node[2]
+
+        def stage(term, out):
+            result = cache.get(term, _missing)
+            if result is _missing:
+                rv = set()
+                result = frozenset(rv) if child(term, rv) else failure
+                cache.put(term, result)
+
+            if result is failure:
+                return False
+            out |= result
+            return True
+
+    else:
+        raise ValueError('%r is not applied term by term' % (node,))
+
+    return stage
+
+
+def _set_stage(node):
+    # Return a function that applies a node on a set of terms, and returns
+    # the set of its results, or `failure`.
+    kind = node[0]
+
+    if _is_per_term(node):
+        stage = _term_stage(node)
+
+        def apply_one(_, term):
+            rv = set()
+            return rv if stage(term, rv) else failure
+
+        def apply(terms):
+            if (_parallelism is not None) and (len(terms) >= _parallelism.min_terms):
+                if not getattr(_worker_state, 'active', False):
+                    return _apply_in_parallel(apply_one, None, terms, _parallelism)
+
+            rv = set()
+            for term in terms:
+                if not stage(term, rv):
+                    return failure
+            return rv
+
+    elif kind == _UNION:
+        # Operands that are applied term by term are fused in a single pass,
+        # whose results are merged with those of the other operands.
+        per_term = [child for child in node[2] if _is_per_term(child)]
+        stages = [_set_stage(child) for child in node[2] if not _is_per_term(child)]
+        if per_term:
+            stages.insert(0, _set_stage((_UNION, node[1], tuple(per_term))))
+        keep = node[1] and not per_term
+
+        def apply(terms):
+            rv = set(terms) if keep else set()
+            for child in stages:
+                result = child(terms)
+                if result is failure:
+                    return failure
+                rv |= result
+            return rv
+
+    elif kind == _FIXPOINT:
+        body = _set_stage(node[1])
+
+        def apply(terms):
+            rv = body(terms)
+            while (rv is not failure) and (rv != terms):
+                terms = rv
+                rv = body(terms)
+            return rv
+
+    elif kind == _SEMI_NAIVE:
+        body = _set_stage(node[1])
+
+        def apply(terms):
+            rv = body(terms)
+            if rv is failure:
+                return failure
+
+            rv = _mutable(rv)
+            frontier = rv - terms
+            while frontier:
+                result = body(frontier)
+                if result is failure:
+                    return failure
+                frontier = result - rv
+                rv |= frontier
+            return rv
+
+    elif kind == _MEMOIZED:
+        body = _set_stage(node[1])
+        cache = node[2]
+
+        def apply(terms):
+            return _memoized_apply(cache, body, terms)
+
+    else:
+        apply = node[1].apply
+
+    return apply
+
+
+def _iterate(terms):
+    # Streams accept a single term, or an iterable of terms.
+    return (terms,) if isinstance(terms, Sort) else terms
+
+
+def _stream_stage(node):
+    # Return a function that applies a node lazily on an iterable of terms,
+    # and returns an iterator over the distinct terms of its results.
+    kind = node[0]
+
+    if _is_per_term(node):
+        stage = _term_stage(node)
+
+        def stream(terms):
+            seen = set()
+            for term in terms:
+                rv = set()
+                if not stage(term, rv):
+                    raise RewritingError('failed to apply the strategy on %r' % (term,))
+                for result in rv:
+                    if result not in seen:
+                        seen.add(result)
+                        yield result
+
+    elif kind == _UNION:
+        streams = [_stream_stage(child) for child in node[2]]
+        keep = node[1]
+
+        def stream(terms):
+            # Operands that aren't applied term by term are applied on all
+            # the terms, hence these are consumed first.
+            terms = set(terms)
+            seen = set(terms) if keep else set()
+            if keep:
+                yield from terms
+            for child in streams:
+                for result in child(terms):
+                    if result not in seen:
+                        seen.add(result)
+                        yield result
+
+    elif kind == _SEMI_NAIVE:
+        body = _stream_stage(node[1])
+
+        def stream(terms):
+            # Unlike the input of the fixpoint, which is read as the first
+            # frontier gets computed, its results are kept to tell the terms
+            # of the next frontier apart.
+            inputs = set()
+
+            def read(terms):
+                for term in terms:
+                    inputs.add(term)
+                    yield term
+
+            rv = set()
+            frontier = []
+            for result in body(read(terms)):
+                rv.add(result)
+                yield result
+                frontier.append(result)
+            frontier = [term for term in frontier if term not in inputs]
+            del inputs
+
+            while frontier:
+                discovered = []
+                for result in body(frontier):
+                    if result not in rv:
+                        rv.add(result)
+                        yield result
+                        discovered.append(result)
+                frontier = discovered
+
+    else:
+        apply = _set_stage(node)
+
+        def stream(terms):
+            rv = apply(set(terms))
+            if rv is failure:
+                raise RewritingError('failed to apply the strategy')
+            yield from rv
+
+    return stream
@@ -0,0 +1,417 @@
+from ..core import Sort, attr_constructor, generator, operation, _make_term
+from ..exceptions import RewritingError, TranslationError
+
+from .translator import Translator
+
+
+INNERMOST = 'innermost'
+OUTERMOST = 'outermost'
+
+
+class RewritingEngine(Translator):
+    """
+    Normalizes terms with the axioms extracted from the semantics of the
+    registered operations, rather than with their Python implementation.
+
+    Rules are indexed by the operation they define, and tried in the order
+    in which they appear in the operation. Terms are rewritten by a machine
+    that uses an explicit stack of tasks, so that the depth of the terms (or
+    of the recursion of the operations) isn't limited by the Python stack.
+
+    Two strategies are available:
+
+    * `innermost` (the default) normalizes the arguments of an operation
+      before applying it, which corresponds to the semantics of Python;
+    * `outermost` applies an operation as soon as it is encountered, and
+      only normalizes its arguments as far as needed to match the patterns
+      of its rules. Delayed arguments are shared, so they are evaluated at
+      most once.
+
+    Operations that have no rule (e.g. those defined natively) are applied
+    with their Python implementation, on normalized arguments.
+    """
+
+    def __init__(self, strategy=INNERMOST):
+        super().__init__()
+        if strategy not in (INNERMOST, OUTERMOST):
+            raise ValueError("Unknown rewriting strategy '%s'." % strategy)
+
+        self.strategy = strategy
+        self.rules = {}
+
+    def post_translate(self):
+        self.rules = {
+            operation: [_Rule(operation, axiom) for axiom in axioms]
+            for operation, axioms in self.axioms.items()}
+
+    def apply(self, operation, *args, strategy=None):
+        """Applies an operation on the given terms and normalizes the result."""
+
+        if len(args) != len(operation.domain):
+            raise RewritingError(
+                '%s() takes %i arguments but %i were given' %
+                (operation._fn.__qualname__, len(operation.domain), len(args)))
+
+        strategy = strategy or self.strategy
+        if strategy == INNERMOST:
+            return self._run([(_SELECT, operation, list(args), 0)], lazy=False)
+        if strategy == OUTERMOST:
+            thunk = _Thunk(('op', operation, [('const', arg) for arg in args]), None)
+            return self._run([(_NORMALIZE, thunk)], lazy=True)
+        raise ValueError("Unknown rewriting strategy '%s'." % strategy)
+
+    def _run(self, tasks, lazy):
+        # The machine works on a stack of tasks and a stack of values. Tasks
+        # that produce a value push it onto the stack of values, from which
+        # it is popped by the task that consumes it.
+        values = []
+        rules = self.rules
+
+        while tasks:
+            task = tasks.pop()
+            kind = task[0]
+
+            if kind is _EVAL:
+                # Evaluate a template (i.e. the right side of a rule, or a
+                # side of a guard) with the bindings of a rule.
+                (_, template, bindings) = task
+                tag = template[0]
+                if tag == 'var':
+                    values.append(bindings[template[1]])
+                elif tag == 'const':
+                    values.append(template[1])
+                else:
+                    arguments = template[2]
+                    if tag == 'op':
+                        tasks.append((_APPLY, template[1], len(arguments)))
+                    else:
+                        tasks.append((_BUILD, template, len(arguments)))
+                    for argument in reversed(arguments):
+                        tasks.append((_EVAL, argument, bindings))
+
+            elif kind is _BUILD:
+                (_, template, arity) = task
+                arguments = values[len(values) - arity:]
+                del values[len(values) - arity:]
+                values.append(_build(template, arguments))
+
+            elif kind is _APPLY:
+                (_, operation, arity) = task
+                arguments = values[len(values) - arity:]
+                del values[len(values) - arity:]
+                tasks.append((_SELECT, operation, arguments, 0))
+
+            elif kind is _SELECT:
+                # Select the first rule (from the given index) whose patterns
+                # match the arguments, and whose guards are satisfied.
+                (_, operation, arguments, index) = task
+                operation_rules = rules.get(operation)
+
+                if not operation_rules:
+                    if lazy:
+                        tasks.append((_CALL, operation, len(arguments)))
+                        for argument in reversed(arguments):
+                            tasks.append((_NORMALIZE, argument))
+                    else:
+                        values.append(operation(*arguments))
+                    continue
+
+                for index in range(index, len(operation_rules)):
+                    rule = operation_rules[index]
+                    bindings = _match(rule.patterns, arguments)
+
+                    if type(bindings) is tuple:
+                        # A delayed argument has to be evaluated further
+                        # before the rule can be matched.
+                        (demand, thunk) = bindings
+                        tasks.append((_SELECT, operation, arguments, index))
+                        tasks.append((_DISCARD,))
+                        tasks.append((demand, thunk))
+                        break
+
+                    if bindings is not None:
+                        if rule.guards:
+                            self._push_guard(tasks, operation, arguments, index, bindings, 0, lazy)
+                        else:
+                            self._push_rhs(tasks, rule, bindings, lazy)
+                        break
+
+                else:
+                    raise RewritingError('failed to apply %s()' % operation._fn.__qualname__)
+
+            elif kind is _GUARD:
+                (_, operation, arguments, index, bindings, guard_index) = task
+                right = values.pop()
+                left = values.pop()
+
+                rule = rules[operation][index]
+                (_, comparison, _) = rule.guards[guard_index]
+                if bool(left == right) is (comparison == '__eq__'):
+                    if guard_index + 1 < len(rule.guards):
+                        self._push_guard(
+                            tasks, operation, arguments, index, bindings, guard_index + 1, lazy)
+                    else:
+                        self._push_rhs(tasks, rule, bindings, lazy)
+                else:
+                    tasks.append((_SELECT, operation, arguments, index + 1))
+
+            elif kind is _CALL:
+                (_, operation, arity) = task
+                arguments = values[len(values) - arity:]
+                del values[len(values) - arity:]
+                values.append(operation(*arguments))
+
+            elif kind is _FORCE:
+                # Evaluate a delayed term to its head normal form.
+                (_, thunk) = task
+                if thunk.value is not None:
+                    values.append(thunk.value)
+                    continue
+
+                (tag, head, arguments) = thunk.template[:3]
+                if tag == 'op':
+                    tasks.append((_UPDATE, thunk))
+                    tasks.append((_SELECT, head, [
+                        _delay(argument, thunk.bindings) for argument in arguments], 0))
+                else:
+                    thunk.value = _Cons(thunk.template, [
+                        _delay(argument, thunk.bindings) for argument in arguments])
+                    values.append(thunk.value)
+
+            elif kind is _HEAD:
+                # Evaluate the right side of a rule to its head normal form.
+                (_, value) = task
+                if isinstance(value, _Thunk):
+                    tasks.append((_FORCE, value))
+                else:
+                    values.append(value)
+
+            elif kind is _UPDATE:
+                (_, thunk) = task
+                thunk.value = values[-1]
+
+            elif kind is _NORMALIZE:
+                # Fully evaluate a delayed term.
+                (_, value) = task
+                if not isinstance(value, _Thunk):
+                    values.append(value)
+                elif value.normal is not None:
+                    values.append(value.normal)
+                else:
+                    tasks.append((_SET_NORMAL, value))
+                    tasks.append((_NORMALIZE_HEAD,))
+                    tasks.append((_FORCE, value))
+
+            elif kind is _NORMALIZE_HEAD:
+                value = values.pop()
+                if isinstance(value, _Cons):
+                    tasks.append((_BUILD, value.template, len(value.args)))
+                    for argument in reversed(value.args):
+                        tasks.append((_NORMALIZE, argument))
+                else:
+                    values.append(value)
+
+            elif kind is _SET_NORMAL:
+                (_, thunk) = task
+                thunk.normal = values[-1]
+
+            elif kind is _DISCARD:
+                values.pop()
+
+        return values.pop()
+
+    def _push_guard(self, tasks, operation, arguments, index, bindings, guard_index, lazy):
+        (left, _, right) = self.rules[operation][index].guards[guard_index]
+        tasks.append((_GUARD, operation, arguments, index, bindings, guard_index))
+        if lazy:
+            tasks.append((_NORMALIZE, _delay(right, bindings)))
+            tasks.append((_NORMALIZE, _delay(left, bindings)))
+        else:
+            tasks.append((_EVAL, right, bindings))
+            tasks.append((_EVAL, left, bindings))
+
+    def _push_rhs(self, tasks, rule, bindings, lazy):
+        if lazy:
+            tasks.append((_HEAD, _delay(rule.return_value, bindings)))
+        else:
+            tasks.append((_EVAL, rule.return_value, bindings))
+
+
+# Kinds of the tasks of the rewriting machine.
+_EVAL = 'eval'
+_BUILD = 'build'
+_APPLY = 'apply'
+_SELECT = 'select'
+_GUARD = 'guard'
+_CALL = 'call'
+_FORCE = 'force'
+_HEAD = 'head'
+_UPDATE = 'update'
+_NORMALIZE = 'normalize'
+_NORMALIZE_HEAD = 'normalize_head'
+_SET_NORMAL = 'set_normal'
+_DISCARD = 'discard'
+
+
+class _Rule(object):
+
+    __slots__ = ('patterns', 'guards', 'return_value')
+
+    def __init__(self, operation, axiom):
+        matchs = axiom['matchs']
+        self.patterns = [
+            _compile_pattern(matchs[name]) if name in matchs else ('var', name)
+            for name in operation.domain]
+        self.guards = [
+            (_compile_template(left), comparison, _compile_template(right))
+            for left, comparison, right in axiom['guards']]
+        self.return_value = _compile_template(axiom['return_value'])
+
+
+class _Thunk(object):
+    """A delayed term, i.e. a template and the bindings to evaluate it with."""
+
+    __slots__ = ('template', 'bindings', 'value', 'normal')
+
+    def __init__(self, template, bindings):
+        self.template = template
+        self.bindings = bindings
+
+        # The head normal form of the term, and its normal form.
+        self.value = None
+        self.normal = None
+
+
+class _Cons(object):
+    """A head normal form, whose arguments may still be delayed."""
+
+    __slots__ = ('template', 'args')
+
+    def __init__(self, template, args):
+        self.template = template
+        self.args = args
+
+
+def _compile_pattern(term):
+    # Patterns are compiled into tuples `('var', name)`, `('const', term)`,
+    # `('gen', generator, patterns)` or `('rec', sort, patterns, names)`.
+    if isinstance(term, Sort):
+        return ('const', term)
+
+    prefix = term.__prefix__
+    if isinstance(prefix, str):
+        return ('var', prefix)
+
+    if isinstance(prefix, attr_constructor):
+        names = tuple(term.__args__)
+        return ('rec', prefix.codomain, [_compile_pattern(term.__args__[name]) for name in names], names)
+
+    if isinstance(prefix, generator) and not isinstance(prefix, operation):
+        return ('gen', prefix, [_compile_pattern(arg) for arg in term.__args__.values()])
+
+    raise TranslationError('Cannot use %s in a pattern.' % prefix)
+
+
+def _compile_template(term):
+    # Templates are compiled like patterns, except that they can also contain
+    # operation calls, represented as tuples `('op', operation, templates)`.
+    if isinstance(term, Sort):
+        return ('const', term)
+
+    prefix = term.__prefix__
+    if isinstance(prefix, operation):
+        return ('op', prefix, [_compile_template(arg) for arg in term.__args__.values()])
+
+    if isinstance(prefix, attr_constructor):
+        names = tuple(term.__args__)
+        return ('rec', prefix.codomain, [_compile_template(term.__args__[name]) for name in names], names)
+
+    if isinstance(prefix, generator):
+        return ('gen', prefix, [_compile_template(arg) for arg in term.__args__.values()])
+
+    if isinstance(prefix, str):
+        return ('var', prefix)
+
+    raise TranslationError('Cannot translate %s.' % prefix)
+
+
+def _delay(template, bindings):
+    tag = template[0]
+    if tag == 'var':
+        return bindings[template[1]]
+    if tag == 'const':
+        return template[1]
+    return _Thunk(template, bindings)
+
+
+def _build(template, arguments):
+    if template[0] == 'gen':
+        return _make_term(template[1], tuple(arguments))
+    return template[1](**dict(zip(template[3], arguments)))
+
+
+def _match(patterns, arguments):
+    # Match the arguments of an operation with the patterns of a rule. This
+    # returns either the bindings of the variables of the patterns, None if
+    # the patterns don't match, or a tuple `(demand, thunk)` if a delayed
+    # argument should be evaluated further before the patterns can be
+    # matched.
+    bindings = {}
+    stack = list(zip(reversed(patterns), reversed(arguments)))
+
+    while stack:
+        (pattern, value) = stack.pop()
+        tag = pattern[0]
+
+        if tag == 'var':
+            name = pattern[1]
+            if name not in bindings:
+                bindings[name] = value
+                continue
+
+            # Non-linear patterns require their variables to be bound to
+            # equal terms.
+            (left, right) = (bindings[name], value)
+            for term in (left, right):
+                if isinstance(term, _Thunk) and (term.normal is None):
+                    return (_NORMALIZE, term)
+            if isinstance(left, _Thunk):
+                left = left.normal
+            if isinstance(right, _Thunk):
+                right = right.normal
+            if not (left == right):
+                return None
+            continue
+
+        if isinstance(value, _Thunk):
+            if value.normal is not None:
+                value = value.normal
+            elif tag == 'const':
+                return (_NORMALIZE, value)
+            elif value.value is None:
+                return (_FORCE, value)
+            else:
+                value = value.value
+
+        if tag == 'const':
+            if not (value == pattern[1]):
+                return None
+            continue
+
+        if isinstance(value, _Cons):
+            template = value.template
+            if (template[0] != tag) or (template[1] is not pattern[1]):
+                return None
+            subvalues = value.args
+        elif tag == 'gen':
+            if value._generator is not pattern[1]:
+                return None
+            subvalues = value._args
+        else:
+            if (value._generator is not None) or not isinstance(value, pattern[1]):
+                return None
+            subvalues = [getattr(value, name) for name in pattern[3]]
+
+        stack.extend(zip(reversed(pattern[2]), reversed(subvalues)))
+
+    return bindings
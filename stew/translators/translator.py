@@ -1,6 +1,8 @@
 import ast
 import astunparse
+import builtins
 import inspect
+import operator
 
 from collections import OrderedDict
 
@@ -55,8 +57,10 @@ class Translator(object):
     def translate(self):
         self.pre_translate()
 
+        # The mocked scopes of the modules the operations are defined in.
+        scopes = {}
         for operation in self.operations:
-            self._parse_operation(operation, self.register_axiom)
+            self._parse_operation(operation, self.register_axiom, scopes)
 
         self.post_translate()
 
@@ -73,11 +77,13 @@ class Translator(object):
             'return_value': return_value
         })
 
-    def _parse_operation(self, operation, register_axiom):
+    def _parse_operation(self, operation, register_axiom, scopes=None):
         # Parse the semantics of the operation.
         node = ast.parse(_unindent(inspect.getsource(operation._fn._original)))
         node = _TransformIfExpReturn().visit(node)
-        parser = _OperationParser(register_axiom=register_axiom, operation=operation)
+        parser = _OperationParser(
+            register_axiom=register_axiom, operation=operation,
+            scope=_operation_scope(operation, scopes if (scopes is not None) else {}))
         parser.visit(node)
 
 
@@ -93,26 +99,22 @@ class _OperationParser(ast.NodeVisitor):
         ast.In: '__contains__'
     }
 
-    def __init__(self, register_axiom, operation, stack=None, local_vars=None):
+    def __init__(self, register_axiom, operation, stack=None, local_vars=None, scope=None):
         self.register_axiom = register_axiom
         self.operation = operation
         self.stack = stack or []
 
         self.locals = local_vars or {}
 
+        # The scope of the operation is built once, and shared with the
+        # parsers of its branches.
+        self._scope = scope
+
     @property
     def fn_scope(self):
-        rv = dict(self.operation._fn._original.__globals__)
-        rv.update(self.operation._fn._nonlocals)
-
-        # Mock the sorts, generators and operations with term generators.
-        for name in rv:
-            if isinstance(rv[name], type) and issubclass(rv[name], Sort) and (rv[name] != Sort):
-                rv[name] = SortMock(rv[name])
-            if isinstance(rv[name], generator):
-                rv[name] = GeneratorMock(rv[name])
-
-        return rv
+        if self._scope is None:
+            self._scope = _operation_scope(self.operation, {})
+        return self._scope
 
     def visit_Assign(self, node):
         for target in node.targets:
@@ -268,7 +270,8 @@ class _OperationParser(ast.NodeVisitor):
 
     def parse_expr(self, node, var_manager):
         # Dereferences local variables.
-        node = _Dereferencer(self.locals).visit(node)
+        if self.locals:
+            node = _Dereferencer(self.locals).visit(node)
 
         if type(node) == ast.Name:
             # If the node refers to a parameter of the operation, we simply
@@ -283,10 +286,6 @@ class _OperationParser(ast.NodeVisitor):
         else:
             # If the node refers to an arbitrary expression, we evaluate it as
             # a python object and parse it.
-            src = astunparse.unparse(node)
-
-            scope = dict(self.fn_scope)
-            scope['var'] = var_manager
 
             # Inject the arguments of the function.
             local_vars = {}
@@ -294,7 +293,15 @@ class _OperationParser(ast.NodeVisitor):
                 local_vars[name] = getattr(var_manager, name)
                 local_vars[name].__domain__ = self.operation.domain[name]
 
-            obj = eval(src, scope, local_vars)
+            # Most expressions are calls to generators and operators applied
+            # to terms, which are evaluated directly from their AST. The
+            # others are unparsed and evaluated by Python.
+            try:
+                obj = _Evaluator(self.fn_scope, var_manager, local_vars).visit(node)
+            except _Unsupported:
+                scope = dict(self.fn_scope)
+                scope['var'] = var_manager
+                obj = eval(astunparse.unparse(node), scope, local_vars)
 
             return self.parse_object(obj)
 
@@ -349,7 +356,106 @@ class _OperationParser(ast.NodeVisitor):
             register_axiom=self.register_axiom,
             operation=self.operation,
             stack=stack,
-            local_vars=self.locals)
+            local_vars=self.locals,
+            scope=self.fn_scope)
+
+
+class _Unsupported(Exception):
+    pass
+
+
+class _Evaluator(ast.NodeVisitor):
+    """
+    Evaluates the expressions made of names, attributes, calls, constants
+    and operators, as `eval` would in the scope of an operation.
+    """
+
+    binary_operators = {
+        ast.Add: operator.add,
+        ast.Sub: operator.sub,
+        ast.Mult: operator.mul,
+        ast.MatMult: operator.matmul,
+        ast.Div: operator.truediv,
+        ast.FloorDiv: operator.floordiv,
+        ast.Mod: operator.mod,
+        ast.Pow: operator.pow,
+        ast.LShift: operator.lshift,
+        ast.RShift: operator.rshift,
+        ast.BitOr: operator.or_,
+        ast.BitXor: operator.xor,
+        ast.BitAnd: operator.and_
+    }
+
+    unary_operators = {
+        ast.Invert: operator.invert,
+        ast.Not: operator.not_,
+        ast.UAdd: operator.pos,
+        ast.USub: operator.neg
+    }
+
+    comparison_operators = {
+        ast.Eq: operator.eq,
+        ast.NotEq: operator.ne,
+        ast.Lt: operator.lt,
+        ast.LtE: operator.le,
+        ast.Gt: operator.gt,
+        ast.GtE: operator.ge,
+        ast.In: lambda left, right: left in right
+    }
+
+    def __init__(self, scope, var_manager, local_vars):
+        self.scope = scope
+        self.var_manager = var_manager
+        self.locals = local_vars
+
+    def visit_Name(self, node):
+        if node.id in self.locals:
+            return self.locals[node.id]
+        if node.id == 'var':
+            return self.var_manager
+        if node.id in self.scope:
+            return self.scope[node.id]
+        if hasattr(builtins, node.id):
+            return getattr(builtins, node.id)
+        raise _Unsupported()
+
+    def visit_Constant(self, node):
+        return node.value
+
+    def visit_Attribute(self, node):
+        return getattr(self.visit(node.value), node.attr)
+
+    def visit_Call(self, node):
+        fn = self.visit(node.func)
+        args = []
+        for arg in node.args:
+            if type(arg) == ast.Starred:
+                raise _Unsupported()
+            args.append(self.visit(arg))
+
+        kwargs = {}
+        for keyword in node.keywords:
+            if keyword.arg is None:
+                raise _Unsupported()
+            kwargs[keyword.arg] = self.visit(keyword.value)
+
+        return fn(*args, **kwargs)
+
+    def visit_BinOp(self, node):
+        fn = self.binary_operators[type(node.op)]
+        return fn(self.visit(node.left), self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        return self.unary_operators[type(node.op)](self.visit(node.operand))
+
+    def visit_Compare(self, node):
+        fn = self.comparison_operators.get(type(node.ops[0]))
+        if (fn is None) or (len(node.ops) > 1):
+            raise _Unsupported()
+        return fn(self.visit(node.left), self.visit(node.comparators[0]))
+
+    def generic_visit(self, node):
+        raise _Unsupported()
 
 
 class _Dereferencer(ast.NodeTransformer):
@@ -372,6 +478,32 @@ class _TransformIfExpReturn(ast.NodeTransformer):
         return node
 
 
+def _operation_scope(operation, scopes):
+    # Return the scope of an operation, where sorts and generators are mocked
+    # with term generators. The mocked globals of each module are built once
+    # and shared by its operations, as long as they have no nonlocals.
+    namespace = operation._fn._original.__globals__
+    try:
+        rv = scopes[id(namespace)]
+    except KeyError:
+        rv = scopes[id(namespace)] = _mock_scope(namespace)
+
+    if operation._fn._nonlocals:
+        rv = dict(rv)
+        rv.update(_mock_scope(operation._fn._nonlocals))
+    return rv
+
+
+def _mock_scope(namespace):
+    rv = dict(namespace)
+    for name, value in rv.items():
+        if isinstance(value, type) and issubclass(value, Sort) and (value != Sort):
+            rv[name] = SortMock(value)
+        elif isinstance(value, generator):
+            rv[name] = GeneratorMock(value)
+    return rv
+
+
 def _unindent(src):
     indentation = len(src) - len(src.lstrip())
     return '\n'.join([line[indentation:] for line in src.split('\n')])
@@ -1,4 +1,5 @@
 from ..core import Sort, generator, operation
+from ..dispatch import decision_tree
 
 
 class Bool(Sort):
@@ -9,18 +10,21 @@ class Bool(Sort):
     @generator
     def false() -> Bool: pass
 
+    @decision_tree
     @operation
     def __invert__(self: Bool) -> Bool:
         if self == Bool.true():
             return Bool.false()
         return Bool.true()
 
+    @decision_tree
     @operation
     def __and__(self: Bool, other: Bool) -> Bool:
         if (self == Bool.true()) and (other == Bool.true()):
             return Bool.true()
         return Bool.false()
 
+    @decision_tree
     @operation
     def __or__(self: Bool, other: Bool) -> Bool:
         if self == Bool.true():
@@ -29,6 +33,7 @@ class Bool(Sort):
             return Bool.true()
         return Bool.false()
 
+    @decision_tree
     @operation
     def __xor__(self: Bool, other: Bool) -> Bool:
         if (self == Bool.true()) and (other == Bool.false()):
@@ -39,3 +44,9 @@ class Bool(Sort):
 
     def __bool__(self):
         return self == Bool.true()
+
+    @classmethod
+    def _from_native(cls, value):
+        if isinstance(value, bool):
+            return cls.true() if value else cls.false()
+        return Sort._from_native.__func__(cls, value)
@@ -1,35 +1,58 @@
-from ..core import Sort, generator, operation
+from ..core import Sort, failure, generator, operation
+from ..dispatch import decision_tree
 from ..exceptions import ArgumentError
-from ..matching import var
+from ..matching import matches, var
 
 from .bool import Bool
 
 
 class Nat(Sort):
 
+    # Natural numbers created from a Python int (e.g. `Nat(42)`) are backed
+    # by their native value. Their Peano representation (i.e. their
+    # arguments) is only built on demand, when they get pattern matched.
+    __slots__ = ('_value',)
+
     def __init__(self, *args, **kwargs):
         if (len(args) == 1) and isinstance(args[0], int):
             number = args[0]
+            if number < 0:
+                raise ArgumentError(
+                    'Cannot initialize %s with a negative number.' % self.__class__.__name__)
 
-            Sort.__init__(self)
+            self._hash = hash(number)
+            self._interned = False
+            self._value = number
             if number == 0:
                 self._generator = Nat.zero
-            elif number > 0:
-                self._generator = Nat.suc
-                self._generator_args = {'self': Nat(number - 1)}
+                self._args = ()
             else:
-                raise ArgumentError(
-                    'Cannot initialize %s with a negative number.' % self.__class__.__name__)
+                self._generator = Nat.suc
 
         else:
             Sort.__init__(self, **kwargs)
 
+    def __getattr__(self, name):
+        # Build the Peano view of natively backed numbers.
+        if name == '_args':
+            self._args = (Nat(_value_slot.__get__(self) - 1),)
+            return self._args
+
+        # Compute the native value of numbers built with generators.
+        if name == '_value':
+            self._value = self._compute_value()
+            return self._value
+
+        raise AttributeError(
+            "'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+
     @generator
     def zero() -> Nat: pass
 
     @generator
     def suc(self: Nat) -> Nat: pass
 
+    @decision_tree
     @operation
     def __add__(self: Nat, other: Nat) -> Nat:
         # zero + y = y
@@ -40,6 +63,13 @@ class Nat(Sort):
         if self == Nat.suc(var.x):
             return Nat.suc(var.x + other)
 
+    @__add__.native
+    def __add__(self, other):
+        values = _native_values(self, other)
+        if values is not None:
+            return Nat(values[0] + values[1])
+
+    @decision_tree
     @operation
     def __sub__(self: Nat, other: Nat) -> Nat:
         # x - 0 = x
@@ -50,6 +80,15 @@ class Nat(Sort):
         if self == Nat.suc(var.x) and other == Nat.suc(var.y):
             return var.x - var.y
 
+    @__sub__.native
+    def __sub__(self, other):
+        values = _native_values(self, other)
+        if values is not None:
+            if values[0] < values[1]:
+                return failure
+            return Nat(values[0] - values[1])
+
+    @decision_tree
     @operation
     def __mul__(self: Nat, other: Nat) -> Nat:
         # 0 * y = 0
@@ -60,6 +99,12 @@ class Nat(Sort):
         if self == Nat.suc(var.x):
             return var.x * other + other
 
+    @__mul__.native
+    def __mul__(self, other):
+        values = _native_values(self, other)
+        if values is not None:
+            return Nat(values[0] * values[1])
+
     @operation
     def __truediv__(self: Nat, other: Nat) -> Nat:
         # if x < y then x / y = 0
@@ -70,12 +115,27 @@ class Nat(Sort):
         if (self >= other) and (other != Nat.zero()):
             return Nat.suc((self - other) / other)
 
+    @__truediv__.native
+    def __truediv__(self, other):
+        # Divisions by zero are left to the rewriting semantics, which will
+        # fail to apply.
+        values = _native_values(self, other)
+        if (values is not None) and (values[1] != 0):
+            return Nat(values[0] // values[1])
+
     @operation
     def __mod__(self: Nat, other: Nat) -> Nat:
         # if y != 0 then x % y = x - (y * (x / y))
         if other != Nat.zero():
             return self - (other * (self / other))
 
+    @__mod__.native
+    def __mod__(self, other):
+        values = _native_values(self, other)
+        if (values is not None) and (values[1] != 0):
+            return Nat(values[0] % values[1])
+
+    @decision_tree
     @operation
     def __lt__(self: Nat, other: Nat) -> Bool:
         # 0 < 0 = false
@@ -94,27 +154,129 @@ class Nat(Sort):
         if (self == Nat.suc(var.x)) and (other == Nat.suc(var.y)):
             return var.x < var.y
 
+    @__lt__.native
+    def __lt__(self, other):
+        values = _native_values(self, other)
+        if values is not None:
+            return _native_bool(values[0] < values[1])
+
     @operation
     def __le__(self: Nat, other: Nat) -> Bool:
         if self == other:
             return Bool.true()
         return self < other
 
+    @__le__.native
+    def __le__(self, other):
+        values = _native_values(self, other)
+        if values is not None:
+            return _native_bool(values[0] <= values[1])
+
     @operation
     def __ge__(self: Nat, other: Nat) -> Bool:
         if self == other:
             return Bool.true()
         return self > other
 
+    @__ge__.native
+    def __ge__(self, other):
+        values = _native_values(self, other)
+        if values is not None:
+            return _native_bool(values[0] >= values[1])
+
     @operation
     def __gt__(self: Nat, other: Nat) -> Bool:
         return ~(self <= other)
 
+    @__gt__.native
+    def __gt__(self, other):
+        values = _native_values(self, other)
+        if values is not None:
+            return _native_bool(values[0] > values[1])
+
+    def __eq__(self, other):
+        # Compare ground numbers by their native value rather than matching
+        # their Peano representation.
+        if isinstance(other, Nat):
+            values = _native_values(self, other)
+            if values is not None:
+                return values[0] == values[1]
+        return matches(self, other)
+
+    # Defining __eq__ would otherwise make Nat unhashable.
+    __hash__ = Sort.__hash__
+
+    def _structural_hash(self):
+        # Ground numbers are hashed by their native value, so that numbers
+        # built with generators and natively backed numbers hash the same.
+        value = self._value
+        if value is None:
+            return Sort._structural_hash(self)
+        return hash(value)
+
     def _as_int(self):
-        if self._generator == Nat.zero:
-            return 0
-        elif self._generator == Nat.suc:
-            return 1 + self._generator_args['self']._as_int()
+        return self._value
+
+    @classmethod
+    def _from_native(cls, value):
+        if isinstance(value, int):
+            return cls(value)
+        return Sort._from_native.__func__(cls, value)
+
+    def _to_native(self):
+        return self._value
+
+    def _compute_value(self):
+        # Walk down the Peano representation of the number, until we reach
+        # either zero or a number whose native value is known.
+        path = []
+        term = self
+        while True:
+            if term._generator is Nat.zero:
+                value = 0
+                break
+            if (term._generator is not Nat.suc) or not isinstance(term._args[0], Nat):
+                # The number is either a variable or a pattern that contains
+                # one.
+                value = None
+                break
+
+            path.append(term)
+            term = term._args[0]
+            try:
+                value = _value_slot.__get__(term)
+                break
+            except AttributeError:
+                pass
+
+        if value is None:
+            return None
+
+        for depth, subterm in enumerate(reversed(path)):
+            subterm._value = value + depth + 1
+        return value + len(path)
 
     def __str__(self):
-        return '%s(%i)' % (self.__class__.__name__, self._as_int())
+        value = self._value
+        if value is None:
+            return Sort.__str__(self)
+        return '%s(%i)' % (self.__class__.__name__, value)
+
+
+_value_slot = Nat.__dict__['_value']
+
+
+def _native_values(*terms):
+    values = []
+    for term in terms:
+        if not isinstance(term, Nat):
+            return None
+        value = term._value
+        if value is None:
+            return None
+        values.append(value)
+    return values
+
+
+def _native_bool(value):
+    return Bool.true() if value else Bool.false()
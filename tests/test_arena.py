@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+
+from stew.arena import Arena, write_arena
+from stew.core import Attribute, Sort, generator
+from stew.exceptions import SerializationError
+from stew.matching import push_context, var
+from stew.serialization import dumps, loads
+from stew.types.bool import Bool
+from stew.types.nat import Nat
+
+from .test_serialization import List, Pair, make_list
+
+
+class TestArena(unittest.TestCase):
+
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_round_trip(self):
+        terms = [
+            make_list(1, 2, 3), Pair(lhs=Bool.true(), rhs=make_list(4)),
+            Nat(10 ** 30), Nat(5), List.nil()]
+        write_arena(self.path, terms)
+
+        with Arena(self.path) as arena:
+            self.assertEqual(len(arena), len(terms))
+            self.assertEqual(list(arena), terms)
+            for view, term in zip(arena, terms):
+                self.assertIsInstance(view, term.__class__)
+                self.assertEqual(hash(view), hash(term))
+                self.assertEqual(str(view), str(term))
+                self.assertEqual(loads(dumps(view)), term)
+
+    def test_shared_nodes(self):
+        tail = make_list(*range(10))
+        write_arena(self.path, [List.cons(head=Nat(index), tail=tail) for index in range(10)])
+
+        with Arena(self.path) as arena:
+            self.assertEqual(len(arena._codes), 10 + 11 + 10)
+            self.assertIs(arena[0]._args[1], arena[1]._args[1])
+
+    def test_lazy_materialization(self):
+        term = List.nil()
+        for index in range(10000):
+            term = List.cons(head=Nat(index % 10), tail=term)
+        write_arena(self.path, [term])
+
+        with Arena(self.path) as arena:
+            view = arena[0]
+            with push_context():
+                pattern = List.cons(head=var.x, tail=List.cons(head=var.y, tail=var.z))
+                self.assertTrue(view == pattern)
+                self.assertEqual(var.x, Nat(9))
+                self.assertEqual(var.y, Nat(8))
+            self.assertLessEqual(len(arena._views), 5)
+
+            # Hashing the view doesn't materialize its subterms either.
+            self.assertEqual(hash(view), hash(term))
+            self.assertLessEqual(len(arena._views), 5)
+
+            # Terms built from views can be hashed.
+            self.assertEqual(
+                hash(List.cons(head=Nat(0), tail=view)), hash(List.cons(head=Nat(0), tail=term)))
+            self.assertLessEqual(len(arena._views), 5)
+
+    def test_lazy_records(self):
+        write_arena(self.path, [Pair(lhs=Bool.true(), rhs=make_list(*range(100)))])
+
+        with Arena(self.path) as arena:
+            view = arena[0]
+            self.assertEqual(len(arena._views), 1)
+
+            # The attributes of a record are materialized one by one, when
+            # they are accessed.
+            self.assertEqual(view.lhs, Bool.true())
+            self.assertEqual(len(arena._views), 2)
+            self.assertIs(view.rhs, view.rhs)
+            self.assertEqual(len(arena._views), 3)
+            self.assertEqual(view.rhs, make_list(*range(100)))
+            self.assertIsInstance(view.__class__.lhs, Attribute)
+
+    def test_errors(self):
+        class Local(Sort):
+
+            @generator
+            def nil() -> Local: pass
+
+        with self.assertRaises(SerializationError):
+            write_arena(self.path, [Local.nil()])
+
+        with open(self.path, 'wb') as f:
+            f.write(b'not an arena')
+        with self.assertRaises(SerializationError):
+            Arena(self.path)
+
+        # Empty and truncated files are rejected as well.
+        write_arena(self.path, [make_list(1, 2, 3)])
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for size in (0, len(data) - 8):
+            with open(self.path, 'wb') as f:
+                f.write(data[:size])
+            with self.assertRaises(SerializationError):
+                Arena(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+
+from stew import caching, settings
+from stew.caching import CodeCache, LRUCache
+from stew.core import Sort, generator, memoization, operation, operation_cache
+from stew.dispatch import decision_tree
+from stew.matching import var
+
+
+calls = []
+
+
+class S(Sort):
+
+    @generator
+    def nil() -> S: pass
+
+    @generator
+    def suc(self: S) -> S: pass
+
+    @operation
+    def double(self: S) -> S:
+        calls.append(self)
+        if self == S.nil():
+            return S.nil()
+        if self == S.suc(var.x):
+            return S.suc(S.suc(var.x.double()))
+
+    @operation
+    def pred(self: S) -> S:
+        calls.append(self)
+        if self == S.suc(var.x):
+            return var.x
+
+
+class _Key(object):
+
+    # Keys that are all equal, and that call a hook each time they are hashed.
+
+    def __init__(self):
+        self.hooks = []
+
+    def __hash__(self):
+        if self.hooks:
+            hook = self.hooks.pop(0)
+            if hook is not None:
+                hook()
+        return 0
+
+    def __eq__(self, other):
+        return isinstance(other, _Key)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_counters(self):
+        cache = LRUCache(maxsize=2)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 1, 0))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (0, 0, 0))
+
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_unbounded(self):
+        cache = LRUCache(maxsize=None)
+        for i in range(100):
+            cache.put(i, i)
+        self.assertEqual(len(cache), 100)
+        self.assertEqual(cache.evictions, 0)
+
+    def test_threads(self):
+        # Evict an entry from another thread while it is being looked up,
+        # between finding it and marking it as recently used.
+        threads = []
+
+        def evict():
+            thread = threading.Thread(target=cache.put, args=('b', 2))
+            thread.start()
+            thread.join(0.1)
+            threads.append(thread)
+
+        cache = LRUCache(maxsize=1)
+        cache.put(_Key(), 1)
+        key = _Key()
+        key.hooks = [None, evict]
+        self.assertEqual(cache.get(key), 1)
+
+        threads[0].join()
+        self.assertNotIn(key, cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_reentrancy(self):
+        # Hashing a key may look the cache up again, from the same thread.
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        key = _Key()
+        key.hooks = [lambda: self.assertEqual(cache.get('a'), 1)]
+        self.assertIsNone(cache.get(key))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_pickle(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('b', 2)
+        self.assertEqual(len(cache), 2)
+
+
+class TestMemoization(unittest.TestCase):
+
+    def setUp(self):
+        del calls[:]
+        S.double._cache = None
+
+    def test_operation_memoization(self):
+        S.double.memoize(maxsize=8)
+        two = S.suc(S.suc(S.nil()))
+
+        self.assertEqual(two.double(), S.suc(S.suc(S.suc(S.suc(S.nil())))))
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(S.suc(S.suc(S.nil())).double(), two.double())
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(S.double.cache.misses, 3)
+        self.assertEqual(S.double.cache.hits, 2)
+
+        # Operations that aren't memoized are left untouched.
+        self.assertIsNone(S.pred.cache)
+
+    def test_global_memoization(self):
+        self.assertIsNone(operation_cache())
+        with memoization(maxsize=2) as cache:
+            self.assertIs(S.pred.cache, cache)
+
+            S.suc(S.nil()).pred()
+            S.suc(S.nil()).pred()
+            self.assertEqual(len(calls), 1)
+
+            S.suc(S.suc(S.nil())).double()
+            self.assertEqual(len(cache), 2)
+            self.assertGreater(cache.evictions, 0)
+
+        self.assertIsNone(operation_cache())
+
+
+class TestCodeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'module.py')
+        with open(self.filename, 'w') as f:
+            f.write('x = 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_persistence(self):
+        code = compile('x + 1', filename='', mode='eval')
+        cache = CodeCache()
+        self.assertIsNone(cache.get(self.filename, 'key'))
+        cache.put(self.filename, 'key', code)
+        self.assertIs(cache.get(self.filename, 'key'), code)
+        cache.flush()
+
+        self.assertEqual(CodeCache().get(self.filename, 'key'), code)
+        self.assertIsNone(CodeCache(persistent=False).get(self.filename, 'key'))
+
+        # The cache is invalidated when the source file changes.
+        with open(self.filename, 'w') as f:
+            f.write('x = 2\n')
+        self.assertIsNone(CodeCache().get(self.filename, 'key'))
+
+    def test_rewriter_changes(self):
+        code = compile('x + 1', filename='', mode='eval')
+        cache = CodeCache()
+        cache.put(self.filename, 'key', code)
+        cache.flush()
+
+        # The cache is invalidated when the code that rewrites operations
+        # changes, e.g. when stew is upgraded.
+        rewriter = caching._rewriter_digest()
+        caching._rewriter = b'other'
+        try:
+            self.assertIsNone(CodeCache().get(self.filename, 'key'))
+        finally:
+            caching._rewriter = rewriter
+        self.assertEqual(CodeCache().get(self.filename, 'key'), code)
+
+    def test_missing_source(self):
+        cache = CodeCache()
+        cache.put('<stdin>', 'key', compile('1', filename='', mode='eval'))
+        self.assertIsNone(cache.get('<stdin>', 'key'))
+        cache.flush()
+
+
+class TestLazyOperations(unittest.TestCase):
+
+    def setUp(self):
+        self.lazy = settings.LAZY_OPERATIONS
+        settings.LAZY_OPERATIONS = True
+
+    def tearDown(self):
+        settings.LAZY_OPERATIONS = self.lazy
+
+    def test_lazy_rewriting(self):
+        class T(Sort):
+
+            @generator
+            def nil() -> T: pass
+
+            @generator
+            def suc(self: T) -> T: pass
+
+            @operation
+            def pred(self: T) -> T:
+                if self == T.suc(var.x):
+                    return var.x
+
+            @decision_tree
+            @operation
+            def is_nil(self: T) -> T:
+                if self == T.nil():
+                    return self
+
+        pending = T.pred._fn
+        self.assertIs(pending._original, T.pred._fn._original)
+        self.assertEqual(T.pred._fn.__qualname__, pending._original.__qualname__)
+
+        self.assertEqual(T.pred(T.suc(T.nil())), T.nil())
+        self.assertIsNot(T.pred._fn, pending)
+        self.assertIs(T.pred._fn._original, pending._original)
+        self.assertEqual(T.is_nil(T.nil()), T.nil())
+
+
+if __name__ == '__main__':
+    unittest.main()
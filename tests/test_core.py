@@ -1,6 +1,10 @@
+import gc
+import sys
 import unittest
 
-from stew.core import Sort, generator
+from stew.core import Attribute, Sort, generator, hash_consing, _intern_table
+from stew.exceptions import ArgumentError
+from stew.matching import push_context, var
 
 
 class S(Sort):
@@ -12,9 +16,123 @@ class S(Sort):
     def suc(self: S) -> S: pass
 
 
+class T(Sort):
+
+    @generator
+    def cons(lhs: S, rhs: S) -> T: pass
+
+
 class TestSort(unittest.TestCase):
 
     def test_generator_equality(self):
         self.assertEqual(S.nil(), S.nil())
         self.assertEqual(S.suc(S.nil()), S.suc(S.nil()))
         self.assertEqual(S.suc(S.suc(S.nil())), S.suc(S.suc(S.nil())))
+
+    def test_hash_consing(self):
+        with hash_consing():
+            self.assertIs(S.nil(), S.nil())
+            self.assertIs(S.suc(S.suc(S.nil())), S.suc(S.suc(S.nil())))
+            self.assertIsNot(S.suc(S.nil()), S.nil())
+
+            with push_context():
+                # Terms with variables are never interned.
+                self.assertIsNot(S.suc(var.x), S.suc(var.x))
+
+        self.assertIsNot(S.nil(), S.nil())
+
+    def test_hash_consing_equality(self):
+        with hash_consing():
+            interned = S.suc(S.suc(S.nil()))
+        self.assertEqual(interned, S.suc(S.suc(S.nil())))
+
+        with hash_consing():
+            self.assertEqual(interned, S.suc(S.suc(S.nil())))
+            self.assertNotEqual(interned, S.suc(S.nil()))
+
+    def test_hash_consing_table_is_weak(self):
+        with hash_consing():
+            term = S.suc(S.suc(S.nil()))
+            size = len(_intern_table)
+            del term
+            gc.collect()
+            self.assertLess(len(_intern_table), size)
+
+    def test_hash(self):
+        self.assertEqual(hash(S.nil()), hash(S.nil()))
+        self.assertEqual(hash(S.suc(S.nil())), hash(S.suc(S.nil())))
+        self.assertEqual(len({S.nil(), S.nil(), S.suc(S.nil())}), 2)
+
+    def test_hash_is_cached(self):
+        # The hash of a term should be computed from that of its arguments
+        # when it is built, so that hashing deep terms doesn't recurse.
+        term = S.nil()
+        for _ in range(sys.getrecursionlimit() * 2):
+            term = S.suc(term)
+
+        self.assertIsNotNone(term._hash)
+        self.assertIn(term, {term})
+
+    def test_generator_arguments(self):
+        term = T.cons(lhs=S.nil(), rhs=S.suc(S.nil()))
+        self.assertEqual(term._args, (S.nil(), S.suc(S.nil())))
+        self.assertEqual(list(term._generator_args), ['lhs', 'rhs'])
+        self.assertEqual(term._generator_args['rhs'], S.suc(S.nil()))
+        self.assertIsNone(S.nil()._generator_args)
+
+        with self.assertRaises(KeyError):
+            term._generator_args['foo']
+
+    def test_terms_have_no_instance_dictionary(self):
+        self.assertFalse(hasattr(S.nil(), '__dict__'))
+        self.assertFalse(hasattr(T.cons(lhs=S.nil(), rhs=S.nil()), '__dict__'))
+
+    def test_records_have_an_instance_dictionary(self):
+        # Sorts that don't declare generators can set instance attributes of
+        # their own, along with the attributes of the sort.
+        class Named(Sort):
+
+            value = Attribute(domain=S)
+
+            def __init__(self, value, name):
+                super().__init__(value=value)
+                self.name = name
+
+        term = Named(S.nil(), name='nil')
+        term.comment = 'the empty one'
+        self.assertEqual((term.value, term.name, term.comment), (S.nil(), 'nil', 'the empty one'))
+        self.assertEqual(term, Named(S.nil(), name='other'))
+
+    def test_from_values(self):
+        one = S.suc(S.nil())
+        terms = T.from_values([
+            ('cons', ('suc', ('nil',)), ('nil',)),
+            ('cons', ('nil',), one),
+            T.cons(lhs=S.nil(), rhs=S.nil())])
+        self.assertEqual(terms, [
+            T.cons(lhs=one, rhs=S.nil()),
+            T.cons(lhs=S.nil(), rhs=one),
+            T.cons(lhs=S.nil(), rhs=S.nil())])
+
+        # Equal values are built once.
+        (lhs, rhs) = T.from_values([('cons', ('nil',), ('nil',)), ('cons', ('nil',), ('nil',))])
+        self.assertIs(lhs, rhs)
+        self.assertIs(lhs._args[0], lhs._args[1])
+
+        for value in (('cons', ('nil',)), ('suc', ('nil',)), ('nil',), (), 'nil'):
+            with self.assertRaises(ArgumentError):
+                T.from_values([value])
+        with self.assertRaises(ArgumentError):
+            T.from_values([('cons', ('nil',), T.cons(lhs=S.nil(), rhs=S.nil()))])
+
+    def test_from_deep_values(self):
+        value = ('nil',)
+        for _ in range(sys.getrecursionlimit() * 2):
+            value = ('suc', value)
+
+        term = S.from_values([value])[0]
+        depth = 0
+        while term._generator is S.suc:
+            term = term._args[0]
+            depth += 1
+        self.assertEqual(depth, sys.getrecursionlimit() * 2)
@@ -0,0 +1,87 @@
+import unittest
+
+from stew.core import Sort, Attribute, generator
+from stew.matching import push_context, var
+from stew.types.nat import Nat
+
+
+DEPTH = 10 ** 6
+
+
+class S(Sort):
+
+    @generator
+    def nil() -> S: pass
+
+    @generator
+    def suc(self: S) -> S: pass
+
+
+class R(Sort):
+
+    foo = Attribute(domain=S)
+
+
+class L(Sort):
+
+    @generator
+    def leaf(record: R) -> L: pass
+
+    @generator
+    def suc(self: L) -> L: pass
+
+
+def make_chain(generator, leaf, depth=DEPTH):
+    term = leaf
+    for _ in range(depth):
+        term = generator(term)
+    return term
+
+
+class TestDeepTerms(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.term = make_chain(S.suc, S.nil())
+        cls.other = make_chain(S.suc, S.nil())
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.term
+        del cls.other
+
+    def test_matching(self):
+        self.assertEqual(self.term, self.other)
+        self.assertNotEqual(self.term, self.other._args[0])
+
+        with push_context():
+            self.assertEqual(self.term, make_chain(S.suc, var.x, DEPTH - 1))
+            self.assertEqual(var.x, S.suc(S.nil()))
+
+    def test_equiv(self):
+        self.assertTrue(self.term.equiv(self.other))
+        self.assertFalse(self.term.equiv(self.other._args[0]))
+
+    def test_hashing(self):
+        self.assertEqual(hash(self.term), hash(self.other))
+        self.assertIn(self.other, {self.term})
+
+        # Records are hashed lazily, which also delays the computation of
+        # the hash of the terms that contain them.
+        term = make_chain(L.suc, L.leaf(R(foo=S.nil())))
+        self.assertIsNone(term._hash)
+        self.assertEqual(hash(term), hash((L.suc,) + term._args))
+
+    def test_printing(self):
+        self.assertTrue(str(self.term).startswith('S.suc(self: S.suc(self: '))
+        self.assertTrue(str(self.term).endswith('S.nil' + ')' * DEPTH))
+
+    def test_nat(self):
+        term = make_chain(Nat.suc, Nat.zero())
+        self.assertEqual(term._as_int(), DEPTH)
+        self.assertEqual(term, Nat(DEPTH))
+        self.assertEqual(str(term), 'Nat(%i)' % DEPTH)
+
+        with push_context():
+            self.assertEqual(term, Nat.suc(Nat.suc(var.x)))
+            self.assertEqual(var.x, Nat(DEPTH - 2))
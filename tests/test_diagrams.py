@@ -0,0 +1,160 @@
+import unittest
+
+from stew.core import Attribute, Sort, generator
+from stew.diagrams import EMPTY, TermSet, local, native
+from stew.exceptions import ArgumentError
+from stew.matching import Var
+from stew.strategies import fixpoint, identity, make_strategy, memoized, union
+from stew.types.bool import Bool
+from stew.types.nat import Nat
+
+
+class Bits(Sort):
+
+    @generator
+    def nil() -> Bits: pass
+
+    @generator
+    def cons(head: Bool, tail: Bits) -> Bits: pass
+
+
+class Counters(Sort):
+
+    x = Attribute(domain=Nat)
+    y = Attribute(domain=Nat)
+
+
+def make_bits(*values):
+    term = Bits.nil()
+    for value in reversed(values):
+        term = Bits.cons(head=Bool.true() if value else Bool.false(), tail=term)
+    return term
+
+
+def all_bits(length):
+    terms = [Bits.nil()]
+    for _ in range(length):
+        terms = [Bits.cons(head=head, tail=tail)
+                 for head in (Bool.false(), Bool.true()) for tail in terms]
+    return set(terms)
+
+
+flip = make_strategy(Bool.__invert__)
+
+
+def flip_at(index):
+    rv = local(Bits.cons, 'head', flip)
+    for _ in range(index):
+        rv = local(Bits.cons, 'tail', rv)
+    return rv
+
+
+class TestTermSet(unittest.TestCase):
+
+    def test_set_operations(self):
+        terms = sorted(all_bits(4), key=str)
+        (lhs, rhs) = (set(terms[:10]), set(terms[6:]))
+        (a, b) = (TermSet(lhs), TermSet(rhs))
+
+        self.assertEqual(set(a), lhs)
+        self.assertEqual(len(a), 10)
+        self.assertEqual(set(a | b), lhs | rhs)
+        self.assertEqual(set(a & b), lhs & rhs)
+        self.assertEqual(set(a - b), lhs - rhs)
+        self.assertEqual(set(b - a), rhs - lhs)
+        self.assertEqual(set(a | rhs), lhs | rhs)
+        self.assertEqual(set(lhs - b), lhs - rhs)
+
+        self.assertTrue(a & b <= a)
+        self.assertFalse(a <= b)
+        self.assertIs(a - a, EMPTY)
+        self.assertFalse(EMPTY)
+
+        for term in terms:
+            self.assertEqual(term in a, term in lhs)
+        self.assertNotIn(make_bits(1, 1), a)
+        self.assertNotIn(Nat(1), a)
+
+    def test_hash_consing(self):
+        terms = all_bits(3)
+        a = TermSet(terms)
+        self.assertIs(TermSet(list(terms)[::-1]), a)
+        self.assertEqual(a, terms)
+        self.assertEqual({a: 1}[TermSet(terms)], 1)
+
+        # The size of the set of all the lists of bits of a given length is
+        # linear in their length.
+        sizes = [TermSet(all_bits(length)).node_count() for length in (3, 4, 9, 10)]
+        self.assertEqual(sizes[1] - sizes[0], sizes[3] - sizes[2])
+
+    def test_records_and_natives(self):
+        terms = {Counters(x=Nat(x), y=Nat(y)) for x in range(3) for y in range(4)}
+        a = TermSet(terms | {Nat(1), Nat(10 ** 20)})
+        self.assertEqual(set(a), terms | {Nat(1), Nat(10 ** 20)})
+        self.assertIn(Counters(x=Nat(2), y=Nat(3)), a)
+        self.assertNotIn(Counters(x=Nat(3), y=Nat(3)), a)
+
+    def test_deep_terms(self):
+        # The operations on sets of deep terms don't recurse on their depth.
+        values = [0] * 10000
+        (a, b) = (make_bits(*values), make_bits(*values[:-1], 1))
+        terms = TermSet([a]) | TermSet([b])
+
+        self.assertEqual(terms.count(), 2)
+        self.assertIn(a, terms)
+        self.assertNotIn(make_bits(*values[1:]), terms)
+        self.assertIs(terms & TermSet([a]), TermSet([a]))
+        self.assertIs(terms - TermSet([a]), TermSet([b]))
+        self.assertEqual(set(terms), {a, b})
+
+    def test_errors(self):
+        with self.assertRaises(ArgumentError):
+            TermSet([Bits.cons(head=Var('x'), tail=Bits.nil())])
+        with self.assertRaises(ArgumentError):
+            TermSet([1])
+        with self.assertRaises(ArgumentError):
+            local(Bits.cons, 'value', flip)
+        with self.assertRaises(ArgumentError):
+            local(Counters, 'z', flip)
+
+
+class TestHomomorphisms(unittest.TestCase):
+
+    def test_local(self):
+        terms = {make_bits(0, 0), make_bits(1, 0), make_bits(1)}
+        self.assertEqual(
+            flip_at(1)(TermSet(terms)), TermSet({make_bits(0, 1), make_bits(1, 1)}))
+
+        # Explicit sets of terms are converted.
+        self.assertEqual(flip_at(0)(terms), {make_bits(1, 0), make_bits(0, 0), make_bits(0)})
+        self.assertEqual(flip_at(0)(make_bits(1)), {make_bits(0)})
+        self.assertEqual(flip_at(2)(terms), set())
+
+    def test_native(self):
+        increment_x = local(Counters, 'x', native(lambda value: value + 1 if value < 2 else None))
+        terms = TermSet({Counters(x=Nat(x), y=Nat(0)) for x in range(3)})
+        self.assertEqual(
+            set(increment_x(terms)), {Counters(x=Nat(x), y=Nat(0)) for x in (1, 2)})
+
+        strategy = fixpoint(union(identity, increment_x))
+        self.assertEqual(
+            strategy(TermSet([Counters(x=Nat(0), y=Nat(0))])), terms)
+
+    def test_fixpoint(self):
+        # The reachable lists of 16 bits, whose bits can be flipped one by
+        # one, are all the lists of 16 bits.
+        strategy = fixpoint(union(identity, *[flip_at(index) for index in range(16)]))
+        rv = strategy(TermSet([make_bits(*[0] * 16)]))
+        self.assertEqual(rv.count(), 2 ** 16)
+        self.assertLess(rv.node_count(), 16 * 4)
+
+        # The combinators and the explicit strategies they apply agree.
+        strategy = fixpoint(union(identity, flip_at(0), flip_at(2)))
+        self.assertEqual(
+            set(strategy(TermSet([make_bits(0, 0, 0)]))), strategy(make_bits(0, 0, 0)))
+        self.assertEqual(
+            memoized(strategy)(TermSet([make_bits(0, 0, 0)])).count(), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
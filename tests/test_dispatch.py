@@ -0,0 +1,131 @@
+import itertools
+import unittest
+
+from stew.core import Sort, generator, operation
+from stew.dispatch import decision_tree
+from stew.exceptions import RewritingError
+from stew.matching import var
+
+
+guard_calls = []
+
+
+def guard(term):
+    guard_calls.append(term)
+    return True
+
+
+class S(Sort):
+
+    @generator
+    def nil() -> S: pass
+
+    @generator
+    def suc(self: S) -> S: pass
+
+    @generator
+    def cons(lhs: S, rhs: S) -> S: pass
+
+    @operation
+    def sequential(self: S, other: S) -> S:
+        if (self == S.nil()) and (other == S.nil()):
+            return S.nil()
+        if (self == S.suc(var.x)) and guard(var.x) and (other == S.suc(var.y)):
+            return S.cons(lhs=var.x, rhs=var.y)
+        if (self == S.cons(lhs=var.x, rhs=var.x)) and (other == S.nil()):
+            return var.x
+        if self == S.cons(lhs=S.suc(var.x), rhs=var.y):
+            if other == S.suc(var.z):
+                return S.cons(lhs=var.y, rhs=var.z)
+            return S.suc(var.x)
+        if other == S.suc(var.x):
+            return var.x
+
+    @decision_tree
+    @operation
+    def compiled(self: S, other: S) -> S:
+        if (self == S.nil()) and (other == S.nil()):
+            return S.nil()
+        if (self == S.suc(var.x)) and guard(var.x) and (other == S.suc(var.y)):
+            return S.cons(lhs=var.x, rhs=var.y)
+        if (self == S.cons(lhs=var.x, rhs=var.x)) and (other == S.nil()):
+            return var.x
+        if self == S.cons(lhs=S.suc(var.x), rhs=var.y):
+            if other == S.suc(var.z):
+                return S.cons(lhs=var.y, rhs=var.z)
+            return S.suc(var.x)
+        if other == S.suc(var.x):
+            return var.x
+
+    @operation
+    def sequential_catch_all(self: S) -> S:
+        if self == S.suc(var.x):
+            return var.x
+        if self == var.x:
+            return S.suc(var.x)
+
+    @decision_tree
+    @operation
+    def compiled_catch_all(self: S) -> S:
+        if self == S.suc(var.x):
+            return var.x
+        if self == var.x:
+            return S.suc(var.x)
+
+    @decision_tree
+    @operation
+    def reassigned(self: S) -> S:
+        if self == S.suc(var.x):
+            self = var.x
+        return self
+
+
+def terms(depth):
+    rv = [S.nil()]
+    for _ in range(depth):
+        rv = rv + [S.suc(t) for t in rv] + [S.cons(lhs=l, rhs=r) for l, r in itertools.product(rv, rv)]
+        rv = list({str(t): t for t in rv}.values())
+    return rv
+
+
+class TestDecisionTree(unittest.TestCase):
+
+    def test_sequential_semantics(self):
+        for lhs, rhs in itertools.product(terms(2), repeat=2):
+            try:
+                expected = lhs.sequential(rhs)
+            except RewritingError:
+                with self.assertRaises(RewritingError):
+                    lhs.compiled(rhs)
+                continue
+
+            self.assertEqual(lhs.compiled(rhs), expected)
+
+    def test_catch_all(self):
+        # Bare variables aren't patterns the decision tree dispatches on.
+        for term in terms(2):
+            self.assertEqual(term.compiled_catch_all(), term.sequential_catch_all())
+
+    def test_guards(self):
+        del guard_calls[:]
+        S.suc(S.nil()).compiled(S.suc(S.nil()))
+        self.assertEqual(guard_calls, [S.nil()])
+
+        del guard_calls[:]
+        S.nil().compiled(S.suc(S.nil()))
+        self.assertEqual(guard_calls, [])
+
+    def test_specializations(self):
+        S.compiled._fn._branches.clear()
+        S.nil().compiled(S.suc(S.nil()))
+        S.nil().compiled(S.suc(S.suc(S.nil())))
+        self.assertEqual(list(S.compiled._fn._branches), [(S.nil, S.suc)])
+
+    def test_fallback(self):
+        self.assertEqual(S.compiled(S.nil(), other=S.nil()), S.nil())
+        self.assertEqual(S.reassigned(S.suc(S.nil())), S.nil())
+        self.assertEqual(S.reassigned._fn._positions, ())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
+import threading
 import unittest
 
-from stew.core import Sort, Attribute, generator, operation
+from stew.core import Sort, Attribute, failure, generator, operation
 from stew.exceptions import MatchError, RewritingError
 from stew.matching import push_context, var
 
@@ -104,6 +105,21 @@ class TestRewriting(unittest.TestCase):
 
         with self.assertRaises(RewritingError):
             f(S.nil())
+        self.assertIs(f.apply(S.nil()), failure)
+
+    def test_rewriting_errors(self):
+
+        @operation
+        def f(x: S) -> S:
+            return x.undefined
+
+        with self.assertRaises(RewritingError) as context:
+            f.apply(S.nil())
+
+        message = str(context.exception)
+        self.assertIn(__file__, message)
+        self.assertIn('line %i' % f._fn._original.__code__.co_firstlineno, message)
+        self.assertIn('AttributeError', message)
 
     # def test_rewriting_and_conditions(self):
     #
@@ -141,3 +157,65 @@ class TestRewriting(unittest.TestCase):
 
         self.assertEqual(f(S.nil()), S.nil())
         self.assertEqual(f(S.suc(S.nil())), S.nil())
+
+    def test_rewriting_contexts(self):
+
+        @operation
+        def f(x: S, y: S) -> S:
+            if x == S.suc(var.v):
+                if y == S.suc(var.w):
+                    return T.cons(lhs=var.v, rhs=var.w)
+            elif y == S.suc(var.v):
+                return T.cons(lhs=var.v, rhs=var.v)
+            else:
+                for z in (x, y):
+                    if z == S.suc(var.w):
+                        return var.w
+            return T.cons(lhs=x, rhs=y)
+
+        one = S.suc(S.nil())
+        self.assertEqual(f(one, one), T.cons(lhs=S.nil(), rhs=S.nil()))
+        self.assertEqual(f(S.nil(), one), T.cons(lhs=S.nil(), rhs=S.nil()))
+        self.assertEqual(f(one, S.nil()), T.cons(lhs=one, rhs=S.nil()))
+        self.assertEqual(f(S.nil(), S.nil()), T.cons(lhs=S.nil(), rhs=S.nil()))
+
+        # Operations that refer to the variable manager itself use the
+        # context stack.
+        @operation
+        def g(x: S) -> S:
+            if x == S.suc(getattr(var, 'v')):
+                return var.v
+            return x
+
+        self.assertEqual(g(one), S.nil())
+        self.assertEqual(g(S.nil()), S.nil())
+
+    def test_rewriting_in_threads(self):
+        results = []
+
+        @operation
+        def f(x: S) -> S:
+            if x == S.suc(getattr(var, 'v')):
+                return var.v
+            return x
+
+        thread = threading.Thread(target=lambda: results.append(f(S.suc(S.nil()))))
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [S.nil()])
+
+    def test_rewriting_scope(self):
+        default = S.suc(S.nil())
+
+        @operation
+        def f(x: S, y: S = default) -> S:
+            if x == S.nil():
+                return default
+            return y
+
+        self.assertEqual(f(S.nil()), S.suc(S.nil()))
+        self.assertEqual(f(S.suc(S.nil())), S.suc(S.nil()))
+        self.assertEqual(f(S.suc(S.nil()), S.nil()), S.nil())
+
+        # Operations should be bound to the instances of their sort.
+        self.assertEqual(U(foo=S.nil()).__get_foo__(), S.nil())
@@ -0,0 +1,147 @@
+import unittest
+
+from stew.core import Sort, generator, operation
+from stew.dispatch import decision_tree
+from stew.matching import var
+from stew.profiling import current_profile, profiling, set_profiling
+from stew.types.nat import Nat
+
+
+class List(Sort):
+
+    @generator
+    def nil() -> List: pass
+
+    @generator
+    def cons(head: Nat, tail: List) -> List: pass
+
+    @operation
+    def length(self: List) -> Nat:
+        if self == List.nil():
+            return Nat(0)
+        if self == List.cons(head=var.h, tail=var.t):
+            return Nat(1) + var.t.length()
+
+    @decision_tree
+    @operation
+    def first(self: List) -> Nat:
+        if self == List.cons(head=var.h, tail=var.t):
+            return var.h
+
+
+# The truth values tested by `Flag.check`.
+checks = []
+
+
+class Truthy(object):
+
+    def __bool__(self):
+        checks.append(True)
+        return True
+
+
+class Flag(Sort):
+
+    @generator
+    def on() -> Flag: pass
+
+    @operation
+    def check(self: Flag) -> Nat:
+        if Truthy():
+            return Nat(1)
+
+
+@operation
+def second(l: List) -> Nat:
+    if l == List.cons(head=var.h, tail=var.t):
+        if var.t == List.cons(head=var.x, tail=var.y):
+            return var.x
+        return var.h
+    return Nat(0)
+
+
+def make_list(length):
+    term = List.nil()
+    for index in range(length):
+        term = List.cons(head=Nat(index), tail=term)
+    return term
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_operation_stats(self):
+        with profiling() as profile:
+            self.assertIs(current_profile(), profile)
+            self.assertEqual(make_list(10).length(), Nat(10))
+            self.assertIs(List.first.apply(List.nil()), List.first.apply(List.nil()))
+
+        stats = profile.stats(List.length)
+        self.assertEqual(stats.calls, 11)
+        self.assertEqual(stats.max_depth, 11)
+        self.assertGreaterEqual(stats.inclusive_time, stats.exclusive_time)
+        self.assertEqual(profile.stats(Nat.__add__).calls, 10)
+
+        # The exclusive time of an operation doesn't include the time spent
+        # in the operations it calls.
+        self.assertLess(stats.exclusive_time, stats.inclusive_time)
+
+        self.assertEqual(
+            [(branch.fired, branch.failed) for branch in stats.branches], [(1, 10), (10, 0)])
+        self.assertEqual(stats.branches[0].source, 'self == List.nil()')
+        self.assertEqual(
+            [(branch.fired, branch.failed) for branch in profile.stats(List.first).branches],
+            [(0, 2)])
+
+        report = profile.report()
+        self.assertIn('List.length', report)
+        self.assertIn('line %i' % stats.branches[1].line, report)
+        self.assertEqual(len(profile.report(limit=1).split('\n')), 1 + 1 + 2)
+
+    def test_branches(self):
+        with profiling() as profile:
+            self.assertEqual(Flag.on().check(), Nat(1))
+            self.assertEqual(
+                [second(make_list(length)) for length in (0, 1, 3)], [Nat(0), Nat(0), Nat(1)])
+
+        # Tests are evaluated once, even when they are probed.
+        self.assertEqual(checks, [True])
+
+        # So are the tests of nested if statements.
+        self.assertEqual(
+            [(branch.source, branch.fired, branch.failed)
+             for branch in profile.stats(second).branches],
+            [('l == List.cons(head=var.h, tail=var.t)', 2, 1),
+             ('var.t == List.cons(head=var.x, tail=var.y)', 1, 1)])
+
+    def test_disabled(self):
+        (call, fn, tree) = (operation.__call__, List.length._fn, List.first._fn)
+        with profiling():
+            make_list(2).length()
+            List.first(make_list(1))
+            self.assertIsNot(List.length._fn, fn)
+
+        # Profiling leaves no trace once disabled.
+        self.assertIsNone(current_profile())
+        self.assertIs(operation.__call__, call)
+        self.assertIs(List.length._fn, fn)
+        self.assertIs(List.first._fn, tree)
+
+    def test_nested_profiles(self):
+        set_profiling(True, branches=False)
+        try:
+            outer = current_profile()
+            make_list(1).length()
+            with profiling() as inner:
+                make_list(2).length()
+            make_list(1).length()
+        finally:
+            self.assertIs(set_profiling(False), outer)
+
+        self.assertEqual(outer.stats(List.length).calls, 4)
+        self.assertEqual(outer.stats(List.length).branches, [])
+        self.assertEqual(inner.stats(List.length).calls, 3)
+        self.assertEqual(inner.stats(List.length).branches[0].fired, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import itertools
+import unittest
+
+from stew.core import Sort, Attribute, generator, operation
+from stew.exceptions import RewritingError
+from stew.matching import var
+from stew.translators.rewriting import RewritingEngine
+from stew.types.bool import Bool
+
+
+class N(Sort):
+
+    @generator
+    def zero() -> N: pass
+
+    @generator
+    def suc(self: N) -> N: pass
+
+    @operation
+    def __add__(self: N, other: N) -> N:
+        if self == N.zero():
+            return other
+        if self == N.suc(var.x):
+            return N.suc(var.x + other)
+
+    @operation
+    def __sub__(self: N, other: N) -> N:
+        if other == N.zero():
+            return self
+        if self == N.suc(var.x) and other == N.suc(var.y):
+            return var.x - var.y
+
+    @operation
+    def __lt__(self: N, other: N) -> Bool:
+        if (self == N.zero()) and (other == N.suc(var.y)):
+            return Bool.true()
+        if (self == N.suc(var.x)) and (other == N.suc(var.y)):
+            return var.x < var.y
+        return Bool.false()
+
+    @operation
+    def __le__(self: N, other: N) -> Bool:
+        if self == other:
+            return Bool.true()
+        return self < other
+
+    @operation
+    def __truediv__(self: N, other: N) -> N:
+        if self < other:
+            return N.zero()
+        if (self >= other) and (other != N.zero()):
+            return N.suc((self - other) / other)
+
+    @operation
+    def __ge__(self: N, other: N) -> Bool:
+        return other <= self
+
+    @operation
+    def choose(self: N, other: N) -> N:
+        if self == N.zero():
+            return other
+        return self
+
+    @operation
+    def lazy(self: N) -> N:
+        return N.choose(N.suc(self), self - N.suc(self))
+
+    @operation
+    def double(self: N) -> N:
+        # Starred arguments aren't evaluated directly by the translator.
+        return N.__add__(*[self, self])
+
+
+class P(Sort):
+
+    lhs = Attribute(domain=N)
+    rhs = Attribute(domain=N)
+
+    @operation
+    def swap(self: P) -> P:
+        if self == P(lhs=var.x, rhs=var.y):
+            return P(lhs=var.y, rhs=var.x)
+
+
+def n(value):
+    term = N.zero()
+    for _ in range(value):
+        term = N.suc(term)
+    return term
+
+
+def make_engine(strategy):
+    engine = RewritingEngine(strategy)
+    engine.register(N)
+    engine.register(P)
+    engine.translate()
+    return engine
+
+
+class TestRewritingEngine(unittest.TestCase):
+
+    def test_python_semantics(self):
+        numbers = [n(i) for i in range(5)]
+        operations = (N.__add__, N.__sub__, N.__lt__, N.__le__, N.__truediv__)
+
+        for strategy in ('innermost', 'outermost'):
+            engine = make_engine(strategy)
+            for operation, lhs, rhs in itertools.product(operations, numbers, numbers[1:]):
+                try:
+                    expected = operation(lhs, rhs)
+                except RewritingError:
+                    with self.assertRaises(RewritingError):
+                        engine.apply(operation, lhs, rhs)
+                    continue
+
+                self.assertEqual(engine.apply(operation, lhs, rhs), expected)
+
+    def test_records(self):
+        for strategy in ('innermost', 'outermost'):
+            engine = make_engine(strategy)
+            self.assertEqual(
+                engine.apply(P.swap, P(lhs=n(1), rhs=n(2))), P(lhs=n(2), rhs=n(1)))
+
+    def test_deep_terms(self):
+        term = n(10000)
+        for strategy in ('innermost', 'outermost'):
+            engine = make_engine(strategy)
+            self.assertEqual(engine.apply(N.__sub__, engine.apply(N.__add__, term, term), term), term)
+
+    def test_expressions(self):
+        # Expressions the translator can't evaluate from their AST are
+        # evaluated by Python instead.
+        for strategy in ('innermost', 'outermost'):
+            engine = make_engine(strategy)
+            self.assertEqual(engine.apply(N.double, n(3)), N.double(n(3)))
+            self.assertEqual(engine.apply(N.double, n(3)), n(6))
+
+    def test_strategies(self):
+        # The argument of choose() can't be normalized, but isn't needed to
+        # evaluate lazy() with the outermost strategy.
+        self.assertEqual(make_engine('outermost').apply(N.lazy, n(1)), n(2))
+        with self.assertRaises(RewritingError):
+            make_engine('innermost').apply(N.lazy, n(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import io
+import pickle
+import unittest
+
+from stew.core import Attribute, Sort, generator
+from stew.exceptions import SerializationError
+from stew.matching import Var
+from stew.serialization import TermReader, TermWriter, dump, dumps, load, loads
+from stew.types.bool import Bool
+from stew.types.nat import Nat
+
+
+class List(Sort):
+
+    @generator
+    def nil() -> List: pass
+
+    @generator
+    def cons(head: Nat, tail: List) -> List: pass
+
+
+class Pair(Sort):
+
+    lhs = Attribute(domain=Bool)
+    rhs = Attribute(domain=List)
+
+
+def make_list(*values):
+    term = List.nil()
+    for value in reversed(values):
+        term = List.cons(head=Nat(value), tail=term)
+    return term
+
+
+class Labelled(Sort):
+
+    value = Attribute(domain=Bool)
+
+    def __init__(self, value, label):
+        super().__init__(value=value)
+        self.label = label
+
+
+class SlowStream(io.RawIOBase):
+
+    # A stream that returns a single byte per read.
+
+    def __init__(self, data):
+        self._data = data
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        rv = self._data[self._position:self._position + 1]
+        self._position += len(rv)
+        return rv
+
+
+class TestSerialization(unittest.TestCase):
+
+    def test_round_trip(self):
+        terms = [
+            Nat(0), Nat(10 ** 20), Nat.suc(Nat.zero()), Bool.false(),
+            make_list(1, 2, 3), Pair(lhs=Bool.true(), rhs=make_list(4))]
+        for term in terms:
+            self.assertEqual(loads(dumps(term)), term)
+
+    def test_shared_subterms(self):
+        tail = make_list(*range(100))
+        terms = [List.cons(head=Nat(index), tail=tail) for index in range(100)]
+
+        stream = io.BytesIO()
+        dump(terms, stream)
+        self.assertEqual(load(io.BytesIO(stream.getvalue())), terms)
+
+        # Each term only adds its own head, and a reference to the tail.
+        self.assertLess(len(stream.getvalue()), len(dumps(tail)) + 100 * 10)
+
+        # Shared subterms are read once.
+        (lhs, rhs) = load(io.BytesIO(stream.getvalue()))[:2]
+        self.assertIs(lhs._args[1], rhs._args[1])
+
+    def test_deep_terms(self):
+        term = List.nil()
+        for index in range(50000):
+            term = List.cons(head=Nat(index % 10), tail=term)
+
+        self.assertEqual(loads(dumps(term)), term)
+        self.assertEqual(pickle.loads(pickle.dumps(term)), term)
+
+    def test_streaming(self):
+        stream = io.BytesIO()
+        writer = TermWriter(stream)
+        writer.write(make_list(1))
+        writer.write(make_list(2, 1))
+        writer.flush()
+        writer.write(make_list(1))
+        writer.flush()
+
+        reader = TermReader(SlowStream(stream.getvalue()))
+        self.assertEqual(reader.read(), make_list(1))
+        self.assertEqual(list(reader), [make_list(2, 1), make_list(1)])
+        with self.assertRaises(EOFError):
+            reader.read()
+
+    def test_pickle(self):
+        term = Pair(lhs=Bool.true(), rhs=make_list(1, 2))
+        self.assertEqual(pickle.loads(pickle.dumps(term)), term)
+        self.assertEqual(pickle.loads(pickle.dumps({term, Nat(3)})), {term, Nat(3)})
+
+        # Records built by their own constructor are pickled with their state.
+        term = pickle.loads(pickle.dumps(Labelled(Bool.true(), label='x')))
+        self.assertEqual((term.value, term.label), (Bool.true(), 'x'))
+
+    def test_errors(self):
+        class Local(Sort):
+
+            @generator
+            def nil() -> Local: pass
+
+        with self.assertRaises(SerializationError):
+            dumps(Local.nil())
+        with self.assertRaises(SerializationError):
+            dumps(List.cons(head=Var('x'), tail=List.nil()))
+        with self.assertRaises(SerializationError):
+            dumps(Labelled(Bool.true(), label='x'))
+        with self.assertRaises(SerializationError):
+            loads(b'PICKLE')
+        with self.assertRaises(SerializationError):
+            loads(dumps(make_list(1, 2))[:-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
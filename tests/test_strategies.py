@@ -0,0 +1,231 @@
+import copy
+import itertools
+import pickle
+import unittest
+
+from stew.core import failure, operation
+from stew.exceptions import RewritingError
+from stew.matching import var
+from stew.strategies import (
+    Strategy, compile_strategy, first, fixpoint, identity, make_strategy, memoized,
+    parallelism, semi_naive_fixpoint, try_, union)
+from stew.types.bool import Bool
+from stew.types.nat import Nat
+
+
+@operation
+def pred(n: Nat) -> Nat:
+    if n == Nat.suc(var.x):
+        return var.x
+
+
+inc = make_strategy(lambda term: term + Nat(1) if term < Nat(3) else None)
+dec = make_strategy(pred)
+
+
+class Shift(Strategy):
+
+    def __init__(self, offset, limit=None):
+        super().__init__()
+        self.offset = offset
+        self.limit = limit
+
+    def __call__(self, terms):
+        terms = terms if isinstance(terms, set) else {terms}
+        if self.limit is not None:
+            terms = {term for term in terms if term < Nat(self.limit)}
+        return {term + Nat(self.offset) for term in terms}
+
+
+class TestStrategies(unittest.TestCase):
+
+    def test_make_strategy(self):
+        self.assertEqual(inc(Nat(0)), {Nat(1)})
+        self.assertEqual(inc({Nat(0), Nat(1)}), {Nat(1), Nat(2)})
+
+        with self.assertRaises(RewritingError):
+            inc(Nat(3))
+        self.assertIs(inc.apply(Nat(3)), failure)
+        self.assertIs(inc.apply({Nat(0), Nat(3)}), failure)
+
+        # The errors raised by the function reach the caller of the strategy.
+        def fail(term):
+            raise RewritingError('cannot rewrite %s' % term)
+        with self.assertRaisesRegex(RewritingError, 'cannot rewrite Nat'):
+            make_strategy(fail)({Nat(0), Nat(1)})
+        self.assertIs(make_strategy(fail).apply(Nat(0)), failure)
+
+    def test_make_strategy_from_operation(self):
+        self.assertEqual(make_strategy(Bool.__invert__)(Bool.true()), {Bool.false()})
+        self.assertEqual(dec({Nat(1), Nat(2)}), {Nat(0), Nat(1)})
+
+        with self.assertRaisesRegex(RewritingError, 'pred'):
+            dec(Nat(0))
+        self.assertIs(dec.apply(Nat(0)), failure)
+
+    def test_subclass(self):
+        # Strategies defined by subclassing can set instance attributes.
+        shift = Shift(3)
+        self.assertEqual(shift.offset, 3)
+        self.assertEqual(
+            union(identity, shift)({Nat(0), Nat(1)}), {Nat(0), Nat(1), Nat(3), Nat(4)})
+
+    def test_try(self):
+        self.assertEqual(try_(inc)({Nat(2), Nat(3)}), {Nat(3)})
+        self.assertEqual(try_(dec)({Nat(0), Nat(1)}), {Nat(0)})
+
+    def test_union_and_fixpoint(self):
+        self.assertEqual(union(identity, inc)(Nat(0)), {Nat(0), Nat(1)})
+        self.assertIs(union(identity, inc).apply(Nat(3)), failure)
+        self.assertEqual(
+            fixpoint(union(identity, try_(inc)))(Nat(0)), {Nat(0), Nat(1), Nat(2), Nat(3)})
+
+    def test_pickle(self):
+        # Strategies keep the state of their operands.
+        strategy = pickle.loads(pickle.dumps(union(Shift(1), Shift(2))))
+        self.assertEqual(strategy(Nat(0)), {Nat(1), Nat(2)})
+        strategy = pickle.loads(pickle.dumps(try_(Shift(1, limit=2))))
+        self.assertEqual(strategy({Nat(1), Nat(2)}), {Nat(2)})
+        strategy = pickle.loads(pickle.dumps(fixpoint(union(identity, Shift(1, limit=3)))))
+        self.assertEqual(strategy(Nat(0)), {Nat(0), Nat(1), Nat(2), Nat(3)})
+        self.assertIs(pickle.loads(pickle.dumps(identity)), identity)
+
+        # So do memoized strategies, along with their cache.
+        strategy = memoized(Shift(1))
+        strategy(Nat(0))
+        strategy = pickle.loads(pickle.dumps(strategy))
+        self.assertEqual(strategy(Nat(0)), {Nat(1)})
+        self.assertEqual(strategy.cache.hits, 1)
+
+        # Copying them copies their state, rather than sharing it.
+        strategy = try_(Shift(1))
+        self.assertIsNot(copy.deepcopy(strategy).f, strategy.f)
+        self.assertEqual(copy.deepcopy(strategy)(Nat(0)), {Nat(1)})
+
+    def test_semi_naive_fixpoint(self):
+        step = make_strategy(
+            lambda term: {term + Nat(1), term + Nat(2)} if term < Nat(9) else term)
+        for f in (union(identity, try_(inc)), union(identity, step), identity):
+            for terms in (Nat(0), {Nat(0), Nat(5)}, Nat(20)):
+                self.assertEqual(semi_naive_fixpoint(f)(terms), fixpoint(f)(terms))
+                self.assertEqual(semi_naive_fixpoint(f).apply(terms), fixpoint(f).apply(terms))
+
+        self.assertIs(semi_naive_fixpoint(union(identity, inc)).apply(Nat(0)), failure)
+        with self.assertRaises(RewritingError):
+            semi_naive_fixpoint(union(identity, inc))(Nat(0))
+
+    def test_compile_strategy(self):
+        strategies = (
+            identity, inc, union(identity, inc), union(inc, union(dec, identity), inc),
+            try_(union(inc, dec)), try_(try_(identity)), fixpoint(try_(dec)),
+            fixpoint(union(identity, try_(inc))), try_(fixpoint(union(identity, inc))),
+            semi_naive_fixpoint(union(identity, try_(dec))),
+            # Distinct instances of a strategy class are distinct operands.
+            union(Shift(1), Shift(2)), union(Shift(1), union(Shift(2), Shift(1))),
+            try_(union(Shift(1, limit=2), Shift(2, limit=1))),
+            fixpoint(union(identity, Shift(1, limit=3), Shift(2, limit=2))))
+        for strategy in strategies:
+            compiled = compile_strategy(strategy)
+            for terms in (Nat(0), {Nat(1), Nat(2)}, Nat(3), {Nat(0), Nat(5)}):
+                self.assertEqual(compiled.apply(terms), strategy.apply(terms))
+                if strategy.apply(terms) is failure:
+                    with self.assertRaises(RewritingError):
+                        compiled(terms)
+                else:
+                    self.assertEqual(compiled(terms), strategy(terms))
+
+    def test_compile_strategy_opaque(self):
+        # Distinct instances of a strategy class aren't duplicates, even if
+        # they compare equal as terms.
+        strategy = union(Shift(1), union(Shift(2), Shift(1)))
+        self.assertEqual(strategy(Nat(0)), {Nat(1), Nat(2)})
+        self.assertEqual(compile_strategy(strategy)(Nat(0)), {Nat(1), Nat(2)})
+
+    def test_compile_strategy_fusion(self):
+        calls = []
+
+        def record(term):
+            calls.append(term)
+            return term + Nat(1)
+
+        step = make_strategy(record)
+        compiled = compile_strategy(union(identity, union(step, union(identity, step))))
+        self.assertEqual(compiled({Nat(0), Nat(1)}), {Nat(0), Nat(1), Nat(2)})
+
+        # Duplicated operands are applied once on each term.
+        self.assertEqual(sorted(calls), [Nat(0), Nat(1)])
+
+    def test_memoized(self):
+        calls = []
+
+        def record(term):
+            calls.append(term)
+            return term + Nat(1) if term < Nat(3) else None
+
+        step = memoized(make_strategy(record))
+        strategy = fixpoint(union(identity, try_(step)))
+        for evaluated in (strategy, compile_strategy(strategy)):
+            self.assertEqual(evaluated(Nat(0)), {Nat(0), Nat(1), Nat(2), Nat(3)})
+
+        # The step is evaluated once for each term, failures included.
+        self.assertEqual(sorted(calls), [Nat(0), Nat(1), Nat(2), Nat(3)])
+        self.assertEqual(len(step.cache), 4)
+        self.assertGreater(step.cache.hit_rate, 0.5)
+        self.assertIs(step.apply({Nat(0), Nat(3)}), failure)
+
+        # Strategies that aren't applied term by term are memoized for each
+        # set of terms.
+        strategy = memoized(fixpoint(try_(dec)), maxsize=1)
+        for evaluated in (strategy, compile_strategy(strategy)):
+            self.assertEqual(evaluated({Nat(1), Nat(2)}), {Nat(0)})
+            self.assertEqual(evaluated(Nat(2)), {Nat(0)})
+        self.assertEqual((len(strategy.cache), strategy.cache.evictions), (1, 3))
+
+    def test_stream(self):
+        strategies = (
+            identity, inc, union(identity, inc), try_(union(inc, dec)),
+            fixpoint(union(identity, try_(inc))), union(identity, fixpoint(try_(dec))),
+            semi_naive_fixpoint(union(identity, try_(dec))),
+            # Distinct instances of a strategy class are distinct operands.
+            union(Shift(1), Shift(2)), union(Shift(1), union(Shift(2), Shift(1))),
+            try_(union(Shift(1, limit=2), Shift(2, limit=1))),
+            fixpoint(union(identity, Shift(1, limit=3), Shift(2, limit=2))))
+        for strategy in strategies:
+            for evaluated in (strategy, compile_strategy(strategy)):
+                for terms in (Nat(0), {Nat(1), Nat(2)}, Nat(3)):
+                    expected = strategy.apply(terms)
+                    if expected is failure:
+                        with self.assertRaises(RewritingError):
+                            list(evaluated.stream(terms))
+                    else:
+                        results = list(evaluated.stream(terms))
+                        self.assertEqual(len(results), len(set(results)))
+                        self.assertEqual(set(results), expected)
+
+    def test_stream_early_termination(self):
+        # The reachable terms of `succ` are infinite, and so are its
+        # arguments.
+        succ = make_strategy(lambda term: term + Nat(1))
+        self.assertEqual(
+            first(fixpoint(union(identity, succ)), Nat(0), lambda term: term > Nat(10)), Nat(11))
+        self.assertEqual(
+            first(succ, (Nat(index) for index in itertools.count()), lambda term: term > Nat(10)),
+            Nat(11))
+        self.assertIsNone(first(try_(dec), {Nat(0), Nat(1)}, lambda term: term > Nat(1)))
+
+    def test_parallelism(self):
+        terms = {Nat(index) for index in range(100)}
+        double = make_strategy(lambda term: {term, term + term})
+        expected = double(terms)
+
+        for backend in ('process', 'thread'):
+            with parallelism(3, backend=backend, min_terms=10):
+                self.assertEqual(double(terms), expected)
+                self.assertEqual(dec(terms - {Nat(0)}), {Nat(index) for index in range(99)})
+                self.assertIs(dec.apply(terms), failure)
+                with self.assertRaises(RewritingError):
+                    dec(terms)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,3 +33,28 @@ class TestSort(unittest.TestCase):
 
         self.assertFalse(issubclass(First, Second))
         self.assertFalse(issubclass(Second, First))
+
+    def test_specialization_cache(self):
+
+        class S(Sort):
+            pass
+
+        class T(Sort):
+            pass
+
+        class Unspecialized(Sort):
+
+            First = AbstractSort()
+            Second = AbstractSort()
+
+            @generator
+            def cons(lhs: First, rhs: Second) -> Unspecialized: pass
+
+        specialization = Unspecialized.specialize(First=S, Second=T)
+        self.assertIs(Unspecialized.specialize(Second=T, First=S), specialization)
+        self.assertIsNot(Unspecialized.specialize(First=T, Second=S), specialization)
+        self.assertIsNot(
+            Unspecialized.specialize('Named', First=S, Second=T), specialization)
+        self.assertIs(
+            Unspecialized.specialize('Named', First=S, Second=T),
+            Unspecialized.specialize('Named', First=S, Second=T))
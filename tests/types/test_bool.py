@@ -9,6 +9,11 @@ class TestSort(unittest.TestCase):
         self.assertIs(Bool.true()._generator, Bool.true)
         self.assertIs(Bool.false()._generator, Bool.false)
 
+    def test_from_values(self):
+        terms = Bool.from_values([True, False, ('true',), True])
+        self.assertEqual(terms, [Bool.true(), Bool.false(), Bool.true(), Bool.true()])
+        self.assertIs(terms[0], terms[3])
+
     def test_invert(self):
         true = Bool.true()
         false = Bool.false()
@@ -1,6 +1,8 @@
 import unittest
 
+from stew.core import failure
 from stew.exceptions import ArgumentError, RewritingError
+from stew.matching import push_context, var
 from stew.types.bool import Bool
 from stew.types.nat import Nat
 
@@ -19,6 +21,16 @@ class TestSort(unittest.TestCase):
         with self.assertRaises(ArgumentError):
             Nat(-1)
 
+    def test_from_values(self):
+        terms = Nat.from_values([0, 2, ('suc', 1), ('suc', ('zero',)), 2])
+        self.assertEqual(terms, [Nat(0), Nat(2), Nat(2), Nat(1), Nat(2)])
+        self.assertIs(terms[1], terms[4])
+
+        with self.assertRaises(ArgumentError):
+            Nat.from_values([-1])
+        with self.assertRaises(ArgumentError):
+            Nat.from_values(['one'])
+
     def test_add(self):
         self.assertEqual(Nat(0) + Nat(0), Nat(0))
         self.assertEqual(Nat(0) + Nat(2), Nat(2))
@@ -32,6 +44,8 @@ class TestSort(unittest.TestCase):
 
         with self.assertRaises(RewritingError):
             Nat(2) - Nat(3)
+        self.assertIs(Nat.__sub__.apply(Nat(2), Nat(3)), failure)
+        self.assertIs(Nat.__sub__.apply(Nat.suc(Nat.zero()), Nat(3)), failure)
 
     def test_mul(self):
         self.assertEqual(Nat(0) * Nat(2), Nat(0))
@@ -78,3 +92,35 @@ class TestSort(unittest.TestCase):
         self.assertEqual(Nat(1) > Nat(2), Bool.false())
         self.assertEqual(Nat(2) > Nat(2), Bool.false())
         self.assertEqual(Nat(3) > Nat(2), Bool.true())
+
+    def test_native_representation(self):
+        self.assertEqual(Nat(3), Nat.suc(Nat.suc(Nat.suc(Nat.zero()))))
+        self.assertEqual(Nat.suc(Nat(2)), Nat(3))
+        self.assertEqual(hash(Nat.suc(Nat(2))), hash(Nat(3)))
+        self.assertEqual(len({Nat(3), Nat.suc(Nat(2)), Nat.suc(Nat.suc(Nat(1)))}), 1)
+        self.assertEqual(str(Nat.suc(Nat(2))), 'Nat(3)')
+
+    def test_peano_view(self):
+        with push_context():
+            self.assertEqual(Nat(3), Nat.suc(var.x))
+            self.assertEqual(var.x, Nat(2))
+        with push_context():
+            self.assertNotEqual(Nat(0), Nat.suc(var.x))
+
+        self.assertIs(Nat(3)._args[0]._generator, Nat.suc)
+        self.assertIs(Nat(0)._generator, Nat.zero)
+
+    def test_large_numbers(self):
+        big = Nat(10 ** 6)
+        self.assertEqual(big + Nat(1), Nat(10 ** 6 + 1))
+        self.assertEqual(big - Nat(1), Nat(10 ** 6 - 1))
+        self.assertEqual(big * big, Nat(10 ** 12))
+        self.assertEqual(big / Nat(3), Nat(333333))
+        self.assertEqual(big % Nat(3), Nat(1))
+        self.assertEqual(big < Nat(10 ** 6 + 1), Bool.true())
+        self.assertEqual(big > Nat(10 ** 6 + 1), Bool.false())
+
+        with self.assertRaises(RewritingError):
+            big - Nat(10 ** 6 + 1)
+        with self.assertRaises(RewritingError):
+            big / Nat(0)